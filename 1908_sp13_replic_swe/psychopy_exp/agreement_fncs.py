@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Inter-rater agreement of transcriptions, for every pair of raters.
+
+Each rater is a tsv file in the layout of transcriptions.tsv (named after the
+file, without "transcription_"), or an annotator in the database of
+annotation_queue.py. Transcriptions are aligned by filename and split into
+words; the responses have ``WORDS`` words, so for each pair of raters we get
+
+- the share of recordings on which they wrote the same word at position 1-4
+  (both writing nothing counts as agreeing) and the share that agree on all,
+- the mean word-level edit distance, divided by the longer transcription,
+- Cohen's kappa, with the words at positions 1-4 as categories.
+
+Words are coded as integers once per rater and the comparisons work on whole
+arrays, so this takes seconds also for hundreds of thousands of recordings.
+analysis/interrater_agreement.R compares the transcriptions with the target
+words instead.
+
+    python agreement_fncs.py transcription_MB.tsv transcription_petrus.tsv transcriptions.tsv
+    python agreement_fncs.py --queue annotations.sqlite --watch 60
+
+NB: runs under StandalonePsychoPy2 (Python 2.7) as well as Python 3.
+"""
+
+from __future__ import absolute_import, division, print_function
+import argparse
+import csv
+import io
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+WORDS = 4
+COLUMNS = ['rater_a', 'rater_b', 'n'] + ['match_%d' % (i + 1) for i in range(WORDS)] + \
+          ['match_all', 'edit_distance', 'kappa']
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(transcription):
+    """Lower-case words of a transcription (punctuation and extra spaces dropped)."""
+    return _WORD.findall((transcription or u'').lower())
+
+
+def read_tsv(path):
+    """{filename: transcription} of a tsv file written by annotate.py (with csv's quoting)."""
+    if sys.version_info[0] < 3:
+        with open(path, 'rb') as f:
+            return dict((row['filename'].decode('utf-8'), (row['transcription'] or '').decode('utf-8'))
+                        for row in csv.DictReader(f, delimiter='\t'))
+    with io.open(path, encoding='utf-8', newline='') as f:
+        return dict((row['filename'], row['transcription'] or '') for row in csv.DictReader(f, delimiter='\t'))
+
+
+def read_queue(path):
+    """{annotator: {filename: transcription}} of the database of annotation_queue.py."""
+    db = sqlite3.connect(path)
+    raters = {}
+    try:
+        for annotator, filename, transcription in db.execute(
+                'SELECT annotator, filename, transcription FROM annotations'):
+            raters.setdefault(annotator, {})[filename] = transcription
+    finally:
+        db.close()
+    return raters
+
+
+def rater_name(path):
+    """Name of the rater of a tsv file, e.g. MB for transcription_MB.tsv."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name[len('transcription_'):] if name.startswith('transcription_') else name
+
+
+class CodedTranscriptions(object):
+    """The transcriptions of one rater as integer word codes.
+
+    ``filenames`` is sorted; row i of ``codes`` has the codes of the words of
+    filenames[i], padded with 0, and ``lengths[i]`` their number. The codes
+    come from ``vocabulary`` (shared by the raters, and extended here).
+    """
+
+    def __init__(self, texts, vocabulary):
+        self.filenames = np.array(sorted(texts), dtype=object)
+        tokens = [tokenize(texts[fname]) for fname in self.filenames]
+        self.lengths = np.array([len(words) for words in tokens], dtype=int)
+        width = max(WORDS, self.lengths.max() if len(tokens) else 0)
+        self.codes = np.zeros((len(tokens), width), dtype=int)
+        for row, words in enumerate(tokens):
+            self.codes[row, :len(words)] = [vocabulary.setdefault(word, len(vocabulary) + 1)
+                                            for word in words]
+
+
+def edit_distances(a, len_a, b, len_b):
+    """Levenshtein distances between the rows of two padded code arrays (n x la and n x lb).
+
+    The dynamic programme runs over word positions; each step handles all
+    rows at once.
+    """
+    n, width_a = a.shape
+    width_b = b.shape[1]
+    rows = np.arange(n)
+    previous = np.tile(np.arange(width_b + 1), (n, 1))
+    distances = len_b.copy()  # rows where a is empty
+    for i in range(1, width_a + 1):
+        current = np.empty_like(previous)
+        current[:, 0] = i
+        substitute = previous[:, :-1] + (a[:, i - 1:i] != b)
+        delete = previous[:, 1:] + 1
+        for j in range(1, width_b + 1):
+            current[:, j] = np.minimum(np.minimum(substitute[:, j - 1], delete[:, j - 1]),
+                                       current[:, j - 1] + 1)
+        done = len_a == i
+        distances[done] = current[rows[done], len_b[done]]
+        previous = current
+    return distances
+
+
+def cohen_kappa(x, y):
+    """Cohen's kappa of two arrays of category codes (non-negative integers)."""
+    if not len(x):
+        return np.nan
+    ncat = max(x.max(), y.max()) + 1
+    observed = np.mean(x == y)
+    expected = np.dot(np.bincount(x, minlength=ncat), np.bincount(y, minlength=ncat)) / len(x) ** 2
+    return (observed - expected) / (1 - expected) if expected < 1 else 1.0
+
+
+def compare(a, b):
+    """Agreement of two CodedTranscriptions on the recordings they both transcribed (a dict)."""
+    fnames, rows_a, rows_b = np.intersect1d(a.filenames, b.filenames, assume_unique=True,
+                                            return_indices=True)
+    codes_a, len_a = a.codes[rows_a], a.lengths[rows_a]
+    codes_b, len_b = b.codes[rows_b], b.lengths[rows_b]
+    match = codes_a[:, :WORDS] == codes_b[:, :WORDS]
+    longest = np.maximum(np.maximum(len_a, len_b), 1)
+    result = {'n': len(fnames), 'match_all': match.all(axis=1).mean() if len(fnames) else np.nan,
+              'edit_distance': (edit_distances(codes_a, len_a, codes_b, len_b) / longest).mean()
+              if len(fnames) else np.nan,
+              'kappa': cohen_kappa(codes_a[:, :WORDS].ravel(), codes_b[:, :WORDS].ravel())}
+    for i in range(WORDS):
+        result['match_%d' % (i + 1)] = match[:, i].mean() if len(fnames) else np.nan
+    return result
+
+
+def agreement(raters):
+    """Rows (dicts with the keys of ``COLUMNS``) for every pair of ``raters``, {name: {filename: text}}."""
+    vocabulary = {}
+    coded = [(name, CodedTranscriptions(texts, vocabulary)) for name, texts in sorted(raters.items())]
+    rows = []
+    for (name_a, a), (name_b, b) in itertools.combinations(coded, 2):
+        row = compare(a, b)
+        row['rater_a'], row['rater_b'] = name_a, name_b
+        rows.append(row)
+    return rows
+
+
+def write_rows(rows, f):
+    writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+    writer.writerow(COLUMNS)
+    for row in rows:
+        writer.writerow([('%.4f' % row[column]) if isinstance(row[column], float) else row[column]
+                         for column in COLUMNS])
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser('inter-rater agreement of transcriptions')
+    argparser.add_argument('tsv', nargs='*', help='transcriptions of one rater each (e.g. transcription_MB.tsv)')
+    argparser.add_argument('--queue', help='also the annotators in this database of annotation_queue.py')
+    argparser.add_argument('--out', help='write the table to this tsv file (default: print it)')
+    argparser.add_argument('--watch', type=float, metavar='SECONDS',
+                           help='keep running, and recompute when the input changes (checked every SECONDS)')
+    args = argparser.parse_args()
+    inputs = args.tsv + ([args.queue] if args.queue else [])
+    if not inputs:
+        argparser.error('give transcription files and/or --queue')
+
+    last_change = None
+    while True:
+        change = [os.path.getmtime(path) for path in inputs]
+        if change != last_change:
+            last_change = change
+            raters = dict((rater_name(path), read_tsv(path)) for path in args.tsv)
+            if args.queue:
+                raters.update(read_queue(args.queue))
+            rows = agreement(raters)
+            if args.out:
+                with open(args.out, 'w') as f:
+                    write_rows(rows, f)
+                print('%s: agreement of %d raters written to %s' % (time.strftime('%H:%M:%S'),
+                                                                    len(raters), args.out))
+            else:
+                write_rows(rows, sys.stdout)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
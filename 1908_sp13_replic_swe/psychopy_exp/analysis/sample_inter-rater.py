@@ -1,108 +1,127 @@
 # Select a random sample of 5% of trials (60 participant data) to determine inter-rater agreement in transcriptions
-
+#
+# The recordings come from the catalog of ../sound_recording (see ../catalog_fncs.py), so their names are parsed
+# once; the selection is done with joins on session and on (participant, block). With --stratify, the sample is
+# spread over participants and their arm/leg blocks in proportion to their number of recordings (otherwise it's a
+# simple random sample of all recordings, as in the first analysis). Both are reproducible with the seed below.
+#
+# The sample is listed in <target folder>.tsv, which annotate.py can take as --files to work directly on
+# ../sound_recording; by default the target folder gets hard links to the recordings (no extra disk space), and
+# only when that's not possible (e.g. another drive) copies, made in parallel.
+
+import argparse
+import concurrent.futures
 import pandas
-import re
-import os
 import random
+import os
 import shutil
-
-# participant metadata with RA comments
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from catalog_fncs import RecordingCatalog
+from exclusion_fncs import ExclusionRegistry
+
+argparser = argparse.ArgumentParser("select recordings for the inter-rater agreement")
+argparser.add_argument("--participants", type=int, default=60, help="number of (first) participants. Default is 60.")
+argparser.add_argument("--fraction", type=float, default=.05, help="fraction of their trials. Default is .05.")
+argparser.add_argument("--stratify", action="store_true",
+                       help="sample the same fraction from each participant's arm and leg block")
+argparser.add_argument("--materialize", choices=["link", "copy", "manifest"], default="link",
+                       help="put the sample in the target folder as hard links (default; copies where linking "
+                            "isn't possible), as copies, or only list it in <target folder>.tsv")
+argparser.add_argument("--target", default="../sound_recording_interrater_agreement/",
+                       help="target folder. Default is ../sound_recording_interrater_agreement/")
+args = argparser.parse_args()
+
+# shared exclusion rules (../exclusions.tsv), plus the participants the RAs marked as valid
+# (values of 1 and 2 on col2 of the participant metadata)
+registry = ExclusionRegistry()
+registry.require_valid_participants("../participant_data_210526.csv")
+
+# participant metadata with RA comments: ID and block order, e.g. "1,control-arm-leg,1-2-3,block_order_..."
 df_ppts = pandas.read_csv("../participant_data_210526.csv")
-df_ppts = df_ppts.iloc[:, [0, 1]]  # only 1st two columns needed
-df_ppts = df_ppts[df_ppts.iloc[:, 1] <= 2]  # values of 1 and 2 on col2 denote valid participants
-print(df_ppts)
-
-# for each participant, obtain a list containing the two arm/leg blocks
-def find_blocks(str):
-    m = re.match("\d+,(\w+)-(\w+)-(\w+),.*", str)
-    conds = [m.group(1), m.group(2), m.group(3)]
-    blocks = []
-    i = 0
-    for cond in conds:
-        i += 1
-        if cond in ["arm", "leg"]:
-            blocks.append(i)
-    return blocks
-
-# append as a column to dataframe
-armleg_blocks = []
-for ppt in df_ppts["pptID"]:
-    armleg_blocks.append(find_blocks(ppt))
-df_ppts["armleg_blocks"] = armleg_blocks
-print(df_ppts)
-
-# IDs of valid participants
-IDs = []
-for id in df_ppts["pptID"].tolist():
-    m = re.search("^(\d+),.*", id)
-    IDs.append(m.group(1))
-# append as col to df
-df_ppts["IDs"] = IDs
-print(df_ppts)
-
-# now simplify dataframe to just contain unique combinations of valid IDs and their arm/leg blocks as a list
-df_valid = df_ppts[["IDs", "armleg_blocks"]].drop_duplicates(subset="IDs")
-print(df_valid)
-print(df_valid.shape[0])
-
-print("\nThese are the %s valid IDs:" % df_valid.shape[0])
-print(df_valid["IDs"].tolist())
-
-# Read all participant files generated from psychopy; this includes invalid participants, either because they are from
+df_ppts = df_ppts["pptID"].str.extract(r"^(?P<ID>\d+),(?P<cond1>\w+)-(?P<cond2>\w+)-(?P<cond3>\w+),")
+df_ppts = df_ppts[df_ppts["ID"].isin(registry.valid_participants)].drop_duplicates(subset="ID")
+
+print("\nThese are the %s valid IDs:" % df_ppts.shape[0])
+print(df_ppts["ID"].tolist())
+
+# for each participant, the two arm/leg blocks (one row per block)
+df_blocks = df_ppts.melt(id_vars="ID", var_name="block", value_name="condition")
+df_blocks["block"] = df_blocks["block"].str[-1].astype(int)
+df_blocks["participant"] = df_blocks["ID"].astype(int)
+df_blocks = df_blocks[df_blocks["condition"].isin(["arm", "leg"])][["participant", "block", "condition"]]
+
+# Participant files generated from psychopy; the registry leaves out invalid participants, either because they are from
 # pilot or bc participant has to be excluded, in which case it's marked with "_excl" at the end of the filename)
-all_files = os.listdir("../data")
-
-# make the selection of valid files
-target_files = []
-excluded_files = []  # to verify what we're excluding
-
-for f in all_files:
-    m = re.match("(.*)\.csv", f)  # csv only
-    if m:
-        mymatch = m.group(1)  # file name without extension
-        m2 = re.search("excl", mymatch)  # exclude 'excl' files
-        if m2:
-            excluded_files.append(mymatch)
-        else:
-            id_match = re.match("^(\d+)_.*", mymatch)  # extract ID
-            if id_match.group(1) in df_ppts["IDs"].tolist():
-                target_files.append(mymatch)
-
-# we only want to keep the first 60 participants for the first analysis:
-target_files = target_files[:60]
+data_index = registry.index("../data")
+target_files = [f[:-len(".csv")] for f in data_index.included if f.endswith(".csv")]  # sorted by file name
+
+# we only want to keep the first participants (60 for the first analysis):
+target_files = target_files[:args.participants]
 
 print("\nThere are %s target participants:" % len(target_files))
 print(target_files)
 
 # Now get all sound files from arm/leg blocks from target participants
 path_source = "../sound_recording/"
-sound_files = []
-
-for f in os.listdir(path_source):
-    m = re.match("^(\d+)_.*_block_([0-3]).*", f)
-    ppt_id = m.group(1)
-    block = int(m.group(2))  # convert from string to int for later pattern matching
-    for target in target_files:
-        match_target = re.match(target, f)  # does f match a target file?
-        if match_target:
-            match_training = re.search("(practice|training)", f)  # exclude practice/training trials
-            if not match_training:
-                # check the valid blocks for that participant ID (depends on block order, see Ls 15-31)
-                valid_blocks = df_valid.loc[df_valid["IDs"] == ppt_id]["armleg_blocks"]
-                valid_blocks = valid_blocks.tolist()[0]  # extract list within list
-                if block in valid_blocks:
-                    sound_files.append(f)  # append only if it passes all the tests
+catalog = RecordingCatalog(path_source)
+catalog.refresh()
+df_sounds = catalog.to_frame()
+sound_index = registry.index(path_source)  # practice/training trials are excluded
+df_sounds = df_sounds[df_sounds["filename"].isin(sound_index.included)]
+df_sounds = df_sounds[df_sounds["session"].isin(target_files)].astype({"participant": int, "block": int, "trial": int})
+df_sounds = df_sounds.merge(df_blocks, on=["participant", "block"])  # only the arm/leg blocks
+df_sounds = df_sounds.sort_values("filename")
+sound_files = df_sounds["filename"].tolist()
 
 # Select a random sample of 5% of all trials
-intended_length = round(.05 * len(sound_files))
-print('\nThere are %s target sound files in total; we select %s (5%%) of them.' % (len(sound_files), intended_length))
+intended_length = round(args.fraction * len(sound_files))
+print('\nThere are %s target sound files in total; we select %s (%g%%) of them.' % (
+    len(sound_files), intended_length, 100 * args.fraction))
 random.seed(64478536)
-sound_files_sample = random.sample(sound_files, k=intended_length)
-
-# copy them to a separate directory for coding
-path_target = "../sound_recording_interrater_agreement/"
-if not os.path.exists(path_target):
-    os.mkdir(path_target)
-for f in sound_files_sample:
-    src_path = path_source + f
-    shutil.copy(src_path, path_target)
+if not args.stratify:
+    sound_files_sample = random.sample(sound_files, k=intended_length)
+else:
+    # per participant and arm/leg block: its share of the sample, rounded so that the shares add up
+    # to intended_length (largest remainders first)
+    strata = df_sounds.groupby(["participant", "block", "condition"])["filename"].apply(list)
+    quota = strata.str.len() * intended_length / len(sound_files)
+    k = quota.astype(int)
+    remainders = (quota - k).sort_values(ascending=False, kind="mergesort")
+    k[remainders.index[:intended_length - k.sum()]] += 1
+    sound_files_sample = []
+    for stratum, fnames in strata.items():
+        sound_files_sample += random.sample(fnames, k=k[stratum])
+    print(pandas.DataFrame({"recordings": strata.str.len(), "sampled": k}))
+
+# list the sample, for annotate.py --files and annotation_queue.py double-code
+path_target = args.target
+df_sample = df_sounds[df_sounds["filename"].isin(sound_files_sample)]
+df_sample = df_sample[["filename", "participant", "block", "condition", "trial"]]
+df_sample.to_csv(os.path.normpath(path_target) + ".tsv", sep="\t", index=False)
+
+
+# and put them in a separate directory for coding (files already there from an earlier run are kept)
+def materialize(f):
+    src_path = os.path.join(path_source, f)
+    dest_path = os.path.join(path_target, f)
+    if os.path.exists(dest_path):
+        return "kept"
+    if args.materialize == "link":
+        try:
+            os.link(src_path, dest_path)
+            return "linked"
+        except OSError:  # e.g. target on another drive
+            pass
+    shutil.copy(src_path, dest_path)
+    return "copied"
+
+
+if args.materialize != "manifest":
+    if not os.path.exists(path_target):
+        os.mkdir(path_target)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        done = list(executor.map(materialize, sound_files_sample))
+    print(pandas.Series(done).value_counts().to_string())
+print("The sample is listed in %s.tsv" % os.path.normpath(path_target))
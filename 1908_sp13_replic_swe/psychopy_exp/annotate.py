@@ -5,21 +5,104 @@ import sounddevice as sd
 import soundfile as sf
 import subprocess as sp
 import argparse
+import concurrent.futures
+import csv
 import os
-import re
 
-
-def annotate(folder, dest_file, call_ext_player, player_path):
+from annotation_queue import AnnotationQueue
+from exclusion_fncs import ExclusionRegistry, parse_fname
+
+
+class AnnotationStore:
+    """Annotations in a tsv file: a set of the annotated filenames, and one appended row per annotation.
+
+    Rows are written with the columns of the file's header (missing values
+    left empty), so annotating a file costs the same however long the tsv is.
+    """
+
+    columns = ['filename', 'transcription', 'comment', 'block', 'date_time', 'participant', 'trial']
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f, delimiter='\t')
+                self.columns = next(reader)
+                index = self.columns.index('filename')
+                self.done.update(row[index] for row in reader if row)
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                ends_with_newline = f.read(1) == b'\n'
+        self._file = open(path, 'a' if exists else 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file, delimiter='\t', lineterminator='\n')
+        if not exists:
+            self._writer.writerow(self.columns)
+        elif not ends_with_newline:
+            self._file.write('\n')
+        self._file.flush()
+
+    def __contains__(self, fname):
+        return fname in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def add(self, entry):
+        self._writer.writerow([entry.get(column, '') for column in self.columns])
+        self._file.flush()
+        self.done.add(entry['filename'])
+
+    def close(self):
+        self._file.close()
+
+
+class Prefetcher:
+    """Read the first ``seconds`` of upcoming recordings in a background thread.
+
+    ``schedule()`` queues reads of the given files (only ``frames=`` as many
+    samples as will be played are decoded); ``get()`` returns (samples, rate)
+    for a file, waiting for its read if it is still running, or reading it
+    now if it was never scheduled.
+    """
+
+    def __init__(self, folder, seconds):
+        self.folder = folder
+        self.seconds = seconds
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._reads = {}
+
+    def _read(self, fname):
+        with sf.SoundFile(os.path.join(self.folder, fname)) as f:
+            return f.read(frames=f.samplerate * self.seconds), f.samplerate
+
+    def schedule(self, fnames):
+        for fname in fnames:
+            if fname not in self._reads:
+                self._reads[fname] = self._executor.submit(self._read, fname)
+
+    def get(self, fname):
+        future = self._reads.pop(fname, None)
+        if future is None:
+            return self._read(fname)
+        return future.result()
+
+    def close(self):
+        for future in self._reads.values():
+            future.cancel()
+        self._executor.shutdown()
+
+
+def annotate(folder, dest_file, call_ext_player, player_path, prefetch=3,
+             queue_path=None, annotator=None, double_code=0.0, files=None):
 
     # hack bc I don't know how to pass booleans with argparse
     call_ext_player=bool(call_ext_player)
 
-    # check if a tsv with annotations already exists and if so, load it into a df
+    # open the tsv with annotations (created if it doesn't exist yet)
     dest_file = dest_file + '.tsv'
-    if os.path.exists(dest_file):
-        df = pd.read_csv(dest_file, sep='\t')
-    else:
-        df = pd.DataFrame(columns=['filename', 'transcription', 'comment'])
+    store = AnnotationStore(dest_file)
 
     # transcriber defines the number of seconds to play from each file
     while True:
@@ -31,62 +114,98 @@ def annotate(folder, dest_file, call_ext_player, player_path):
         except ValueError:
             print("Please indicate a positive integer for the number of seconds.")
 
-    # read files from folder and select only .wav audio files
-    fnames = sorted(os.listdir(folder))
-    fnames = [fname for fname in os.listdir(folder) if fname.endswith('.wav')]
-
-    # exclude some filenames
-    # https://stackoverflow.com/questions/8006551/how-to-split-long-regular-expression-rules-to-multiple-lines-in-python
-    regex = re.compile(r'(.*(practice|training).*$|'  # filter out practice and training trials
-                       # remove participant IDs used for testing (>= 900):
-                       r'9[0-9][0-9]_.*|'
-                       # excluded participants:
-                       r'74_sp13_replication_swe_2021_Jun_04_1502.*|'
-                       r'54_sp13_replication_swe_2021_Apr_14_1301.*|'
-                       r'53_sp13_replication_swe_2021_Apr_09_1501.*|'
-                       r'43_sp13_replication_swe_2021_Mar_03_1515.*|'
-                       r'32_sp13_replication_swe_2021_Feb_10_1454.*|'
-                       r'19_sp13_replication_swe_2020_Dec_04_1331.*|'
-                       r'9_sp13_replication_swe_2020_Nov_25_1328.*|'
-                       r'2_sp13_replication_swe_2020_Nov_20_0901.*|'
-                       r'2_sp13_replication_swe_2020_Nov_04_1038.*)')  
-
-    fnames = [i for i in fnames if not regex.match(i)]
-
-    # loop over audio files and check if each file is not already annotated in df
-    for fname in fnames:
-        if fname not in df['filename'].values:
-
-            # read metadata from filename and set up data for df entry
-            fname_parts = fname.replace('.wav', '').split('_')
-            print(fname_parts)
-            entry = {
-                'filename': fname,
-                'participant': fname_parts[0],
-                'date_time': '/'.join(fname_parts[4:8]),
-                'block': fname_parts[9],
-                # 'block_type': fname_parts[12],  # practice trials filtered out
-                'trial': fname_parts[12],
-            }
-
-            # play the soundfile in one of two ways
-            if call_ext_player:
-                sp.Popen([player_path, os.path.join(folder, fname)], stdin=None, stdout=sp.DEVNULL, stderr=sp.DEVNULL)
-            else:
-                # read audio from .wav file and play on a loop
-                wav, hz = sf.read(os.path.join(folder, fname))
-                sd.play(wav[:hz*loop_dur], hz, loop=True)  # play for loop_dur seconds
-
-            # get inputs for transcription and comment
-            print(f'\nannotating file: {fname}')
-            entry['transcription'] = input('transcription: ')
-            entry['comment'] = input('comment: ')
-
-            # write new entry to df and tsv
-            df = df.append(entry, ignore_index=True)
-            df.to_csv(dest_file, sep='\t', index=False)
+    # read files from folder and select only .wav and .flac audio files
+    # (.flac recordings are already trimmed to the response, see speech_fncs.py),
+    # leaving out practice and training trials, test IDs and excluded sessions
+    # (see exclusions.tsv)
+    fnames = []
+    for fname in ExclusionRegistry().index(folder).included:
+        if not fname.endswith(('.wav', '.flac')):
+            continue
+        fname_parts = parse_fname(fname)
+        if fname_parts is None or fname_parts['block'] is None:
+            print(f'skipping {fname}: not named like a trial recording')
+            continue
+        fnames.append(fname)
+    if files is not None:
+        # only the recordings listed in a tsv (with a filename column), e.g. the sample of sample_inter-rater.py
+        with open(files, newline='', encoding='utf-8') as f:
+            listed = {row['filename'] for row in csv.DictReader(f, delimiter='\t')}
+        fnames = [fname for fname in fnames if fname in listed]
+
+    # loop over the audio files that are not annotated yet; while one is being
+    # transcribed, the next few are read in the background. With a shared
+    # queue, the files are handed out by the queue instead: the client holds
+    # leases on the current file and the next few, so those can be read ahead
+    prefetcher = Prefetcher(folder, loop_dur)
+    if queue_path is None:
+        queue = None
+        pending = [fname for fname in fnames if fname not in store]
+        todo = iter(pending)
+    else:
+        queue = AnnotationQueue(queue_path)
+        queue.add_files(fnames, double_code)
+
+        def leased():
+            ahead = []
+            while True:
+                while len(ahead) < 1 + prefetch:
+                    fname = queue.lease(annotator, skip=ahead)
+                    if fname is None:
+                        break
+                    ahead.append(fname)
+                if not ahead:
+                    return
+                for fname in ahead[1:]:
+                    queue.renew(fname, annotator)  # still waiting, don't let them expire
+                if not call_ext_player:
+                    prefetcher.schedule(ahead)
+                yield ahead.pop(0)
+
+        todo = leased()
+    for i, fname in enumerate(todo):
+        if queue is None and not call_ext_player:
+            prefetcher.schedule(pending[i:i + 1 + prefetch])
+
+        # read metadata from filename (the audio_fname scheme, see catalog_fncs.py) and set up data for df entry
+        fname_parts = parse_fname(fname)
+        print(fname_parts)
+        entry = {
+            'filename': fname,
+            'participant': fname_parts['participant'],
+            'date_time': '/'.join(fname_parts['session'].split('_')[-4:]),
+            'block': fname_parts['block'],
+            # 'block_type': fname_parts['loop'],  # practice trials filtered out
+            'trial': fname_parts['trial'],
+        }
+
+        # play the soundfile in one of two ways
+        if call_ext_player:
+            sp.Popen([player_path, os.path.join(folder, fname)], stdin=None, stdout=sp.DEVNULL, stderr=sp.DEVNULL)
+        else:
+            # play the first loop_dur seconds of the .wav/.flac file on a loop
+            wav, hz = prefetcher.get(fname)
+            sd.play(wav, hz, loop=True)
+
+        # get inputs for transcription and comment
+        print(f'\nannotating file: {fname}')
+        entry['transcription'] = input('transcription: ')
+        if queue is not None:
+            queue.renew(fname, annotator)
+        entry['comment'] = input('comment: ')
+
+        # append the new entry to the tsv (and hand it in to the queue)
+        store.add(entry)
+        if queue is not None:
+            queue.submit(annotator, entry)
 
     # end annotation routine and display df
+    prefetcher.close()
+    store.close()
+    if queue is not None:
+        print(queue.status())
+        queue.close()
+    df = pd.read_csv(dest_file, sep='\t')
     print('\n###\n')
     print(df)
     print(f'\n###\n\nfinished annotating {len(df)} files')
@@ -100,5 +219,17 @@ if __name__ == '__main__':
                             help='Either 0 (=false) or 1 (=true): Should an external player be called for transcriptions? Default is 0.')
     argparser.add_argument('player_path', default='C:\\Program Files (x86)\\VideoLAN\\VLC\\vlc.exe', nargs='?',
                             help='filepath for a media player (e.g. VLC)')
+    argparser.add_argument('--prefetch', type=int, default=3,
+                            help='number of upcoming files read in the background while transcribing. Default is 3.')
+    argparser.add_argument('--queue', help='SQLite file of a work queue shared with other transcribers '
+                                           '(see annotation_queue.py)')
+    argparser.add_argument('--annotator', help='your name or initials (required with --queue)')
+    argparser.add_argument('--double-code', type=float, default=0.0,
+                            help='fraction of newly queued files to be transcribed by two annotators. Default is 0.')
+    argparser.add_argument('--files', help='tsv listing the files of the folder to transcribe, in a filename column '
+                                           '(e.g. the inter-rater sample of analysis/sample_inter-rater.py)')
     args = argparser.parse_args()
-    annotate(args.folder, args.dest_file, args.call_ext_player, args.player_path)
+    if args.queue and not args.annotator:
+        argparser.error('--queue needs --annotator')
+    annotate(args.folder, args.dest_file, args.call_ext_player, args.player_path, args.prefetch,
+             args.queue, args.annotator, args.double_code, args.files)
@@ -0,0 +1,221 @@
+"""Shared work queue for several transcribers running annotate.py at the same time."""
+# A SQLite file hands out recordings to annotators with time-limited leases:
+# a recording is leased to one annotator at a time, and to as many different
+# annotators as it needs codings (2 for the double-coded inter-rater sample).
+# Leases of a client that crashed or was left running expire, so the
+# recording goes back into the queue. All annotations end up in the same
+# database, and can be written out as one tsv per annotator, in the layout
+# of transcriptions.tsv:
+#
+#   python annotate.py <folder> transcription_MB 0 --queue annotations.sqlite --annotator MB
+#   python annotation_queue.py annotations.sqlite status
+#   python annotation_queue.py annotations.sqlite import transcription_petrus.tsv petrus
+#   python annotation_queue.py annotations.sqlite export transcription_petrus.tsv --annotator petrus
+#
+# SQLite locks the file for every change, so keep it on a local disk (not a
+# network share), shared by the clients on that computer.
+import argparse
+import contextlib
+import csv
+import hashlib
+import sqlite3
+import time
+
+COLUMNS = ['filename', 'transcription', 'comment', 'block', 'date_time', 'participant', 'trial']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    filename TEXT PRIMARY KEY,
+    coders_needed INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS leases (
+    filename TEXT,
+    annotator TEXT,
+    expires REAL,
+    PRIMARY KEY (filename, annotator)
+);
+CREATE TABLE IF NOT EXISTS annotations (
+    filename TEXT,
+    annotator TEXT,
+    transcription TEXT,
+    comment TEXT,
+    block TEXT,
+    date_time TEXT,
+    participant TEXT,
+    trial TEXT,
+    time REAL,
+    PRIMARY KEY (filename, annotator)
+);
+"""
+
+NEXT_ITEM = """
+SELECT filename FROM items i
+WHERE coders_needed > (SELECT COUNT(*) FROM annotations a WHERE a.filename = i.filename)
+                    + (SELECT COUNT(*) FROM leases l WHERE l.filename = i.filename)
+  AND NOT EXISTS (SELECT 1 FROM annotations a WHERE a.filename = i.filename AND a.annotator = :annotator)
+  AND NOT EXISTS (SELECT 1 FROM leases l WHERE l.filename = i.filename AND l.annotator = :annotator)
+ORDER BY filename
+LIMIT 1
+"""
+
+
+def double_code_draw(fname):
+    """Number in [0, 1) fixed by the filename, so every client makes the same double-coding choice."""
+    return int(hashlib.md5(fname.encode('utf-8')).hexdigest()[:8], 16) / 16 ** 8
+
+
+class AnnotationQueue:
+    """Recordings to annotate, leases on them, and the annotations, in one SQLite file."""
+
+    def __init__(self, path, lease_secs=600):
+        self.path = path
+        self.lease_secs = lease_secs
+        # autocommit mode; changes are grouped in explicit (immediate) transactions
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        self.db.execute('BEGIN IMMEDIATE')  # takes the write lock before reading
+        try:
+            yield
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+    def add_files(self, fnames, double_code=0.0):
+        """Add recordings to the queue (known ones are left as they are).
+
+        A fraction ``double_code`` of them is to be coded by two annotators.
+        """
+        with self._transaction():
+            self.db.executemany('INSERT OR IGNORE INTO items VALUES (?, ?)',
+                                [(fname, 2 if double_code_draw(fname) < double_code else 1)
+                                 for fname in fnames])
+
+    def set_coders(self, fnames, coders=2):
+        """Have recordings (e.g. the inter-rater sample) coded by ``coders`` annotators."""
+        with self._transaction():
+            self.db.executemany('INSERT INTO items VALUES (?, ?) ON CONFLICT (filename) '
+                                'DO UPDATE SET coders_needed = excluded.coders_needed',
+                                [(fname, coders) for fname in fnames])
+
+    def lease(self, annotator, skip=()):
+        """Next recording for ``annotator`` (leased for ``lease_secs``), or None if there is none.
+
+        A lease the annotator still holds (e.g. after restarting the client)
+        is handed out again first, unless it is in ``skip`` (the leases the
+        client already has, e.g. the recordings it reads ahead).
+        """
+        now = time.time()
+        with self._transaction():
+            self.db.execute('DELETE FROM leases WHERE expires <= ?', (now,))
+            held = [row[0] for row in self.db.execute(
+                'SELECT filename FROM leases WHERE annotator = ? ORDER BY filename', (annotator,))
+                    if row[0] not in skip]
+            if held:
+                fname = held[0]
+            else:
+                row = self.db.execute(NEXT_ITEM, {'annotator': annotator}).fetchone()
+                if row is None:
+                    return None
+                fname = row[0]
+            self.db.execute('INSERT OR REPLACE INTO leases VALUES (?, ?, ?)',
+                            (fname, annotator, now + self.lease_secs))
+        return fname
+
+    def renew(self, fname, annotator):
+        """Extend the lease, e.g. while the annotator is still listening."""
+        self.db.execute('UPDATE leases SET expires = ? WHERE filename = ? AND annotator = ?',
+                        (time.time() + self.lease_secs, fname, annotator))
+
+    def release(self, fname, annotator):
+        """Give a leased recording back without annotating it."""
+        self.db.execute('DELETE FROM leases WHERE filename = ? AND annotator = ?', (fname, annotator))
+
+    def submit(self, annotator, entry):
+        """Store an annotation (a dict with the keys of ``COLUMNS``) and end its lease."""
+        with self._transaction():
+            self.db.execute('INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            [entry['filename'], annotator] +
+                            [entry.get(column, '') for column in COLUMNS[1:]] + [time.time()])
+            self.db.execute('DELETE FROM leases WHERE filename = ? AND annotator = ?',
+                            (entry['filename'], annotator))
+
+    def import_tsv(self, path, annotator):
+        """Add the annotations of an annotate.py tsv file (their recordings are added too)."""
+        with open(path, newline='', encoding='utf-8') as f:
+            entries = list(csv.DictReader(f, delimiter='\t'))
+        with self._transaction():
+            self.db.executemany('INSERT OR IGNORE INTO items (filename) VALUES (?)',
+                                [(entry['filename'],) for entry in entries])
+            self.db.executemany('INSERT OR IGNORE INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                [[entry['filename'], annotator] +
+                                 [entry.get(column) or '' for column in COLUMNS[1:]] + [None]
+                                 for entry in entries])
+        return len(entries)
+
+    def export_tsv(self, path, annotator=None):
+        """Write the annotations (of one annotator, or all of them) as an annotate.py tsv file."""
+        query = 'SELECT %s FROM annotations' % ', '.join(COLUMNS)
+        params = ()
+        if annotator is not None:
+            query += ' WHERE annotator = ?'
+            params = (annotator,)
+        rows = self.db.execute(query + ' ORDER BY filename', params).fetchall()
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+            writer.writerow(COLUMNS)
+            writer.writerows(rows)
+        return len(rows)
+
+    def status(self):
+        """Recordings still to code, codings done per annotator, and active leases."""
+        now = time.time()
+        todo = self.db.execute(
+            'SELECT COALESCE(SUM(MAX(coders_needed - (SELECT COUNT(*) FROM annotations a '
+            'WHERE a.filename = i.filename), 0)), 0), COUNT(*) FROM items i').fetchone()
+        done = self.db.execute('SELECT annotator, COUNT(*) FROM annotations GROUP BY annotator '
+                               'ORDER BY annotator').fetchall()
+        leases = self.db.execute('SELECT annotator, filename FROM leases WHERE expires > ?',
+                                 (now,)).fetchall()
+        lines = ['%d recordings, %d codings to do' % (todo[1], todo[0])]
+        lines += ['%s: %d done' % row for row in done]
+        lines += ['%s is working on %s' % row for row in leases]
+        return '\n'.join(lines)
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser('shared work queue for annotate.py')
+    argparser.add_argument('db', help='SQLite file of the queue')
+    commands = argparser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help='show what is done and who is working on what')
+    import_parser = commands.add_parser('import', help='add the annotations of a tsv file')
+    import_parser.add_argument('tsv')
+    import_parser.add_argument('annotator')
+    export_parser = commands.add_parser('export', help='write annotations to a tsv file')
+    export_parser.add_argument('tsv')
+    export_parser.add_argument('--annotator', help='only the annotations of this annotator')
+    double_parser = commands.add_parser('double-code', help='have the recordings listed in a file '
+                                        '(first column, e.g. an inter-rater sample) coded twice')
+    double_parser.add_argument('list')
+    args = argparser.parse_args()
+
+    queue = AnnotationQueue(args.db)
+    if args.command == 'status':
+        print(queue.status())
+    elif args.command == 'import':
+        print(f'imported {queue.import_tsv(args.tsv, args.annotator)} annotations')
+    elif args.command == 'export':
+        print(f'wrote {queue.export_tsv(args.tsv, args.annotator)} annotations to {args.tsv}')
+    elif args.command == 'double-code':
+        with open(args.list, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f, delimiter='\t'))
+        fnames = [row[0] for row in rows[1:] if row]  # skip the header
+        queue.set_coders(fnames, 2)
+        print(f'{len(fnames)} recordings will be coded twice')
+    queue.close()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Audio helpers for recording participant responses in sp13_replication_swe.py.
+
+NB: the experiment runs under StandalonePsychoPy2 (Python 2.7), so keep this
+module Python 2 compatible.
+"""
+
+from __future__ import absolute_import, division
+import atexit
+import threading
+import time
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+import numpy as np
+import sounddevice as sd
+from psychopy import core, logging
+
+from speech_fncs import save_recording
+
+
+class StreamRecorder(object):
+    """Record from the default input device only for as long as needed.
+
+    The input stream is opened once and started/stopped on every trial. Its
+    callback copies incoming blocks into a buffer that grows (doubling) when
+    full, so a trial costs only as much memory as the response it captured.
+    A ``detector`` (a VoiceOnsetDetector) is fed every block as it arrives,
+    and the time of the first sample on ``core.monotonicClock`` is kept, so
+    ``speech()`` has the voice onset and speech duration as soon as the
+    recording stops.
+    """
+
+    def __init__(self, samplerate, channels=1, init_secs=10, max_secs=None, detector=None):
+        self.samplerate = samplerate
+        self.detector = detector
+        self.t_first = None  # time of the first sample of the current trial
+        self.channels = channels
+        self.max_frames = None if max_secs is None else int(max_secs * samplerate)
+        self._buffer = np.zeros((int(init_secs * samplerate), channels), dtype='float32')
+        self._nframes = 0
+        self._lock = threading.Lock()
+        self.overflows = 0  # input overflows reported by PortAudio in the current trial
+        self._stream = sd.InputStream(samplerate=samplerate, channels=channels,
+                                      dtype='float32', callback=self._callback)
+
+    def _callback(self, indata, frames, time, status):
+        if status.input_overflow:
+            self.overflows += 1
+        if self.t_first is None:
+            now = core.monotonicClock.getTime()
+            if time is not None and time.inputBufferAdcTime:
+                # when the block was captured, by PortAudio's clock
+                self.t_first = now - (time.currentTime - time.inputBufferAdcTime)
+            else:
+                self.t_first = now - frames / self.samplerate
+        with self._lock:
+            if self.max_frames is not None:
+                frames = min(frames, self.max_frames - self._nframes)
+                if frames <= 0:
+                    return
+            end = self._nframes + frames
+            if end > len(self._buffer):
+                # grow by doubling so that reallocations are rare
+                new_len = max(end, 2 * len(self._buffer))
+                grown = np.zeros((new_len, self.channels), dtype='float32')
+                grown[:self._nframes] = self._buffer[:self._nframes]
+                self._buffer = grown
+            self._buffer[self._nframes:end] = indata[:frames]
+            self._nframes = end
+        if self.detector is not None:
+            self.detector.feed(indata[:frames])
+
+    def start(self):
+        """Discard any previous recording and start capturing."""
+        with self._lock:
+            self._nframes = 0
+        self.overflows = 0
+        self.t_first = None
+        if self.detector is not None:
+            self.detector.reset()
+        self._stream.start()
+
+    def stop(self):
+        """Stop capturing and return a copy of the captured samples."""
+        self._stream.stop()
+        with self._lock:
+            return self._buffer[:self._nframes].copy()
+
+    @property
+    def duration(self):
+        """Seconds captured so far in the current trial."""
+        return self._nframes / self.samplerate
+
+    def speech(self, t_ref):
+        """(voice onset in s after ``t_ref``, seconds of speech) of the last recording.
+
+        ``t_ref`` is a time on ``core.monotonicClock`` (e.g. when the beep was
+        played); the onset is None if the detector found no speech.
+        """
+        detector = self.detector
+        detector.finish()
+        if detector.onset is None or self.t_first is None:
+            return None, detector.speech_secs
+        return self.t_first + detector.onset / self.samplerate - t_ref, detector.speech_secs
+
+    def close(self):
+        self._stream.close()
+
+
+class VoiceOnsetDetector(object):
+    """Streaming voice activity detection on the blocks of an input stream.
+
+    The blocks given to ``feed()`` are cut into ``frame_secs`` frames. A frame
+    counts as speech if its energy is ``threshold_db`` above the noise floor
+    (the quietest frame so far) and above ``floor_db``; only runs of at least
+    ``min_speech_secs`` count (no clicks). Frames in the first ``ignore_secs``
+    are not speech (the beep may be picked up by the microphone). ``onset`` is
+    the first sample of speech, ``speech_secs`` the total duration of speech.
+    The same criteria are used offline by speech_fncs.find_speech().
+    """
+
+    def __init__(self, samplerate, threshold_db=12.0, floor_db=-55.0, min_speech_secs=0.05,
+                 frame_secs=0.01, ignore_secs=0.0):
+        self.samplerate = samplerate
+        self.threshold_db = threshold_db
+        self.floor_db = floor_db
+        self.frame_len = max(1, int(round(frame_secs * samplerate)))
+        self.min_frames = max(1, int(round(min_speech_secs / frame_secs)))
+        self.ignore_frames = int(round(ignore_secs / frame_secs))
+        self.reset()
+
+    def reset(self):
+        self._rest = np.zeros(0, dtype='float32')  # samples not yet making up a frame
+        self._nframes = 0
+        self._noise_db = None
+        self._run = 0  # length of the current run of speech frames
+        self._speech_frames = 0
+        self.onset = None
+
+    def feed(self, block):
+        mono = block.mean(axis=1) if block.ndim > 1 else block
+        samples = np.concatenate([self._rest, mono])
+        nframes = len(samples) // self.frame_len
+        self._rest = samples[nframes * self.frame_len:]
+        frames = samples[:nframes * self.frame_len].astype('float64').reshape(nframes, self.frame_len)
+        for energy in 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12):
+            frame = self._nframes
+            self._nframes += 1
+            if energy > -100 and (self._noise_db is None or energy < self._noise_db):
+                self._noise_db = energy  # (digital silence at the stream start doesn't count)
+            threshold = self.floor_db
+            if self._noise_db is not None:
+                threshold = max(threshold, self._noise_db + self.threshold_db)
+            if frame < self.ignore_frames or energy <= threshold:
+                self._end_run()
+                continue
+            self._run += 1
+            if self._run == self.min_frames and self.onset is None:
+                self.onset = (frame - self.min_frames + 1) * self.frame_len
+
+    def _end_run(self):
+        if self._run >= self.min_frames:
+            self._speech_frames += self._run
+        self._run = 0
+
+    def finish(self):
+        """Count a run of speech that lasts until the end of the recording."""
+        self._end_run()
+
+    @property
+    def speech_secs(self):
+        return self._speech_frames * self.frame_len / self.samplerate
+
+
+class AsyncWavWriter(object):
+    """Write recordings to disk from a background thread.
+
+    ``write()`` only puts the samples on a bounded queue, so a slow disk delays
+    the worker rather than the next trial. If the queue is full, ``write()``
+    blocks until there is room (and logs a warning) instead of dropping data.
+    Every write is logged with its queueing and writing latency; ``flush()``
+    waits until the queue is empty and logs summary stats. A path ending in
+    .flac is trimmed to the speech first (speech_fncs.save_recording).
+    """
+
+    def __init__(self, maxsize=16):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stats_lock = threading.Lock()
+        self._latencies = []  # (seconds in queue, seconds writing) per file since last flush
+        self._worker = threading.Thread(target=self._run, name='AsyncWavWriter')
+        self._worker.daemon = True
+        self._worker.start()
+        self._closed = False
+        # core.quit() ends in sys.exit(), so this also covers the Esc paths
+        atexit.register(self.close)
+
+    def write(self, path, samples, samplerate):
+        item = (path, samples, samplerate, time.time())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logging.warning('wav writer: queue full (%d files), waiting' % self._queue.maxsize)
+            self._queue.put(item)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                path, samples, samplerate, t_queued = item
+                t_start = time.time()
+                try:
+                    start, end, speech = save_recording(path, samples, samplerate)
+                except Exception as e:
+                    logging.error('wav writer: could not write %s (%s)' % (path, e))
+                    continue
+                t_done = time.time()
+                with self._stats_lock:
+                    self._latencies.append((t_start - t_queued, t_done - t_start))
+                logging.exp('wav writer: wrote %s (%.2f-%.2f s of %.2f s), queued %.1f ms, '
+                            'write %.1f ms, backlog %d' % (
+                    path, start / samplerate, end / samplerate, len(samples) / samplerate,
+                    1000 * (t_start - t_queued), 1000 * (t_done - t_start), self._queue.qsize()))
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued recording is on disk; log latency stats."""
+        self._queue.join()
+        with self._stats_lock:
+            latencies, self._latencies = self._latencies, []
+        if latencies:
+            queued, written = np.array(latencies).T * 1000
+            logging.exp('wav writer: %d files, queued mean %.1f / max %.1f ms, '
+                        'write mean %.1f / max %.1f ms' % (
+                            len(latencies), queued.mean(), queued.max(),
+                            written.mean(), written.max()))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        self._queue.put(None)
+        self._worker.join()
+        logging.flush()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Catalog of the response recordings: one typed row per file, in SQLite.
+
+The recordings are named like ``audio_fname`` in sp13_replication_swe.py,
+<participant>_sp13_replication_swe_<date>_block_<n>_<loop>_<trial>.wav/.flac.
+``RecordingCatalog.refresh()`` parses the names (exclusion_fncs.parse_fname)
+and reads the audio headers only of files that are new or changed since the
+last refresh, and drops files that are gone; the tools then query the table
+instead of listing and regex-matching the folder. The catalog of a folder is
+kept next to it, in <folder>_catalog.sqlite:
+
+    python catalog_fncs.py sound_recording
+
+NB: runs under StandalonePsychoPy2 (Python 2.7) as well as Python 3.
+"""
+
+from __future__ import absolute_import, division, print_function
+import os
+import sqlite3
+
+import soundfile as sf
+
+from exclusion_fncs import parse_fname
+
+COLUMNS = ['filename', 'session', 'participant', 'date', 'block', 'loop', 'trial',
+           'frames', 'samplerate', 'duration', 'size', 'mtime']
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    filename TEXT PRIMARY KEY,
+    session TEXT,
+    participant INTEGER,
+    date TEXT,
+    block INTEGER,
+    loop TEXT,
+    trial INTEGER,
+    frames INTEGER,
+    samplerate INTEGER,
+    duration REAL,
+    size INTEGER,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS recordings_session ON recordings (session, block, trial);
+"""
+AUDIO_EXTENSIONS = ('.wav', '.flac')
+# PsychoPy's data.getDateStr() writes English month names (strptime's %b would follow the
+# locale, e.g. Swedish on the lab computers)
+MONTHS = dict((name, i + 1) for i, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']))
+
+
+def session_date(session):
+    """ISO date and time of a session name (its date is as in PsychoPy's data file names), or None."""
+    year, month, day, hhmm = session.split('_')[-4:]  # e.g. 2020_Nov_13_1104
+    if month not in MONTHS:
+        return None
+    return '%s-%02d-%s %s:%s' % (year, MONTHS[month], day, hhmm[:2], hhmm[2:])
+
+
+class RecordingCatalog(object):
+    """The recordings of ``folder``, in the SQLite file ``path`` (default: <folder>_catalog.sqlite)."""
+
+    def __init__(self, folder, path=None):
+        self.folder = folder
+        self.path = path or os.path.normpath(folder) + '_catalog.sqlite'
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+
+    def _row(self, fname, stat):
+        parts = parse_fname(fname)
+        if parts is None or parts['block'] is None:
+            session = participant = date = block = loop = trial = None
+        else:
+            session, loop = parts['session'], parts['loop']
+            participant, block, trial = int(parts['participant']), int(parts['block']), int(parts['trial'])
+            date = session_date(session)
+        try:
+            info = sf.info(os.path.join(self.folder, fname))
+            frames, samplerate = info.frames, info.samplerate
+            duration = frames / samplerate
+        except RuntimeError:  # not readable (e.g. still being written)
+            frames = samplerate = duration = None
+        return (fname, session, participant, date, block, loop, trial,
+                frames, samplerate, duration, stat.st_size, stat.st_mtime)
+
+    def refresh(self):
+        """Add new and changed recordings, remove deleted ones; returns (added/updated, removed)."""
+        known = dict((fname, (size, mtime)) for fname, size, mtime in
+                     self.db.execute('SELECT filename, size, mtime FROM recordings'))
+        rows, present = [], set()
+        for fname in os.listdir(self.folder):
+            if not fname.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            present.add(fname)
+            stat = os.stat(os.path.join(self.folder, fname))
+            if known.get(fname) != (stat.st_size, stat.st_mtime):
+                rows.append(self._row(fname, stat))
+        removed = [(fname,) for fname in known if fname not in present]
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO recordings VALUES (%s)'
+                                % ', '.join('?' * len(COLUMNS)), rows)
+            self.db.executemany('DELETE FROM recordings WHERE filename = ?', removed)
+        return len(rows), len(removed)
+
+    def query(self, where='1', params=()):
+        """Rows (dicts) matching an SQL condition, e.g. ``query('loop = ?', ('word_presentation',))``."""
+        cursor = self.db.execute('SELECT %s FROM recordings WHERE %s ORDER BY filename'
+                                 % (', '.join(COLUMNS), where), params)
+        return [dict(zip(COLUMNS, row)) for row in cursor]
+
+    def to_frame(self, where='1', params=()):
+        """``query()`` as a pandas DataFrame."""
+        import pandas
+        return pandas.DataFrame(self.query(where, params), columns=COLUMNS)
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    argparser = argparse.ArgumentParser('update the catalog of a folder of recordings')
+    argparser.add_argument('folder', help='folder with the recordings (e.g. sound_recording)')
+    argparser.add_argument('--catalog', help='SQLite file (default: <folder>_catalog.sqlite)')
+    args = argparser.parse_args()
+    catalog = RecordingCatalog(args.folder, args.catalog)
+    added, removed = catalog.refresh()
+    nfiles, nsessions, hours = catalog.db.execute(
+        'SELECT COUNT(*), COUNT(DISTINCT session), COALESCE(SUM(duration), 0) / 3600 FROM recordings').fetchone()
+    print('%s: %d added or updated, %d removed; %d recordings of %d sessions, %.1f h' % (
+        catalog.path, added, removed, nfiles, nsessions, hours))
+    catalog.close()
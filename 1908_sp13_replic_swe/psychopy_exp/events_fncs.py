@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compact, typed event log for sp13_replication_swe.py.
+
+NB: the experiment runs under StandalonePsychoPy2 (Python 2.7), so keep this
+module Python 2 compatible.
+"""
+
+from __future__ import absolute_import, division
+import io
+import threading
+
+import numpy as np
+from psychopy import core
+
+
+class EventLog(object):
+    """Typed events with numeric codes, buffered in memory and written between trials.
+
+    Each event is an 18-byte ``DTYPE`` record: the time on
+    ``core.monotonicClock`` (the clock of the .log and tap files), the event
+    type, the item it is about (a routine, stimulus, key, MIDI port, ...),
+    the block and trial it happened in, and an integer value:
+
+    - routine_start / routine_end: routine; value is the number of frames at the end
+    - trial_start / trial_end: loop name; value is the trial number
+    - stim_onset / stim_offset: stimulus; time of the flip that showed the change, value the frame
+    - key: key name; value is the RT in ms (-1 if not stored)
+    - tap: MIDI port; value is the note (only onsets, at arrival)
+    - audio_start / audio_stop: value is the number of samples recorded at the stop
+
+    ``add()`` only writes into a preallocated array (it may be called from the
+    MIDI threads). Events given to ``on_flip()`` wait for ``flipped(t)``,
+    which gets the return value of the ``win.flip()`` that showed them (as
+    timing_fncs.FlipTimeLog does). ``flush()`` appends the buffered records to ``path`` and
+    rewrites the code tables in <path without .bin>_codes.tsv (columns field,
+    code, name). See read_eventf() in analysis/myfunctions/paradiddle_fncs.R.
+    """
+
+    EVENTS = ('routine_start', 'routine_end', 'trial_start', 'trial_end',
+              'stim_onset', 'stim_offset', 'key', 'tap', 'audio_start', 'audio_stop')
+    DTYPE = np.dtype([('t', '<f8'), ('event', 'u1'), ('item', 'u1'),
+                      ('block', '<i2'), ('trial', '<i2'), ('value', '<i4')])
+
+    def __init__(self, path, init_events=4096):
+        self.path = path
+        self.codes_path = path[:-len('.bin')] + '_codes.tsv' if path.endswith('.bin') else path + '_codes.tsv'
+        self._records = np.zeros(init_events, dtype=self.DTYPE)
+        self._nrecords = 0
+        self._event_codes = dict((event, code) for code, event in enumerate(self.EVENTS))
+        self._items = {}  # name -> code, in the order of first use
+        self._lock = threading.Lock()
+        self._waiting = []  # (event, item, value) of on_flip() events not flipped yet
+        self.block = -1
+        self.trial = -1
+
+    def set_trial(self, block, trial):
+        self.block, self.trial = block, trial
+
+    def add(self, event, item='', value=0, t=None):
+        if t is None:
+            t = core.monotonicClock.getTime()
+        with self._lock:
+            item_code = self._items.get(item)
+            if item_code is None:
+                item_code = self._items[item] = len(self._items)
+            if self._nrecords == len(self._records):
+                self._records = np.concatenate([self._records, np.zeros_like(self._records)])
+            self._records[self._nrecords] = (t, self._event_codes[event], item_code,
+                                             self.block, self.trial, value)
+            self._nrecords += 1
+
+    def on_flip(self, event, item, value=0):
+        """Add the event with the time of the next flip (when it is on screen)."""
+        self._waiting.append((event, item, value))
+
+    def flipped(self, t):
+        """Add the events waiting for the flip at ``t`` (what ``win.flip()`` returned)."""
+        waiting, self._waiting = self._waiting, []
+        for event, item, value in waiting:
+            self.add(event, item, value, t)
+
+    def flush(self):
+        with self._lock:
+            records = self._records[:self._nrecords].copy()
+            self._nrecords = 0
+            items = sorted(self._items.items(), key=lambda item: item[1])
+        with open(self.path, 'ab') as f:
+            records.tofile(f)
+        with io.open(self.codes_path, 'w', encoding='utf-8') as f:
+            f.write(u'field\tcode\tname\n')
+            for code, event in enumerate(self.EVENTS):
+                f.write(u'event\t%d\t%s\n' % (code, event))
+            for name, code in items:
+                f.write(u'item\t%d\t%s\n' % (code, name))
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Which data files and recordings are excluded from transcription and analysis.
+
+The rules are in exclusions.tsv (columns rule, value, note), shared by
+annotate.py, annotation_queue.py and analysis/sample_inter-rater.py:
+
+- ``loop``: recordings of trials in this loop (e.g. word_presentation_practice)
+- ``participants``: a range of participant IDs, e.g. 900-999 (testing)
+- ``marker``: file names containing this (e.g. the RAs' *_excl.csv)
+- ``session``: everything of a session, <participant>_sp13_replication_swe_<date>
+
+File names are those of the experiment: <session>.csv/.log/... for the data
+and <session>_block_<n>_<loop>_<trial>.wav/.flac for the recordings.
+``index(folder)`` sorts the files of a folder into included and excluded
+ones; a registry keeps the result until the folder (or exclusions.tsv)
+changes, so repeated lookups in one run (e.g. of a long-running tool) are
+set lookups. Each run starts with an empty cache.
+
+    python exclusion_fncs.py sound_recording   # what is excluded, and why
+"""
+
+from __future__ import absolute_import, division, print_function
+import csv
+import io
+import os
+import re
+
+_thisDir = os.path.dirname(os.path.abspath(__file__))
+
+FNAME = re.compile(r'^(?P<session>(?P<participant>\d+)_sp13_replication_swe_\d{4}_[A-Za-z]{3}_\d{2}_\d{4})'
+                   r'(?:_block_(?P<block>\d+)_(?P<loop>.+)_(?P<trial>\d+))?')
+
+
+def parse_fname(fname):
+    """Session, participant, block, loop and trial of a file name (None where not in the name)."""
+    match = FNAME.match(os.path.splitext(fname)[0])
+    if match is None:
+        return None
+    return match.groupdict()
+
+
+class FolderIndex(object):
+    """Files of a folder: ``included`` (sorted list) and ``excluded`` (dict name -> reason)."""
+
+    def __init__(self, registry, fnames):
+        self.included = []
+        self.excluded = {}
+        for fname in sorted(fnames):
+            reason = registry.reason(fname)
+            if reason is None:
+                self.included.append(fname)
+            else:
+                self.excluded[fname] = reason
+        self._included = set(self.included)
+
+    def __contains__(self, fname):
+        return fname in self._included
+
+
+class ExclusionRegistry(object):
+    """The rules of exclusions.tsv, plus optionally the participants marked valid by the RAs."""
+
+    def __init__(self, path=os.path.join(_thisDir, 'exclusions.tsv')):
+        self.path = path
+        self.loops = {}
+        self.ranges = []
+        self.markers = []
+        self.sessions = {}
+        self.valid_participants = None
+        self._cache = {}
+        self._mtime = os.path.getmtime(path)
+        with io.open(path, encoding='utf-8') as f:
+            for line in f.read().splitlines()[1:]:
+                if not line.strip():
+                    continue
+                rule, value, note = (line.split('\t') + [''])[:3]
+                if rule == 'loop':
+                    self.loops[value] = note
+                elif rule == 'participants':
+                    first, last = value.split('-')
+                    self.ranges.append((int(first), int(last), note))
+                elif rule == 'marker':
+                    self.markers.append((value, note))
+                elif rule == 'session':
+                    self.sessions[value] = note
+                else:
+                    raise ValueError('%s: unknown rule %r' % (path, rule))
+
+    def require_valid_participants(self, path, max_code=2):
+        """Also exclude participants without any session coded <= ``max_code`` (1 = valid,
+        2 = valid replacement, 9 = not valid) in the 2nd column of a participant data file."""
+        valid = set()
+        with io.open(path, encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            next(reader)
+            for row in reader:
+                try:
+                    if row and float(row[1]) <= max_code:
+                        valid.add(row[0].split(',')[0].strip())
+                except ValueError:  # not coded (yet)
+                    continue
+        self.valid_participants = valid
+        self._cache = {}
+
+    def reason(self, fname):
+        """Why ``fname`` is excluded, or None if it is included."""
+        for marker, note in self.markers:
+            if marker in fname:
+                return note
+        parts = parse_fname(fname)
+        if parts is None:
+            return None
+        if parts['session'] in self.sessions:
+            return self.sessions[parts['session']]
+        participant = int(parts['participant'])
+        for first, last, note in self.ranges:
+            if first <= participant <= last:
+                return note
+        if parts['loop'] in self.loops:
+            return self.loops[parts['loop']]
+        if self.valid_participants is not None and parts['participant'] not in self.valid_participants:
+            return 'not a valid participant'
+        return None
+
+    def index(self, folder):
+        """FolderIndex of ``folder``, rebuilt only if the folder or the rules changed."""
+        key = os.path.abspath(folder)
+        mtimes = (os.path.getmtime(folder), os.path.getmtime(self.path))
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != mtimes:
+            cached = self._cache[key] = (mtimes, FolderIndex(self, os.listdir(folder)))
+        return cached[1]
+
+
+if __name__ == '__main__':
+    import argparse
+    argparser = argparse.ArgumentParser('list the files of a folder that are excluded, and why')
+    argparser.add_argument('folder')
+    argparser.add_argument('--participant-data', help='also exclude participants not marked valid in this file')
+    args = argparser.parse_args()
+    registry = ExclusionRegistry()
+    if args.participant_data:
+        registry.require_valid_participants(args.participant_data)
+    index = registry.index(args.folder)
+    for fname in sorted(index.excluded):
+        print('%s\t%s' % (fname, index.excluded[fname]))
+    print('%d files included, %d excluded' % (len(index.included), len(index.excluded)))
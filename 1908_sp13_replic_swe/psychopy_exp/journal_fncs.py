@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Append-only trial journal for sp13_replication_swe.py, and resuming from it.
+
+Every row of the data file is appended to <datafile>_journal.jsonl as soon as
+``thisExp.nextEntry()`` has finished it, so a crash loses at most the trial
+that was running. A journal can be turned into the session's csv file (also
+from the command line, for a session that crashed and is not resumed):
+
+    python journal_fncs.py data/<datafile>_journal.jsonl
+
+A csv file that is already there (e.g. PsychoPy's save on a crash) is kept as
+<datafile>_partial_excl.csv, which the analysis skips like any *excl.csv.
+Trials that a resumed run did again (e.g. the practice, if it was
+interrupted) are in the csv once, as they were last run. The other files
+of a resumed run (pickle, taps) are named after ``resumed_stem()``, so the
+interrupted run's files are kept.
+
+NB: the experiment runs under StandalonePsychoPy2 (Python 2.7), so keep this
+module Python 2 compatible.
+"""
+
+from __future__ import absolute_import, division, print_function
+import csv
+import glob
+import io
+import json
+import os
+import sys
+
+
+def _jsonable(value):
+    """JSON stand-in for values json can't write (numpy scalars and arrays, ...)."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return '%s' % value
+
+
+class TrialJournal(object):
+    """JSON lines file of session events; one line is one record (a dict).
+
+    Each record is written through to the OS straight away (that survives a
+    crash of the experiment), but only every ``fsync_every`` records and on
+    ``sync()`` is the file forced to disk (that also survives a power cut).
+    The fsync costs a few ms, so ``sync()`` is called between blocks.
+    """
+
+    def __init__(self, path, fsync_every=10):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._file = io.open(path, 'ab')
+        self._unsynced = 0
+
+    def append(self, record):
+        line = json.dumps(record, default=_jsonable, sort_keys=True) + '\n'
+        self._file.write(line.encode('utf-8'))
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def read_journal(path):
+    """The records of a journal; a last line cut off by a crash is skipped."""
+    records = []
+    with io.open(path, 'rb') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line.decode('utf-8')))
+            except ValueError:
+                break
+    return records
+
+
+def find_journal(data_dir, participant, exp_name):
+    """Journal of the participant's most recent session, or None."""
+    paths = glob.glob(os.path.join(data_dir, '%s_%s_*_journal.jsonl' % (participant, exp_name)))
+    if not paths:
+        return None
+    return max(paths, key=os.path.getmtime)
+
+
+class ResumeState(object):
+    """Where a journaled session stopped.
+
+    ``exp_info`` is the expInfo of the session (its date makes the file
+    names), ``practice_done`` whether the practice block was finished,
+    ``training_done`` the blocks whose training was finished,
+    ``completed_blocks`` the blocks that reached their end screen and
+    ``done_trials[block]`` the target trials (``word_presentation.thisN``)
+    finished in each block. ``finished`` is True for a complete session.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.exp_info = {}
+        self.practice_done = False
+        self.training_done = set()
+        self.completed_blocks = set()
+        self.done_trials = {}
+        self.next_frame_timing_trial = 0
+        self.finished = False
+        for record in records:
+            kind = record['kind']
+            if kind == 'start':
+                self.exp_info = record['expInfo']
+            elif kind == 'end_practice':
+                self.practice_done = True
+            elif kind == 'end_training':
+                self.training_done.add(record['block'])
+            elif kind == 'end_block':
+                self.completed_blocks.add(record['block'])
+            elif kind == 'end_session':
+                self.finished = True
+            elif kind == 'entry':
+                row = record['data']
+                if 'word_presentation.thisN' in row:
+                    self.done_trials.setdefault(record['block'], set()).add(
+                        row['word_presentation.thisN'])
+                if 'frame_timing_trial' in row:
+                    self.next_frame_timing_trial = row['frame_timing_trial'] + 1
+
+    def summary(self):
+        return ('resuming: practice %s, training done in blocks %s, blocks %s completed, '
+                'target trials done %s' % (
+            'done' if self.practice_done else 'not done',
+            sorted(self.training_done) or 'none',
+            sorted(self.completed_blocks) or 'none',
+            dict((block, len(trials)) for block, trials in self.done_trials.items())))
+
+
+def _trial_key(record):
+    """Block and loop positions (``<loop>.thisN``) of an entry, or None for rows outside loops."""
+    positions = tuple(sorted((key, value) for key, value in record['data'].items()
+                             if key.endswith('.thisN')))
+    return (record['block'],) + positions if positions else None
+
+
+def write_csv(records, path):
+    """Write the data rows of a journal as a wide csv file like thisExp.saveAsWideText.
+
+    A trial that is in the journal more than once (run again after resuming)
+    is written once, where it was run last.
+    """
+    entries = [record for record in records if record['kind'] == 'entry']
+    last = dict((_trial_key(record), i) for i, record in enumerate(entries))
+    rows = [record['data'] for i, record in enumerate(entries)
+            if _trial_key(record) is None or last[_trial_key(record)] == i]
+    columns = []
+    for row in rows:
+        columns.extend(sorted(key for key in row if key not in columns))
+
+    def cell(value):
+        if value is None:
+            return u''
+        if isinstance(value, (list, dict)):
+            return json.dumps(value)
+        return u'%s' % value
+
+    if sys.version_info[0] < 3:
+        with open(path, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow([column.encode('utf-8') for column in columns])
+            for row in rows:
+                writer.writerow([cell(row.get(column)).encode('utf-8') for column in columns])
+    else:
+        with io.open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow([cell(row.get(column)) for column in columns])
+    return len(rows)
+
+
+def resumed_stem(stem):
+    """<stem>_resumed (or _resumed2, ...), a name no file in its folder starts with yet."""
+    folder, name = os.path.split(stem)
+    fnames = os.listdir(folder or '.')
+    resumed, n = name + '_resumed', 1
+    while any(fname == resumed or fname.startswith((resumed + '.', resumed + '_')) for fname in fnames):
+        n += 1
+        resumed = '%s_resumed%d' % (name, n)
+    return os.path.join(folder, resumed)
+
+
+def save_csv(records, path):
+    """``write_csv()``, keeping an existing file at ``path`` as *_partial_excl.csv."""
+    if os.path.exists(path):
+        stem = path[:-len('.csv')]
+        backup, n = stem + '_partial_excl.csv', 1
+        while os.path.exists(backup):
+            n += 1
+            backup = '%s_partial%d_excl.csv' % (stem, n)
+        os.rename(path, backup)
+    return write_csv(records, path)
+
+
+if __name__ == '__main__':
+    import argparse
+    argparser = argparse.ArgumentParser('write the data rows of a trial journal to a csv file')
+    argparser.add_argument('journal', help='<datafile>_journal.jsonl')
+    argparser.add_argument('csv', nargs='?',
+                           help='output file (default: <datafile>.csv)')
+    args = argparser.parse_args()
+    dest = args.csv or args.journal.replace('_journal.jsonl', '.csv')
+    print('wrote %d rows to %s' % (save_csv(read_journal(args.journal), dest), dest))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Pack the per-participant list files into one indexed stimulus bundle.
+
+Reads stimuli/random_lists/p_<id>_b<block>_<kind>.csv (kind is training or
+targets) and cond-list_assignment_wide.csv, as written by
+stimuli/create_random_condition-list-assignments.R, and writes them to the
+SQLite file read by stimuli_fncs.StimulusBundle. Rerun it whenever the lists
+are regenerated:
+
+    python pack_stimuli.py [stimuli/random_lists] [stimuli/random_lists.sqlite]
+
+NB: runs under StandalonePsychoPy2 (Python 2.7) as well as Python 3.
+"""
+
+from __future__ import absolute_import, division, print_function
+import argparse
+import csv
+import io
+import os
+import re
+import sqlite3
+import sys
+
+LIST_FILE = re.compile(r'^p_(\d+)_b(\d+)_(training|targets)\.csv$')
+
+
+def read_csv(path):
+    """Rows of a utf-8 csv file as dicts of text."""
+    if sys.version_info[0] < 3:
+        with open(path, 'rb') as f:
+            return [dict((key.decode('utf-8'), value.decode('utf-8')) for key, value in row.items())
+                    for row in csv.DictReader(f)]
+    with io.open(path, encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        return f.readline().decode('utf-8').strip().split(',')
+
+
+def pack(list_dir, dest):
+    fnames = sorted(fname for fname in os.listdir(list_dir) if LIST_FILE.match(fname))
+    # all list files have the same columns (type, word1, ..., word4)
+    columns = read_header(os.path.join(list_dir, fnames[0]))
+
+    if os.path.exists(dest):
+        os.remove(dest)
+    db = sqlite3.connect(dest)
+    db.execute('CREATE TABLE trials (participant INTEGER, block INTEGER, kind TEXT, trial INTEGER, '
+               '%s, PRIMARY KEY (participant, block, kind, trial)) WITHOUT ROWID'
+               % ', '.join('"%s" TEXT' % col for col in columns))
+    db.execute('CREATE TABLE assignment (id INTEGER PRIMARY KEY, condition TEXT, list TEXT, '
+               'condit_order_file TEXT)')
+
+    for fname in fnames:
+        path = os.path.join(list_dir, fname)
+        if read_header(path) != columns:
+            raise ValueError('%s does not have the columns %s' % (path, ', '.join(columns)))
+        match = LIST_FILE.match(fname)
+        participant, block, kind = int(match.group(1)), int(match.group(2)), match.group(3)
+        db.executemany('INSERT INTO trials VALUES (?, ?, ?, ?, %s)' % ', '.join('?' * len(columns)),
+                       [(participant, block, kind, trial) + tuple(row[col] for col in columns)
+                        for trial, row in enumerate(read_csv(path))])
+
+    rows = read_csv(os.path.join(list_dir, 'cond-list_assignment_wide.csv'))
+    db.executemany('INSERT INTO assignment VALUES (?, ?, ?, ?)',
+                   [(int(row['id']), row['condition'], row['list'], row['condit_order_file'])
+                    for row in rows])
+    db.commit()
+    db.execute('VACUUM')
+    db.close()
+    print('packed %d list files and %d participants into %s' % (len(fnames), len(rows), dest))
+
+
+if __name__ == '__main__':
+    _thisDir = os.path.dirname(os.path.abspath(__file__))
+    argparser = argparse.ArgumentParser('pack the stimulus lists into one SQLite file')
+    argparser.add_argument('list_dir', nargs='?',
+                           default=os.path.join(_thisDir, 'stimuli', 'random_lists'))
+    argparser.add_argument('dest', nargs='?',
+                           default=os.path.join(_thisDir, 'stimuli', 'random_lists.sqlite'))
+    args = argparser.parse_args()
+    pack(args.list_dir, args.dest)
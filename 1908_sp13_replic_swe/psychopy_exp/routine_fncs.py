@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Table-driven routines for sp13_replication_swe.py.
+
+A routine is declared once as a list of components with their onset and
+duration in frames; ``Routine.run()`` is the single frame loop that replaces
+the per-routine loops generated by the Builder. It keeps the Builder's
+behaviour (autoDraw switching, and thereby the log lines the analysis relies
+on, keyboard handling, Esc to quit, no flip after the last frame).
+
+NB: the experiment runs under StandalonePsychoPy2 (Python 2.7), so keep this
+module Python 2 compatible.
+"""
+
+from __future__ import absolute_import, division
+
+from psychopy import core, event
+from psychopy.constants import NOT_STARTED, STARTED, FINISHED
+
+from timing_fncs import FlipTimeLog
+
+
+class Stim(object):
+    """A visual stimulus shown from frame ``onset`` for ``nframes`` frames.
+
+    With ``nframes=None`` it stays on until the routine ends. The stimulus
+    itself can be swapped between repeats (``routine['w1'].stim = ...``).
+    """
+
+    def __init__(self, stim, onset=0, nframes=None, name=None):
+        self.stim = stim
+        self.name = name or stim.name
+        self.onset = onset
+        self.offset = None if nframes is None else onset + nframes
+
+    def reset(self):
+        self.stim.status = NOT_STARTED
+
+    def start(self, frameN):
+        self.stim.frameNStart = frameN  # exact frame index
+        self.stim.setAutoDraw(True)
+
+    def stop(self, frameN):
+        self.stim.setAutoDraw(False)
+
+    @property
+    def finished(self):
+        return self.stim.status == FINISHED
+
+    def end(self):
+        self.stim.setAutoDraw(False)
+
+
+class KeyResponse(object):
+    """Keyboard response; by default any of ``keys`` ends the routine.
+
+    With ``store=True`` the last key and its RT (from the flip on which the
+    keyboard checking started) are kept, like a Builder keyboard component
+    with "store: last key"; ``add_data()`` saves them as ``<name>.keys`` and
+    ``<name>.rt``.
+    """
+
+    def __init__(self, name, keys, onset=0, nframes=None, store=False, force_end=True):
+        self.name = name
+        self.key_list = list(keys)
+        self.onset = onset
+        self.offset = None if nframes is None else onset + nframes
+        self.store = store
+        self.force_end = force_end
+        self.reset()
+
+    def reset(self):
+        self.status = NOT_STARTED
+        self.keys = None
+        self.rt = None
+        self.clock = core.Clock()
+
+    def start(self, frameN):
+        self.status = STARTED
+        if self.store:
+            self.win.callOnFlip(self.clock.reset)  # t=0 on next screen flip
+        event.clearEvents(eventType='keyboard')
+
+    def stop(self, frameN):
+        self.status = FINISHED
+
+    @property
+    def finished(self):
+        return self.status == FINISHED
+
+    def end(self):
+        pass
+
+    def add_data(self, loop):
+        loop.addData(self.name + '.keys', self.keys)
+        if self.keys is not None:  # we had a response
+            loop.addData(self.name + '.rt', self.rt)
+
+
+class Sound(object):
+    """A psychopy sound played from frame ``onset`` (it finishes automatically)."""
+
+    def __init__(self, sound, onset=0, name=None):
+        self.sound = sound
+        self.name = name or sound.name
+        self.onset = onset
+        self.offset = None
+
+    def reset(self):
+        self.sound.status = NOT_STARTED
+        self.t_start = None
+
+    def start(self, frameN):
+        self.t_start = core.monotonicClock.getTime()  # when play() was called
+        self.sound.play()
+
+    def stop(self, frameN):
+        self.sound.stop()
+
+    @property
+    def finished(self):
+        return self.sound.status == FINISHED
+
+    def end(self):
+        self.sound.stop()  # ensure sound has stopped at end of routine
+
+
+class Routine(object):
+    """A routine declared as a table of components (see the module docstring).
+
+    The routine ends when a key response asks for it, after ``max_frames``
+    frames, or when all components have finished. ``flip_log`` (a
+    timing_fncs.FlipTimeLog) is told about every stimulus on/offset and gets
+    the time of the flip that showed it, and ``frame_monitor`` (a
+    timing_fncs.FrameIntervalMonitor) gets every flip.
+    ``Routine.event_log`` (an events_fncs.EventLog shared by all routines)
+    gets the routine's start and end, the stimulus on/offsets with their flip
+    times, and the keys pressed.
+    """
+
+    event_log = None
+
+    def __init__(self, win, name, components, max_frames=None, flip_log=None,
+                 frame_monitor=None):
+        self.win = win
+        self.name = name
+        self.components = components
+        self.max_frames = max_frames
+        self.flip_log = flip_log
+        self.frame_monitor = frame_monitor
+        self._by_name = dict((comp.name, comp) for comp in components)
+        self.keyboards = [comp for comp in components if isinstance(comp, KeyResponse)]
+        for comp in self.keyboards:
+            comp.win = win
+
+    def __getitem__(self, name):
+        return self._by_name[name]
+
+    def _schedule(self):
+        """(frame, action, component) for all on/offsets, in frame order.
+
+        On the same frame, offsets come before onsets.
+        """
+        events = []
+        for i, comp in enumerate(self.components):
+            events.append((comp.onset, 1, i, 'start', comp))
+            if comp.offset is not None:
+                events.append((comp.offset, 0, i, 'stop', comp))
+        events.sort(key=lambda ev: ev[:3])
+        return [(frame, action, comp) for frame, order, i, action, comp in events]
+
+    def run(self):
+        """Run the routine; returns the number of frames it lasted."""
+        for comp in self.components:
+            comp.reset()
+        if self.flip_log is not None:
+            self.flip_log.reset()
+        if self.frame_monitor is not None:
+            self.frame_monitor.start_routine(self.name)
+        event_log = self.event_log
+        if event_log is not None:
+            event_log.add('routine_start', self.name)
+        events = self._schedule()
+        next_event = 0
+        key_list = ['escape'] + [key for comp in self.keyboards for key in comp.key_list]
+        frameN = -1
+        while True:
+            frameN += 1  # number of completed frames (so 0 is the first frame)
+
+            # start/stop the components due on this frame
+            while next_event < len(events) and events[next_event][0] <= frameN:
+                frame, action, comp = events[next_event]
+                next_event += 1
+                if action == 'start':
+                    comp.start(frameN)
+                else:
+                    comp.stop(frameN)
+                if self.flip_log is not None and isinstance(comp, Stim):
+                    self.flip_log.on_flip('%s %s' % (
+                        comp.name, 'onset' if action == 'start' else 'offset'), frameN)
+                if event_log is not None and isinstance(comp, Stim):
+                    event_log.on_flip('stim_onset' if action == 'start' else 'stim_offset',
+                                      comp.name, frameN)
+
+            # keyboard: a single getKeys() call for all key responses and Esc
+            force_end = False
+            theseKeys = event.getKeys(keyList=key_list)
+            if 'escape' in theseKeys:
+                core.quit()
+            for comp in self.keyboards:
+                if comp.status != STARTED:
+                    continue
+                pressed = [key for key in theseKeys if key in comp.key_list]
+                if pressed:  # at least one key was pressed
+                    if comp.store:
+                        comp.keys = pressed[-1]  # just the last key pressed
+                        comp.rt = comp.clock.getTime()
+                    if event_log is not None:
+                        for key in pressed:
+                            event_log.add('key', key, int(round(1000 * comp.rt)) if comp.store else -1)
+                    if comp.force_end:
+                        force_end = True
+
+            # check if the routine is over (don't flip then, or we'll get a blank screen)
+            if force_end:
+                break
+            if self.max_frames is not None and frameN >= self.max_frames:
+                break
+            if next_event == len(events) and all(comp.finished for comp in self.components):
+                break
+
+            flip_time = FlipTimeLog.flipped(self.win.flip())
+            if event_log is not None:
+                event_log.flipped(flip_time)
+            if self.frame_monitor is not None:
+                self.frame_monitor.record(flip_time)
+
+        for comp in self.components:
+            if event_log is not None and isinstance(comp, Stim) and comp.stim.status == STARTED:
+                event_log.on_flip('stim_offset', comp.name, frameN)
+            comp.end()
+        if event_log is not None:
+            event_log.add('routine_end', self.name, frameN)
+        return frameN
@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Headless simulation backend for dry runs of sp13_replication_swe.py.
+
+``install(backend)`` replaces the window, the visual stimuli, sounds, the
+keyboard, the clocks, the MIDI inputs (mido) and the microphone
+(sounddevice) with simulated ones driven by a virtual clock. The clock only
+moves when the (null) window flips, one frame at a time, so a whole session
+runs as fast as Python can loop through its frames. Keys are pressed, the
+pads hit and responses spoken by scripted participants. The experiment's own
+code (trial handlers, data and log files, tap files, wav files) is unchanged;
+see simulate.py.
+
+NB: the experiment runs under StandalonePsychoPy2 (Python 2.7), so keep this
+module Python 2 compatible.
+"""
+
+from __future__ import absolute_import, division
+import heapq
+import itertools
+import sys
+import types
+
+import numpy as np
+from psychopy import core, event, gui, logging, sound, visual
+from psychopy.constants import NOT_STARTED, STARTED, FINISHED
+
+
+# the active Simulation, or None for a real session (read by the experiment script)
+backend = None
+
+
+class VirtualClock(object):
+    """Simulated time in seconds; only ``Simulation.advance()`` moves it."""
+
+    def __init__(self):
+        self.t = 0.0
+
+    def getTime(self):
+        return self.t
+
+
+def clock_class(vclock):
+    """A drop-in for ``core.Clock`` that runs on ``vclock``."""
+
+    class Clock(object):
+        def __init__(self):
+            self.reset()
+
+        def reset(self, newT=0.0):
+            self._t0 = vclock.t + newT
+
+        def getTime(self):
+            return vclock.t - self._t0
+
+        def add(self, t):
+            self._t0 += t
+
+    return Clock
+
+
+class NullWindow(object):
+    """Window without a screen; ``flip()`` advances the simulation by one frame.
+
+    With ``drop_rate`` > 0, that fraction of flips takes two frames, so the
+    dropped-frame bookkeeping has something to report.
+    """
+
+    def __init__(self, sim, frame_rate=60.0, drop_rate=0.0, **kwargs):
+        self.sim = sim
+        self.frame_rate = frame_rate
+        self.frame_dur = 1.0 / frame_rate
+        self.drop_rate = drop_rate
+        self.name = 'NullWindow'
+        self._to_call = []
+        self._to_log = []
+        self.nflips = 0
+
+    def getActualFrameRate(self, *args, **kwargs):
+        return self.frame_rate
+
+    def callOnFlip(self, function, *args, **kwargs):
+        self._to_call.append((function, args, kwargs))
+
+    def logOnFlip(self, msg, level, obj=None):
+        self._to_log.append((msg, level, obj))
+
+    def flip(self, clearBuffer=True):
+        nframes = 2 if self.drop_rate and self.sim.rng.random_sample() < self.drop_rate else 1
+        self.sim.advance(nframes * self.frame_dur)
+        self.nflips += 1
+        for msg, level, obj in self._to_log:
+            logging.log(msg, level, obj=obj)
+        to_call, self._to_call, self._to_log = self._to_call, [], []
+        for function, args, kwargs in to_call:
+            function(*args, **kwargs)
+        return self.sim.clock.t
+
+    def clearBuffer(self):
+        pass
+
+    def setMouseVisible(self, visibility):
+        pass
+
+    def close(self):
+        pass
+
+
+class NullStim(object):
+    """Stands in for TextStim and Polygon: keeps status and logs autoDraw changes."""
+
+    def __init__(self, win, name='', text=None, autoLog=True, **kwargs):
+        self.win = win
+        self.name = name
+        self.text = text
+        self.autoLog = autoLog
+        self.status = NOT_STARTED
+        self.autoDraw = False
+
+    def setText(self, text, log=None):
+        self.text = text
+
+    def draw(self, win=None):
+        pass
+
+    def setAutoDraw(self, value, log=None):
+        # same message as psychopy's attribute logging, which paradiddle_fncs.R parses
+        if self.autoLog:
+            self.win.logOnFlip('%s: autoDraw = %s' % (self.name, value), level=logging.EXP, obj=self)
+        self.status = STARTED if value else FINISHED
+        self.autoDraw = value
+
+
+class NullSound(object):
+    """A sound that 'plays' for ``secs`` of virtual time and tells the tapper."""
+
+    def __init__(self, sim, value='A', secs=0.5, **kwargs):
+        self.sim = sim
+        self.secs = secs
+        self.name = kwargs.get('name', '')
+        self._status = NOT_STARTED
+        self._t_end = None
+
+    @property
+    def status(self):
+        if self._status == STARTED and self.sim.clock.t >= self._t_end:
+            self._status = FINISHED
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        self._status = value
+
+    def play(self, *args, **kwargs):
+        self._status = STARTED
+        self._t_end = self.sim.clock.t + self.secs
+        self.sim.tapper.on_beep(self.sim.clock.t)
+
+    def stop(self, *args, **kwargs):
+        if self._status == STARTED:
+            self._status = FINISHED
+
+    def setVolume(self, volume, *args, **kwargs):
+        pass
+
+
+class ScriptedKeyboard(object):
+    """Replaces ``event.getKeys()``/``clearEvents()``.
+
+    A key is pressed ``rt`` s (virtual) after the keyboard was last cleared,
+    i.e. after a key response started. It is the first key of the requested
+    list other than Esc, unless ``choices`` gives a sequence for that list,
+    e.g. ``{('b', 'm'): 'mb'}`` answers 'm' then 'b' (and again from the start).
+    """
+
+    def __init__(self, sim, rt=3.0, choices=None):
+        self.sim = sim
+        self.rt = rt
+        self._choices = dict((tuple(sorted(keys)), itertools.cycle(seq))
+                             for keys, seq in (choices or {}).items())
+        self._t_cleared = 0.0
+
+    def clearEvents(self, eventType=None):
+        self._t_cleared = self.sim.clock.t
+
+    def getKeys(self, keyList=None, timeStamped=False):
+        if keyList is None or self.sim.clock.t - self._t_cleared < self.rt:
+            return []
+        keys = tuple(sorted(key for key in keyList if key != 'escape'))
+        if not keys:
+            return []
+        if keys in self._choices:
+            key = next(self._choices[keys])
+        else:
+            key = [k for k in keyList if k != 'escape'][0]
+        self._t_cleared = self.sim.clock.t  # one press per response
+        logging.data('simulated key press: %s' % key)
+        return [key]
+
+
+class MidiMessage(object):
+    def __init__(self, type, note, velocity):
+        self.type = type
+        self.note = note
+        self.velocity = velocity
+
+
+class ParadiddleTapper(object):
+    """Hits the pads: paradiddles while ``tapping()``, all pads on each beep while ``listening()``.
+
+    Port 0 is the right and port 1 the left limb. ``latencies`` is added per
+    port, as a slow device would; ``error_rate`` is the chance that a hit goes
+    to the wrong pad.
+    """
+
+    PATTERN = 'RLRRLRLL'
+
+    def __init__(self, sim, ioi=0.2, first_tap=0.8, latencies=(0.0, 0.0), error_rate=0.0,
+                 note=38, hold=0.05):
+        self.sim = sim
+        self.ioi = ioi
+        self.first_tap = first_tap
+        self.latencies = latencies
+        self.error_rate = error_rate
+        self.note = note
+        self.hold = hold
+        self.tapping = lambda: False
+        self.listening = lambda: False
+        self.callbacks = {}  # port index -> mido callback
+        self._pending = []  # heap of (t, seq, port, type, velocity)
+        self._seq = itertools.count()
+        self._next_hit = None
+        self._pos = 0
+
+    def _hit(self, t, port):
+        t = t + self.latencies[port]
+        heapq.heappush(self._pending, (t, next(self._seq), port, 'note_on', 100))
+        heapq.heappush(self._pending, (t + self.hold, next(self._seq), port, 'note_off', 0))
+
+    def on_beep(self, t):
+        if self.listening() and not self.tapping():
+            t_hit = t + self.sim.rng.uniform(0, 0.03)  # the same for all limbs
+            for port in self.callbacks:
+                self._hit(t_hit, port)
+
+    def next_time(self):
+        if self.tapping():
+            if self._next_hit is None:
+                self._next_hit, self._pos = self.sim.clock.t + self.first_tap, 0
+            if not self._pending or self._next_hit < self._pending[0][0]:
+                port = 0 if self.PATTERN[self._pos % len(self.PATTERN)] == 'R' else 1
+                if self.sim.rng.random_sample() < self.error_rate:
+                    port = 1 - port
+                self._hit(self._next_hit, port)
+                self._pos += 1
+                self._next_hit += self.ioi
+        else:
+            self._next_hit = None
+        return self._pending[0][0] if self._pending else None
+
+    def fire(self):
+        t, seq, port, msg_type, velocity = heapq.heappop(self._pending)
+        callback = self.callbacks.get(port)
+        if callback is not None:
+            callback(MidiMessage(msg_type, self.note, velocity))
+
+
+class SpeakingParticipant(object):
+    """Replaces ``sounddevice.InputStream``: noise, with a tone burst as the spoken response.
+
+    The response starts ``speech_onset`` s after the stream is started and
+    lasts ``speech_dur`` s; blocks of ``blocksize`` samples are passed to the
+    callback as PortAudio would.
+    """
+
+    def __init__(self, sim, speech_onset=0.5, speech_dur=2.0, blocksize=512):
+        self.sim = sim
+        self.speech_onset = speech_onset
+        self.speech_dur = speech_dur
+        self.blocksize = blocksize
+        self.stream = None
+
+    def input_stream(self, samplerate=None, channels=1, dtype='float32', callback=None, **kwargs):
+        self.stream = SimInputStream(self, samplerate, channels, callback)
+        return self.stream
+
+    def next_time(self):
+        stream = self.stream
+        if stream is None or not stream.active:
+            return None
+        return stream.t_start + (stream.nframes + self.blocksize) / stream.samplerate
+
+    def fire(self):
+        stream = self.stream
+        n = np.arange(stream.nframes, stream.nframes + self.blocksize)
+        t = n / stream.samplerate
+        block = self.sim.rng.normal(0, 0.005, self.blocksize)
+        speech = (t >= self.speech_onset) & (t < self.speech_onset + self.speech_dur)
+        block[speech] += 0.3 * np.sin(2 * np.pi * 220 * t[speech])
+        indata = np.repeat(block[:, None], stream.channels, axis=1).astype('float32')
+        stream.nframes += self.blocksize
+        stream.callback(indata, self.blocksize, None, CallbackFlags())
+
+
+class CallbackFlags(object):
+    input_overflow = False
+    input_underflow = False
+
+
+class SimInputStream(object):
+    def __init__(self, speaker, samplerate, channels, callback):
+        self.speaker = speaker
+        self.samplerate = samplerate
+        self.channels = channels
+        self.callback = callback
+        self.active = False
+
+    def start(self):
+        self.t_start = self.speaker.sim.clock.t
+        self.nframes = 0
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+
+
+class Simulation(object):
+    """One simulated session: expInfo, where the data go and the scripted participant.
+
+    ``rng`` drives every random choice of the simulation, so a run is
+    reproducible from its ``seed``.
+    """
+
+    def __init__(self, participant, session, data_dir, seed=None, frame_rate=60.0,
+                 drop_rate=0.0, rt=3.0, choices=None, tapper_kwargs=None, speech_kwargs=None):
+        self.exp_info = {u'participant': u'%s' % participant, u'session': u'%s' % session}
+        self.data_dir = data_dir
+        self.rng = np.random.RandomState(seed)
+        self.clock = VirtualClock()
+        self.frame_rate = frame_rate
+        self.drop_rate = drop_rate
+        self.keyboard = ScriptedKeyboard(self, rt=rt, choices=choices)
+        self.tapper = ParadiddleTapper(self, **(tapper_kwargs or {}))
+        self.speaker = SpeakingParticipant(self, **(speech_kwargs or {}))
+        self.midi_names = ['simulated pad 0', 'simulated pad 1']
+
+    def advance(self, dt):
+        """Move the clock by ``dt``, delivering due MIDI and audio events at their own times."""
+        t_end = self.clock.t + dt
+        sources = (self.tapper, self.speaker)
+        while True:
+            due = [(t, i) for i, t in enumerate(src.next_time() for src in sources)
+                   if t is not None and t <= t_end]
+            if not due:
+                break
+            t, i = min(due)
+            self.clock.t = max(self.clock.t, t)
+            sources[i].fire()
+        self.clock.t = t_end
+
+    def connect_taps(self, recorder, monitor):
+        """Tap paradiddles when the trial expects them, follow beeps during calibration."""
+        self.tapper.tapping = lambda: recorder.recording and monitor.expect_taps
+        self.tapper.listening = lambda: recorder.recording
+
+    # stand-ins for the library calls made by the experiment
+    def dialog(self, dictionary=None, title='', **kwargs):
+        dictionary.update(self.exp_info)
+        return Dialog()
+
+    def window(self, *args, **kwargs):
+        self.win = NullWindow(self, self.frame_rate, self.drop_rate)
+        return self.win
+
+    def sound(self, value='A', secs=0.5, **kwargs):
+        return NullSound(self, value, secs, **kwargs)
+
+    def open_input(self, name=None, callback=None, **kwargs):
+        self.tapper.callbacks[self.midi_names.index(name)] = callback
+        return SimMidiPort(name)
+
+
+class Dialog(object):
+    OK = True
+
+
+class SimMidiPort(object):
+    def __init__(self, name):
+        self.name = name
+
+    def close(self):
+        pass
+
+
+def install(sim):
+    """Patch psychopy, mido and sounddevice so that the experiment runs in ``sim``."""
+    global backend
+    backend = sim
+    Clock = clock_class(sim.clock)
+    core.Clock = Clock
+    core.monotonicClock = Clock()
+    logging.defaultClock = core.monotonicClock  # log times are virtual, too
+    gui.DlgFromDict = sim.dialog
+    visual.Window = sim.window
+    visual.TextStim = visual.Polygon = NullStim
+    sound.Sound = sim.sound
+    event.getKeys = sim.keyboard.getKeys
+    event.clearEvents = sim.keyboard.clearEvents
+
+    mido = types.ModuleType('mido')
+    mido.get_input_names = lambda: list(sim.midi_names)
+    mido.open_input = sim.open_input
+    sys.modules['mido'] = mido
+    sd = types.ModuleType('sounddevice')
+    sd.default = types.ModuleType('sounddevice.default')  # attributes are set by the script
+    sd.InputStream = sim.speaker.input_stream
+    sys.modules['sounddevice'] = sd
+    # audio_fncs holds on to the module it imported (e.g. in an earlier simulation)
+    if 'audio_fncs' in sys.modules:
+        sys.modules['audio_fncs'].sd = sd
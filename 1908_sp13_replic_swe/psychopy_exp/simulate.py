@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Headless dry runs of sp13_replication_swe.py with simulated participants.
+
+Runs the experiment script once per participant ID of the stimulus bundle
+(the rows of cond-list_assignment_wide.csv) or for the IDs given, with
+the simulation backend of sim_fncs.py: no window, audio or MIDI devices are
+needed and the virtual clock only advances per simulated frame. Data, log,
+tap and audio files are written to their own folder, and a line per
+participant summarises what ended up in the data. A session fails if its
+audio is not complete: recordings shorter than the recorder ran, too few
+voice onsets found, or files missing from sound_recording. E.g.
+
+    python simulate.py --session 9 --data-dir data_sim
+    python simulate.py 1 2 3 --drop-rate 0.01 --tap-latency 0.012
+
+NB: StandalonePsychoPy2 (Python 2.7), like the experiment itself.
+"""
+
+from __future__ import absolute_import, division, print_function
+import argparse
+import os
+import sys
+import time
+import traceback
+
+_thisDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _thisDir)
+
+from psychopy import logging
+import sim_fncs
+from stimuli_fncs import StimulusBundle
+
+
+def participant_ids(path=os.path.join(_thisDir, 'stimuli', 'random_lists.sqlite')):
+    bundle = StimulusBundle(path)
+    try:
+        return bundle.participants()
+    finally:
+        bundle.close()
+
+
+def run_session(sim, script=os.path.join(_thisDir, 'sp13_replication_swe.py')):
+    """Run the experiment script in ``sim``; returns its global namespace."""
+    sim_fncs.install(sim)
+    namespace = {'__file__': script, '__name__': '__main__'}
+    with open(script, 'rb') as f:
+        code = compile(f.read(), script, 'exec', dont_inherit=True)
+    try:
+        exec(code, namespace)
+    except SystemExit as e:  # core.quit() at the end of the script
+        if e.code not in (None, 0):  # sys.exit("ERROR: ...") in the script
+            raise RuntimeError(e.code)
+    finally:
+        sim_fncs.backend = None
+        # the log file would otherwise also receive the next sessions' messages
+        if 'logFile' in namespace:
+            logging.root.removeTarget(namespace['logFile'])
+    return namespace
+
+
+def summarise(namespace, min_onsets=0.9, tolerance_secs=0.1):
+    """Summary of the session's data, and a list of what's wrong with its audio.
+
+    Every recording should last as long as the recorder ran (up to
+    ``max_response_time``, give or take ``tolerance_secs``), the voice onset
+    should be found in at least ``min_onsets`` of the trials (the simulated
+    participant always speaks), and every trial should have its file in
+    ``sound_dir``.
+    """
+    entries = namespace['thisExp'].entries
+    trials = [entry for entry in entries if 'frame_timing' in entry]
+    targets = [entry for entry in trials if 'word_presentation.thisN' in entry]
+    invalid = sum(1 for entry in trials if not entry.get('paradiddle_valid'))
+    dropped = sum(entry.get('frames_dropped', 0) for entry in trials)
+
+    recorded = [entry for entry in trials if 'audio_secs' in entry]
+    max_secs = namespace['max_response_time']
+    short = sum(1 for entry in recorded
+                if entry['audio_secs'] < min(entry['recording_secs'], max_secs) - tolerance_secs)
+    onsets = sum(1 for entry in recorded
+                 if entry.get('speech_onset') is not None and entry['speech_onset'] == entry['speech_onset'])
+    expInfo = namespace['expInfo']
+    prefix = '%s_%s_%s_block_' % (expInfo['participant'], namespace['expName'], expInfo['date'])
+    sound_dir = namespace['sound_dir']
+    nfiles = sum(1 for fname in os.listdir(sound_dir) if fname.startswith(prefix))
+
+    problems = []
+    if not recorded:
+        problems.append('no recordings')
+    if short:
+        problems.append('%d recordings shorter than the recorder ran' % short)
+    if recorded and onsets < min_onsets * len(recorded):
+        problems.append('voice onset found in only %d of %d trials' % (onsets, len(recorded)))
+    if nfiles != len(recorded):
+        problems.append('%d files in %s for %d recordings' % (nfiles, sound_dir, len(recorded)))
+    summary = ('%d trials (%d targets), %d invalid paradiddle trials, %d dropped frames, '
+               '%d recordings (%.0f s), voice onset in %d, %d files' % (
+                   len(trials), len(targets), invalid, dropped, len(recorded),
+                   sum(entry['audio_secs'] for entry in recorded), onsets, nfiles))
+    return summary, problems
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser('headless dry runs of sp13_replication_swe.py')
+    argparser.add_argument('participants', type=int, nargs='*',
+                           help='participant IDs (default: all rows of cond-list_assignment_wide.csv)')
+    argparser.add_argument('--session', type=int, default=9, choices=[1, 9],
+                           help='1 = real durations, 9 = speeded version (default)')
+    argparser.add_argument('--data-dir', default='data_sim', help='folder for the simulated data')
+    argparser.add_argument('--seed', type=int, default=0, help='participant n uses seed + n')
+    argparser.add_argument('--frame-rate', type=float, default=60.0)
+    argparser.add_argument('--drop-rate', type=float, default=0.0,
+                           help='fraction of flips that take two frames')
+    argparser.add_argument('--tap-latency', type=float, default=0.0,
+                           help='extra latency (s) of the second MIDI port')
+    argparser.add_argument('--tap-errors', type=float, default=0.0,
+                           help='chance that a paradiddle hit goes to the wrong pad')
+    argparser.add_argument('--min-onsets', type=float, default=0.9,
+                           help='fail if the voice onset is found in fewer of the trials (default 0.9)')
+    args = argparser.parse_args()
+
+    data_dir = os.path.join(_thisDir, args.data_dir)
+    for folder in (data_dir, os.path.join(data_dir, 'sound_recording')):
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+    failed = []
+    for ppt in args.participants or participant_ids():
+        sim = sim_fncs.Simulation(
+            ppt, args.session, data_dir, seed=args.seed + ppt, frame_rate=args.frame_rate,
+            drop_rate=args.drop_rate, choices={('b', 'm'): 'mb'},
+            tapper_kwargs=dict(latencies=(0.0, args.tap_latency), error_rate=args.tap_errors))
+        t_start = time.time()
+        try:
+            namespace = run_session(sim)
+        except Exception:
+            traceback.print_exc()
+            failed.append(ppt)
+            print('participant %d: FAILED' % ppt)
+            continue
+        summary, problems = summarise(namespace, args.min_onsets)
+        print('participant %d: %s (%.1f s simulated in %.1f s)' % (
+            ppt, summary, sim.clock.t, time.time() - t_start))
+        if problems:
+            failed.append(ppt)
+            print('participant %d: FAILED (%s)' % (ppt, '; '.join(problems)))
+
+    if failed:
+        sys.exit('%d session(s) failed: %s' % (len(failed), ', '.join(map(str, failed))))
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Slice a whole-session stereo recording into one file per trial, using marker tones.
+
+In the two-computer setup of
+exp-scripts_psychopy/test-debug/solution_audio-problem_explanation.txt the
+recording computer records one long stereo file per participant: the
+microphone on one channel and, on the other, marker sounds played by the
+stimulus computer. There are six markers:
+
+    1  begin of a target trial (with the beep)     2  end of a target trial
+    3  begin of a training trial (with the beep)   4  end of a training trial
+    5  start of a block                            6  start of the experiment
+
+The file is read block by block (never as a whole, so multi-hour recordings
+are fine) and each marker template is found on the marker channel with a
+matched filter (normalised cross-correlation). The microphone channel from
+each begin to the following end marker is then written, in parallel, to a
+file named like ``audio_fname`` in sp13_replication_swe.py
+(<participant>_sp13_replication_swe_<date>_block_<n>_<loop>_<trial>), plus a
+row in slices.tsv (columns ``SLICE_COLUMNS``) with where it was found; the
+rows of a recording that is sliced again are replaced. Training markers
+before the first block marker are the practice trials (block 0).
+
+    python slice_recording.py recording.wav sound_recording --participant 12 --date 2021_Mar_03_1515
+    python slice_recording.py 12_sp13_replication_swe_2021_Mar_03_1515.wav sound_recording --templates markers
+
+Without --templates, the markers are the tones of ``DEFAULT_MARKERS``; with
+it, marker_1.wav ... marker_6.wav in that folder (the files the stimulus
+computer plays, marker channel only). A --format of flac trims each slice to
+the speech (speech_fncs.py).
+
+NB: runs under StandalonePsychoPy2 (Python 2.7) as well as Python 3.
+"""
+
+from __future__ import absolute_import, division, print_function
+import argparse
+import io
+import multiprocessing
+import os
+import re
+
+import numpy as np
+import soundfile as sf
+
+EXP_NAME = 'sp13_replication_swe'
+# marker: (frequency in Hz, duration in s) of the default marker tones
+DEFAULT_MARKERS = {1: (440.0, 0.1), 2: (494.0, 0.3), 3: (523.0, 0.1),
+                   4: (587.0, 0.3), 5: (659.0, 0.5), 6: (698.0, 0.8)}
+RECORDING_NAME = re.compile(r'^(\d+)_%s_(.+)$' % EXP_NAME)
+SLICE_COLUMNS = ['filename', 'recording', 'begin_sample', 'end_sample', 'begin_s', 'end_s']
+
+
+def tone_templates(samplerate, markers=DEFAULT_MARKERS):
+    """Hann-windowed sine tones of ``markers``, as {marker: samples}."""
+    templates = {}
+    for marker, (freq, secs) in markers.items():
+        t = np.arange(int(round(secs * samplerate))) / samplerate
+        templates[marker] = (np.hanning(len(t)) * np.sin(2 * np.pi * freq * t)).astype('float32')
+    return templates
+
+
+def read_templates(folder, samplerate, channel=1):
+    """marker_1.wav ... marker_6.wav from ``folder``, as {marker: samples}."""
+    templates = {}
+    for marker in sorted(DEFAULT_MARKERS):
+        samples, file_rate = sf.read(os.path.join(folder, 'marker_%d.wav' % marker),
+                                     dtype='float32', always_2d=True)
+        if file_rate != samplerate:
+            raise ValueError('marker_%d.wav is at %d Hz, the recording at %d Hz'
+                             % (marker, file_rate, samplerate))
+        templates[marker] = samples[:, min(channel, samples.shape[1] - 1)]
+    return templates
+
+
+def _match(block, nvalid, template, threshold, min_rms):
+    """Normalised cross-correlation of ``template`` at the first ``nvalid`` positions of ``block``.
+
+    Returns (position, score) of the peaks above ``threshold``.
+    """
+    length = len(template)
+    nfft = 1
+    while nfft < len(block) + length:
+        nfft *= 2
+    corr = np.fft.irfft(np.fft.rfft(block, nfft) * np.conj(np.fft.rfft(template, nfft)), nfft)[:nvalid]
+    cumsum = np.concatenate([[0.0], np.cumsum(block.astype('float64') ** 2)])
+    energy = cumsum[length:length + nvalid] - cumsum[:nvalid]
+    score = corr / (np.sqrt(np.maximum(energy, 0)) * np.linalg.norm(template) + 1e-12)
+    score[energy < length * min_rms ** 2] = 0
+    above = np.flatnonzero(score >= threshold)
+    peaks = []
+    if len(above):
+        # runs of positions above threshold, split where they are a template apart
+        splits = np.flatnonzero(np.diff(above) > length // 2) + 1
+        for run in np.split(above, splits):
+            best = run[np.argmax(score[run])]
+            peaks.append((best, score[best]))
+    return peaks
+
+
+def find_markers(path, templates, channel=1, threshold=0.6, min_rms=0.005, blocksize=2 ** 20):
+    """Markers on ``channel`` of the recording at ``path``: sorted list of (sample, marker, score).
+
+    The file is read in blocks of ``blocksize`` samples (overlapping by the
+    longest template), so memory use does not depend on its length.
+    Overlapping detections (also of different markers) keep the best match.
+    """
+    overlap = max(len(template) for template in templates.values()) - 1
+    found = []
+    with sf.SoundFile(path) as f:
+        start = 0
+        for block in f.blocks(blocksize=blocksize + overlap, overlap=overlap,
+                              dtype='float32', always_2d=True):
+            block = block[:, channel]
+            for marker, template in templates.items():
+                nvalid = min(blocksize, len(block) - len(template) + 1)
+                if nvalid <= 0:
+                    continue
+                for pos, score in _match(block, nvalid, template, threshold, min_rms):
+                    found.append((start + pos, marker, score, len(template)))
+            start += blocksize
+    found.sort()
+    markers = []
+    for pos, marker, score, length in found:
+        if markers and pos < markers[-1][0] + markers[-1][3]:
+            if score > markers[-1][2]:
+                markers[-1] = (pos, marker, score, length)
+            continue
+        markers.append((pos, marker, score, length))
+    return [(pos, marker, score) for pos, marker, score, length in markers]
+
+
+def plan_slices(markers):
+    """Pair begin and end markers into trials: list of (block, loop name, trial, begin, end).
+
+    Unpaired markers are reported and skipped.
+    """
+    slices = []
+    block, trials, begin = 0, {}, None
+    for pos, marker, score in markers:
+        if marker == 6:
+            block, trials, begin = 0, {}, None
+        elif marker == 5:
+            block, trials, begin = block + 1, {}, None
+        elif marker in (1, 3):
+            if begin is not None:
+                print('begin marker at sample %d has no end marker, skipped' % begin[0])
+            begin = (pos, marker)
+        elif begin is None or begin[1] != marker - 1:
+            print('end marker %d at sample %d has no begin marker, skipped' % (marker, pos))
+        else:
+            if marker == 2:
+                loop = 'word_presentation'
+            else:
+                loop = 'word_presentation_training' if block else 'word_presentation_practice'
+            trial = trials.get(loop, 0)
+            trials[loop] = trial + 1
+            slices.append((block, loop, trial, begin[0], pos))
+            begin = None
+    return slices
+
+
+def _export(task):
+    """Write one slice (run in a worker process; reads only the slice from the recording)."""
+    path, mic_channel, begin, end, dest = task
+    with sf.SoundFile(path) as f:
+        f.seek(begin)
+        samples = f.read(end - begin, dtype='float32', always_2d=True)[:, mic_channel]
+        samplerate = f.samplerate
+    if dest.endswith('.flac'):
+        from speech_fncs import save_recording
+        save_recording(dest, samples, samplerate)
+    else:
+        sf.write(dest, samples, samplerate)
+    return dest
+
+
+def slice_recording(path, dest_dir, participant, date, templates=None, marker_channel=1,
+                    fmt='wav', workers=None, **find_kwargs):
+    """Find the markers in ``path`` and write the trials to ``dest_dir``; returns the slices."""
+    samplerate = sf.info(path).samplerate
+    if templates is None:
+        templates = tone_templates(samplerate)
+    markers = find_markers(path, templates, marker_channel, **find_kwargs)
+    slices = plan_slices(markers)
+    mic_channel = 1 - marker_channel
+    tasks = []
+    for block, loop, trial, begin, end in slices:
+        audio_fname = '_'.join([str(participant), EXP_NAME, str(date), 'block',
+                                str(block), loop, str(trial)])
+        tasks.append((path, mic_channel, begin, end, os.path.join(dest_dir, audio_fname + '.' + fmt)))
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        for dest in pool.imap_unordered(_export, tasks):
+            pass
+    finally:
+        pool.close()
+        pool.join()
+
+    # one row per slice, of all recordings sliced into dest_dir (earlier rows of this recording are replaced)
+    slices_path = os.path.join(dest_dir, 'slices.tsv')
+    recording = os.path.basename(path)
+    rows = []
+    if os.path.exists(slices_path):
+        with io.open(slices_path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        if lines and lines[0] == u'\t'.join(SLICE_COLUMNS):
+            lines = lines[1:]  # (files of earlier versions have no header)
+        rows = [line for line in lines if line and line.split(u'\t')[1] != recording]
+    for (block, loop, trial, begin, end), task in zip(slices, tasks):
+        rows.append(u'%s\t%s\t%d\t%d\t%.3f\t%.3f' % (
+            os.path.basename(task[4]), recording, begin, end, begin / samplerate, end / samplerate))
+    with io.open(slices_path, 'w', encoding='utf-8') as f:
+        f.write(u'\n'.join([u'\t'.join(SLICE_COLUMNS)] + rows) + u'\n')
+    print('%s: %d markers, %d trials written to %s' % (path, len(markers), len(slices), dest_dir))
+    return slices
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser('slice a whole-session recording into per-trial files')
+    argparser.add_argument('recording', help='stereo recording (wav, flac, ...)')
+    argparser.add_argument('dest_dir', help='folder for the per-trial files')
+    argparser.add_argument('--participant', help='default: from the recording file name')
+    argparser.add_argument('--date', help='date of the session as in the data file names '
+                           '(default: from the recording file name)')
+    argparser.add_argument('--templates', help='folder with marker_1.wav ... marker_6.wav')
+    argparser.add_argument('--marker-channel', type=int, default=1, choices=[0, 1],
+                           help='channel with the markers (default 1, the second)')
+    argparser.add_argument('--threshold', type=float, default=0.6,
+                           help='minimum normalised correlation of a marker (default 0.6)')
+    argparser.add_argument('--format', default='wav', choices=['wav', 'flac'])
+    argparser.add_argument('--workers', type=int, help='export processes (default: one per CPU)')
+    args = argparser.parse_args()
+
+    match = RECORDING_NAME.match(os.path.splitext(os.path.basename(args.recording))[0])
+    participant = args.participant or (match and match.group(1))
+    date = args.date or (match and match.group(2))
+    if not participant or not date:
+        argparser.error('give --participant and --date (the file name is not <participant>_%s_<date>)'
+                        % EXP_NAME)
+    if not os.path.isdir(args.dest_dir):
+        os.makedirs(args.dest_dir)
+    templates = None
+    if args.templates:
+        templates = read_templates(args.templates, sf.info(args.recording).samplerate,
+                                   args.marker_channel)
+    slice_recording(args.recording, args.dest_dir, participant, date, templates,
+                    args.marker_channel, args.format, args.workers, threshold=args.threshold)
@@ -25,6 +25,12 @@ import sys  # to get file system encoding
 _thisDir = os.path.dirname(os.path.abspath(__file__)).decode(sys.getfilesystemencoding())
 os.chdir(_thisDir)
 
+# headless dry run (see simulate.py)? Then window, keyboard, MIDI and audio are
+# simulated, and the data go to the simulation's folder
+import sim_fncs
+simulation = sim_fncs.backend
+data_dir = u'data' if simulation is None else simulation.data_dir
+
 # Store info about the experiment session
 expName = 'sp13_replication_swe'  # from the Builder filename that created this script
 expInfo = {u'session': u'1', u'participant': u''}
@@ -34,18 +40,60 @@ if dlg.OK == False:
 expInfo['date'] = data.getDateStr()  # add a simple timestamp
 expInfo['expName'] = expName
 
+# load all lists of the participant's session from the indexed stimulus file
+# (built from stimuli/random_lists with pack_stimuli.py) and check them now,
+# rather than finding a missing or broken list in the middle of the session
+from stimuli_fncs import StimulusBundle, SessionPlan
+stim_bundle = StimulusBundle(os.path.join(u'stimuli', u'random_lists.sqlite'))
+session_plan = SessionPlan(stim_bundle, int(expInfo['participant']))
+if session_plan.problems:
+    sys.exit("ERROR: the stimulus lists of participant %s have problems:\n  " % expInfo['participant']
+             + "\n  ".join(session_plan.problems))
+
+# --resume (on the command line): continue the participant's last session where
+# it was interrupted, using the trial journal it left in the data folder
+from journal_fncs import TrialJournal, ResumeState, find_journal, read_journal, resumed_stem, save_csv
+resume = None
+if '--resume' in sys.argv:
+    journal_path = find_journal(os.path.join(_thisDir, data_dir), expInfo['participant'], expName)
+    if journal_path is None:
+        sys.exit("ERROR: participant %s has no session to resume" % expInfo['participant'])
+    resume = ResumeState(read_journal(journal_path))
+    if resume.finished:
+        sys.exit("ERROR: the last session of participant %s is complete (%s)" % (
+            expInfo['participant'], journal_path))
+    # same session and file names as the interrupted run
+    expInfo['session'] = resume.exp_info['session']
+    expInfo['date'] = resume.exp_info['date']
+
 # Data file name stem = absolute path + name; later add .psyexp, .csv, .log, etc
-filename = _thisDir + os.sep + u'data/%s_%s_%s' % (expInfo['participant'], expName, expInfo['date'])
+filename = os.path.join(_thisDir, data_dir, u'%s_%s_%s' % (expInfo['participant'], expName, expInfo['date']))
+# files of this run only (pickle, taps): a resumed run doesn't overwrite those of the interrupted one
+run_filename = filename if resume is None else resumed_stem(filename)
 
 # An ExperimentHandler isn't essential but helps with data saving
+# (the csv of a resumed session is written from its journal, see the end of the script)
 thisExp = data.ExperimentHandler(name=expName, version='',
     extraInfo=expInfo, runtimeInfo=None,
     originPath=None,
-    savePickle=True, saveWideText=True,
-    dataFileName=filename)
+    savePickle=True, saveWideText=resume is None,
+    dataFileName=run_filename)
 # save a log file for detail verbose info
 logFile = logging.LogFile(filename+'.log', level=logging.EXP)
 logging.console.setLevel(logging.WARNING)  # this outputs to the screen, not a file
+logging.exp(session_plan.summary())
+# every finished row of the data file goes to the journal straight away
+journal = TrialJournal(filename + '_journal.jsonl')
+if resume is None:
+    journal.append({'kind': 'start', 'expInfo': expInfo})
+else:
+    journal.append({'kind': 'resume', 'expInfo': expInfo})
+    logging.exp(resume.summary())
+# typed events (routines, stimuli, keys, taps, audio) with numeric codes, kept
+# in memory during the trial and written to <datafile>_events.bin after it
+# (a resumed run gets its own file, as its times and codes start anew)
+from events_fncs import EventLog
+event_log = EventLog(run_filename + '_events.bin')
 
 endExpNow = False  # flag for 'escape' or other condition => quit the exp
 
@@ -65,20 +113,12 @@ else:
     frameDur = 1.0 / 60.0  # could not measure, so guess
 
 # Initialize components for Routine "blank_initialize"
-blank_initializeClock = core.Clock()
 ## Set global (experiment-level) variables
 
 pptID = int(expInfo['participant'])  # participant ID
 # print("participant ID is " + `pptID`)
 
-path2stimuli = u'stimuli\\random_lists\\'
-print(path2stimuli)
-
-
-import pandas as pd
-df = pd.read_csv(path2stimuli + 'cond-list_assignment_wide.csv')
-# .values accesses the actual values of the row, [0] gets you the first value of that row
-condition_block_file = df.loc[df['id'] == pptID, 'condit_order_file'].values[0]
+condition_block_file = session_plan.condition_order_file
 print(condition_block_file)
 
 
@@ -112,34 +152,62 @@ else:  # otherwise use the standard duration
 max_response_time = 120  # max time to repeat words before moving to next trial
 min_response_time = 0  # minimum time before participants can press SPACE to move on
 
+# The timed routines (fixation, display_words, memory_paradiddle) are driven by
+# frame index: durations are converted to frame counts from the measured frame rate
+from timing_fncs import secs_to_frames, measured_frame_dur, FlipTimeLog
+frame_dur_measured = measured_frame_dur(expInfo['frameRate'], frameDur)
+fix_point_nframes = secs_to_frames(fix_point_duration, frame_dur_measured)
+word_nframes = secs_to_frames(word_duration, frame_dur_measured)
+SOA_nframes = secs_to_frames(SOA, frame_dur_measured)
+mem_per_nframes = secs_to_frames(mem_per, frame_dur_measured)
+logging.exp('frame counts at %.3f Hz: fixation %d, word %d, SOA %d, memory period %d' % (
+    1.0 / frame_dur_measured, fix_point_nframes, word_nframes, SOA_nframes, mem_per_nframes))
+fixation_flips = FlipTimeLog(win, 'fixation', frame_dur_measured)
+display_words_flips = FlipTimeLog(win, 'display_words', frame_dur_measured)
+memory_paradiddle_flips = FlipTimeLog(win, 'memory_paradiddle', frame_dur_measured)
+# flip times of the timed routines: dropped frames go into the trial data,
+# the flip times themselves into a binary file per session
+from timing_fncs import FrameIntervalMonitor
+frame_monitor = FrameIntervalMonitor(filename + '_frametimes.bin', frame_dur_measured)
+if resume is not None:
+    frame_monitor.trial = resume.next_frame_timing_trial
+
 
 ## Other
 cont = u"\n\nTryck på mellanslag för att fortsätta"  # At the end of instructions slides
 
 # register midi taps
+# (stored in a record array and saved per block as <datafile>_taps_b<n>.npy,
+# the callbacks no longer write to the log)
 import mido
+from taps_fncs import TapRecorder
 midi_devices = mido.get_input_names()
-register_taps = False
-def log_pads_device(devicename):
-    def log_pads(hit):
-        if register_taps:
-            logging.exp('/'.join([
-                str(currentLoop.name),
-                str(myBlockCount),
-                str(currentLoop.thisTrialN),
-                str(devicename),
-                str(hit),
-            ]))
-    return log_pads
-port_a = mido.open_input(midi_devices[0], callback=log_pads_device(midi_devices[0]))
-port_b = mido.open_input(midi_devices[1], callback=log_pads_device(midi_devices[1]))
+tap_recorder = TapRecorder(midi_devices[:2], exit_path=run_filename + '_taps_quit.npy')
+port_a = mido.open_input(midi_devices[0], callback=tap_recorder.callback(0))
+port_b = mido.open_input(midi_devices[1], callback=tap_recorder.callback(1))
+# score the paradiddles online (validity flag and error counts per trial)
+from taps_fncs import ParadiddleMonitor
+tap_recorder.monitor = paradiddle_monitor = ParadiddleMonitor()
+tap_recorder.events = event_log
+if simulation is not None:
+    simulation.connect_taps(tap_recorder, paradiddle_monitor)
 
 # record sound
 import sounddevice as sd
 import soundfile as sf
 samplerate = 11025
+sound_dir = u'sound_recording/' if simulation is None else os.path.join(data_dir, u'sound_recording', u'')
 sd.default.samplerate = samplerate
 sd.default.channels = 1
+# stream the response into a growable buffer instead of a fixed 30 s sd.rec() buffer
+# the voice onset detector runs on the incoming blocks, so the onset latency
+# and duration of the response are known as soon as the recording stops
+from audio_fncs import StreamRecorder, VoiceOnsetDetector
+recorder = StreamRecorder(samplerate, channels=1, max_secs=max_response_time,
+    detector=VoiceOnsetDetector(samplerate, ignore_secs=0.25))  # not during the beep (sound_2)
+# write recordings from a background thread so disk I/O never delays the next trial
+from audio_fncs import AsyncWavWriter
+wav_writer = AsyncWavWriter()
 text_14 = visual.TextStim(win=win, name='text_14',
     text=None,
     font='Arial',
@@ -148,7 +216,6 @@ text_14 = visual.TextStim(win=win, name='text_14',
     depth=-1.0);
 
 # Initialize components for Routine "instr_welcome"
-instr_welcomeClock = core.Clock()
 text_7 = visual.TextStim(win=win, name='text_7',
     text=u"Välkommen till det här experimentet!\n\nI den här uppgiften kommer du att få se fyra ord i en följd och du ska försöka komma ihåg dem. Kort därefter ska du repetera orden i exakt samma ordning." + cont,
     font='Arial',
@@ -163,7 +230,6 @@ text_13 = visual.TextStim(win=win, name='text_13',
     depth=-2.0);
 
 # Initialize components for Routine "instr_exp1"
-instr_exp1Clock = core.Clock()
 text_8 = visual.TextStim(win=win, name='text_8',
     text=u"Det funkar så här:\n\nDu kommer att få se fyra ord som visas ett i taget på skärmen. Efter orden följer en paus. Du ska då försöka hålla dessa fyra ord i minnet i samma ordning som de har visats, utan att säga orden. Du kommer sedan att höra ett pip. Direkt efter pipet ska du repetera alla dessa fyra ord högt. Kom ihåg att repetera orden i samma ordning som du såg dem. Din röst kommer att spelas in när du säger orden. För att gå vidare till nästa omgång, tryck på mellanslag." + cont,
     font='Arial',
@@ -178,7 +244,6 @@ text_15 = visual.TextStim(win=win, name='text_15',
     depth=-2.0);
 
 # Initialize components for Routine "instr_TryItOut"
-instr_TryItOutClock = core.Clock()
 text_12 = visual.TextStim(win=win, name='text_12',
     text=u'Du kommer nu att f\xe5 n\xe5gra exempeluppgifter f\xf6r att \xf6va.\n\nOm du inte har n\xe5gra fr\xe5gor, tryck p\xe5 mellanslag f\xf6r att p\xe5b\xf6rja \xf6vningen.',
     font='Arial',
@@ -193,16 +258,18 @@ text_16 = visual.TextStim(win=win, name='text_16',
     depth=-2.0);
 
 # Initialize components for Routine "get_filename"
-get_filenameClock = core.Clock()
 curr_ppt_block = "p_" + `pptID` + "_b" + `myBlockCount`
 print(curr_ppt_block)
 
-curr_list_training = path2stimuli + curr_ppt_block + '_training.csv'
-print(curr_list_training)
+curr_list_training = session_plan.training[myBlockCount]
+
+# pre-build the word stims for the practice trials (see display_words)
+from stimuli_fncs import WordStimCache
+word_stims = WordStimCache(win)
+word_stims.prepare([curr_list_training])
 
 
 # Initialize components for Routine "fixation"
-fixationClock = core.Clock()
 point = visual.Polygon(
     win=win, name='point',
     edges=999, size=(0.035, 0.05),
@@ -212,7 +279,6 @@ point = visual.Polygon(
     opacity=1, depth=0.0, interpolate=True)
 
 # Initialize components for Routine "display_words"
-display_wordsClock = core.Clock()
 w1 = visual.TextStim(win=win, name='w1',
     text='default text',
     font='Arial',
@@ -239,7 +305,6 @@ w4 = visual.TextStim(win=win, name='w4',
     depth=-3.0);
 
 # Initialize components for Routine "memory_paradiddle"
-memory_paradiddleClock = core.Clock()
 
 b_memory_period_2_ = visual.TextStim(win=win, name='b_memory_period_2_',
     text=None,
@@ -249,13 +314,11 @@ b_memory_period_2_ = visual.TextStim(win=win, name='b_memory_period_2_',
     depth=-1.0);
 
 # Initialize components for Routine "repeat_words"
-repeat_wordsClock = core.Clock()
 sound_2 = sound.Sound('880', secs=0.25)
 sound_2.setVolume(1)
 
 
 # Initialize components for Routine "repeat_training"
-repeat_trainingClock = core.Clock()
 text_5 = visual.TextStim(win=win, name='text_5',
     text=u"Om du beh\xf6ver \xf6va mer, tryck 'm'. Om du k\xe4nner dig redo att b\xf6rja med det riktiga experimentet, tryck 'b'.",
     font='Arial',
@@ -265,7 +328,6 @@ text_5 = visual.TextStim(win=win, name='text_5',
 
 
 # Initialize components for Routine "instr_exp2"
-instr_exp2Clock = core.Clock()
 text_9 = visual.TextStim(win=win, name='text_9',
     text=u"Nu vet du vad uppgiften går ut på.\n\nSjälva experimentet består av två delar. I varje del kommer du att behöva memorera sekvenser av fyra ord (precis som du nyss har gjort), men under tiden du håller orden i minnet ska du ibland också göra rytmiska rörelser med antingen händerna eller fötterna.\n\nExperimentledaren kommer att ge dig mer detaljerade instruktioner och du kommer att ha gott om tid för att öva in dessa rörelser." + cont,
     font='Arial',
@@ -274,7 +336,6 @@ text_9 = visual.TextStim(win=win, name='text_9',
     depth=0.0);
 
 # Initialize components for Routine "instr_exp3"
-instr_exp3Clock = core.Clock()
 text_10 = visual.TextStim(win=win, name='text_10',
     text=u"Du kommer att kunna ta paus i slutet av varje del. Du kan också ta paus mellan de olika omgångarna om du behöver det.\n\nOm du har några frågor så kan du ställa dem till experimentledaren nu." + cont
 ,
@@ -284,7 +345,6 @@ text_10 = visual.TextStim(win=win, name='text_10',
     depth=0.0);
 
 # Initialize components for Routine "block_instr"
-block_instrClock = core.Clock()
 
 block_intro = visual.TextStim(win=win, name='block_intro',
     text='default text',
@@ -300,7 +360,6 @@ text_19 = visual.TextStim(win=win, name='text_19',
     depth=-3.0);
 
 # Initialize components for Routine "block_instr3"
-block_instr3Clock = core.Clock()
 text_11 = visual.TextStim(win=win, name='text_11',
     text='default text',
     font='Arial',
@@ -315,7 +374,6 @@ text_20 = visual.TextStim(win=win, name='text_20',
     depth=-2.0);
 
 # Initialize components for Routine "train"
-trainClock = core.Clock()
 text_4 = visual.TextStim(win=win, name='text_4',
     text='default text',
     font='Arial',
@@ -329,71 +387,7 @@ text_21 = visual.TextStim(win=win, name='text_21',
     color='white', colorSpace='rgb', opacity=1,
     depth=-2.0);
 
-# Initialize components for Routine "fixation"
-fixationClock = core.Clock()
-point = visual.Polygon(
-    win=win, name='point',
-    edges=999, size=(0.035, 0.05),
-    ori=0, pos=(0, 0),
-    lineWidth=1, lineColor=[1,1,1], lineColorSpace='rgb',
-    fillColor=[1,1,1], fillColorSpace='rgb',
-    opacity=1, depth=0.0, interpolate=True)
-
-# Initialize components for Routine "display_words"
-display_wordsClock = core.Clock()
-w1 = visual.TextStim(win=win, name='w1',
-    text='default text',
-    font='Arial',
-    pos=(0, 0), height=0.15, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=0.0);
-w2 = visual.TextStim(win=win, name='w2',
-    text='default text',
-    font='Arial',
-    pos=(0, 0), height=0.15, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=-1.0);
-w3 = visual.TextStim(win=win, name='w3',
-    text='default text',
-    font='Arial',
-    pos=(0, 0), height=0.15, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=-2.0);
-w4 = visual.TextStim(win=win, name='w4',
-    text='default text',
-    font='Arial',
-    pos=(0, 0), height=0.15, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=-3.0);
-
-# Initialize components for Routine "memory_paradiddle"
-memory_paradiddleClock = core.Clock()
-
-b_memory_period_2_ = visual.TextStim(win=win, name='b_memory_period_2_',
-    text=None,
-    font='Arial',
-    pos=(0, 0), height=0.1, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=-1.0);
-
-# Initialize components for Routine "repeat_words"
-repeat_wordsClock = core.Clock()
-sound_2 = sound.Sound('880', secs=0.25)
-sound_2.setVolume(1)
-
-
-# Initialize components for Routine "repeat_training"
-repeat_trainingClock = core.Clock()
-text_5 = visual.TextStim(win=win, name='text_5',
-    text=u"Om du beh\xf6ver \xf6va mer, tryck 'm'. Om du k\xe4nner dig redo att b\xf6rja med det riktiga experimentet, tryck 'b'.",
-    font='Arial',
-    pos=(0, 0), height=0.1, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=0.0);
-
-
 # Initialize components for Routine "instr_start_real_thing"
-instr_start_real_thingClock = core.Clock()
 text_3 = visual.TextStim(win=win, name='text_3',
     text=u'Redo?\n\nTryck p\xe5 mellanslag f\xf6r att starta',
     font='Arial',
@@ -401,61 +395,7 @@ text_3 = visual.TextStim(win=win, name='text_3',
     color='white', colorSpace='rgb', opacity=1,
     depth=0.0);
 
-# Initialize components for Routine "fixation"
-fixationClock = core.Clock()
-point = visual.Polygon(
-    win=win, name='point',
-    edges=999, size=(0.035, 0.05),
-    ori=0, pos=(0, 0),
-    lineWidth=1, lineColor=[1,1,1], lineColorSpace='rgb',
-    fillColor=[1,1,1], fillColorSpace='rgb',
-    opacity=1, depth=0.0, interpolate=True)
-
-# Initialize components for Routine "display_words"
-display_wordsClock = core.Clock()
-w1 = visual.TextStim(win=win, name='w1',
-    text='default text',
-    font='Arial',
-    pos=(0, 0), height=0.15, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=0.0);
-w2 = visual.TextStim(win=win, name='w2',
-    text='default text',
-    font='Arial',
-    pos=(0, 0), height=0.15, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=-1.0);
-w3 = visual.TextStim(win=win, name='w3',
-    text='default text',
-    font='Arial',
-    pos=(0, 0), height=0.15, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=-2.0);
-w4 = visual.TextStim(win=win, name='w4',
-    text='default text',
-    font='Arial',
-    pos=(0, 0), height=0.15, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=-3.0);
-
-# Initialize components for Routine "memory_paradiddle"
-memory_paradiddleClock = core.Clock()
-
-b_memory_period_2_ = visual.TextStim(win=win, name='b_memory_period_2_',
-    text=None,
-    font='Arial',
-    pos=(0, 0), height=0.1, wrapWidth=None, ori=0, 
-    color='white', colorSpace='rgb', opacity=1,
-    depth=-1.0);
-
-# Initialize components for Routine "repeat_words"
-repeat_wordsClock = core.Clock()
-sound_2 = sound.Sound('880', secs=0.25)
-sound_2.setVolume(1)
-
-
 # Initialize components for Routine "end_block"
-end_blockClock = core.Clock()
 text_6 = visual.TextStim(win=win, name='text_6',
     text='default text',
     font='Arial',
@@ -464,7 +404,6 @@ text_6 = visual.TextStim(win=win, name='text_6',
     depth=0.0);
 
 # Initialize components for Routine "thanks"
-thanksClock = core.Clock()
 text = visual.TextStim(win=win, name='text',
     text=u'Nu \xe4r experimentet slut.\n\nTack f\xf6r din medverkan!',
     font='Arial',
@@ -472,930 +411,200 @@ text = visual.TextStim(win=win, name='text',
     color='white', colorSpace='rgb', opacity=1,
     depth=0.0);
 
+# Routines: each one is declared once as a table of components with their
+# onset and duration in frames, and run by the single frame loop of
+# routine_fncs.Routine (the trial routines are shared by the three loops)
+from routine_fncs import Routine, Stim, KeyResponse, Sound
+Routine.event_log = event_log
+
+blank_initialize = Routine(win, 'blank_initialize', [
+    Stim(text_14),
+    KeyResponse('key_resp_17', ['space'])])
+instr_welcome = Routine(win, 'instr_welcome', [
+    Stim(text_7),
+    KeyResponse('key_resp_10', ['space']),
+    Stim(text_13)])
+instr_exp1 = Routine(win, 'instr_exp1', [
+    Stim(text_8),
+    KeyResponse('key_resp_11', ['space']),
+    Stim(text_15)])
+instr_TryItOut = Routine(win, 'instr_TryItOut', [
+    Stim(text_12),
+    KeyResponse('key_resp_14', ['space']),
+    Stim(text_16)])
+fixation = Routine(win, 'fixation', [
+    Stim(point, 0, fix_point_nframes)],
+    flip_log=fixation_flips, frame_monitor=frame_monitor)
+# w1..w4 are placeholders, the prepared word stims are swapped in per trial
+display_words = Routine(win, 'display_words', [
+    Stim(w1, 0, word_nframes),
+    Stim(w2, SOA_nframes, word_nframes),
+    Stim(w3, 2 * SOA_nframes, word_nframes),
+    Stim(w4, 3 * SOA_nframes, word_nframes)],
+    flip_log=display_words_flips, frame_monitor=frame_monitor)
+memory_paradiddle = Routine(win, 'memory_paradiddle', [
+    Stim(b_memory_period_2_, 0, mem_per_nframes)],
+    flip_log=memory_paradiddle_flips, frame_monitor=frame_monitor)
+repeat_words = Routine(win, 'repeat_words', [
+    KeyResponse('key_resp_2', ['space'], store=True),
+    Sound(sound_2, name='sound_2')])
+repeat_training = Routine(win, 'repeat_training', [
+    Stim(text_5),
+    KeyResponse('key_resp_8', ['b', 'm'], store=True)])
+instr_exp2 = Routine(win, 'instr_exp2', [
+    Stim(text_9),
+    KeyResponse('key_resp_12', ['space'])])
+instr_exp3 = Routine(win, 'instr_exp3', [
+    Stim(text_10),
+    KeyResponse('key_resp_13', ['space'])])
+block_instr = Routine(win, 'block_instr', [
+    Stim(block_intro),
+    KeyResponse('key_resp_4', ['space']),
+    Stim(text_19)])
+block_instr3 = Routine(win, 'block_instr3', [
+    Stim(text_11),
+    KeyResponse('key_resp_15', ['return'], store=True),
+    Stim(text_20)])
+train = Routine(win, 'train', [
+    Stim(text_4),
+    KeyResponse('key_resp_6', ['space'], store=True),
+    Stim(text_21)])
+instr_start_real_thing = Routine(win, 'instr_start_real_thing', [
+    Stim(text_3),
+    KeyResponse('key_resp_7', ['space'], store=True)])
+end_block = Routine(win, 'end_block', [
+    Stim(text_6),
+    KeyResponse('key_resp_9', ['space'])])
+thanks = Routine(win, 'thanks', [
+    Stim(text, 0, secs_to_frames(5, frame_dur_measured)),
+    KeyResponse('key_resp_3', ['return'], nframes=secs_to_frames(10, frame_dur_measured))],
+    max_frames=secs_to_frames(10, frame_dur_measured))
+
+
+def next_entry():
+    """thisExp.nextEntry(), then write the finished row to the journal (and the events)."""
+    thisExp.nextEntry()
+    journal.append({'kind': 'entry', 'block': myBlockCount, 'data': thisExp.entries[-1]})
+    event_log.flush()
+
+
+def run_trial(loop, trial):
+    """One trial (fixation, display_words, memory_paradiddle, repeat_words) of ``loop``."""
+    event_log.set_trial(myBlockCount, loop.thisTrialN)
+    event_log.add('trial_start', loop.name, loop.thisTrialN)
+    fixation.run()
+
+    for position in range(1, 5):
+        display_words['w%d' % position].stim = word_stims.get(position, trial['word%d' % position])
+    display_words.run()
+
+    logging.exp('/'.join([
+        str(loop.name),
+        str(myBlockCount),
+        str(loop.thisTrialN),
+        'start of memory period',
+    ]))
+    # start recording taps
+    tap_recorder.start(loop.name, myBlockCount, loop.thisTrialN)
+    paradiddle_monitor.start_trial(core.monotonicClock.getTime(),
+        expect_taps=loop.name != 'word_presentation_practice' and BlockType != 'CONTROL')
+    memory_paradiddle.run()
+    # end recording taps
+    tap_recorder.stop()
+    paradiddle_monitor.end_trial(loop)
+    # start recording audio (stopped when the participant presses space)
+    recorder.start()
+    t_audio_start = core.monotonicClock.getTime()
+    event_log.add('audio_start')
+
+    repeat_words.run()
+    repeat_words['key_resp_2'].add_data(loop)
+    # end recording audio; only the captured samples are written
+    trial_audio = recorder.stop()
+    event_log.add('audio_stop', value=len(trial_audio))
+    # seconds captured vs. seconds the recorder was running (shorter = lost audio)
+    loop.addData('audio_secs', len(trial_audio) / samplerate)
+    loop.addData('recording_secs', core.monotonicClock.getTime() - t_audio_start)
+    # voice onset relative to the beep and total duration of speech (s)
+    speech_onset, speech_dur = recorder.speech(repeat_words['sound_2'].t_start)
+    loop.addData('speech_onset', speech_onset)
+    loop.addData('speech_dur', speech_dur)
+    audio_fname = '_'.join([
+        str(expInfo['participant']),
+        str(expName),
+        str(expInfo['date']),
+        "block",
+        str(myBlockCount),
+        str(loop.name),
+        str(loop.thisTrialN),
+    ])
+    # stored without the silence before and after the response (see speech_fncs.py)
+    wav_writer.write(sound_dir + audio_fname + '.flac', trial_audio, samplerate)
+    # per-trial frame timing summary (dropped frames etc.)
+    frame_monitor.end_trial(loop)
+    event_log.add('trial_end', loop.name, loop.thisTrialN)
+    event_log.set_trial(myBlockCount, -1)
+    next_entry()
+
+
 # Create some handy timers
 globalClock = core.Clock()  # to track the time since experiment started
-routineTimer = core.CountdownTimer()  # to track time remaining of each (non-slip) routine 
-
-# ------Prepare to start Routine "blank_initialize"-------
-t = 0
-blank_initializeClock.reset()  # clock
-frameN = -1
-continueRoutine = True
-# update component parameters for each repeat
-
-key_resp_17 = event.BuilderKeyResponse()
-# keep track of which components have finished
-blank_initializeComponents = [text_14, key_resp_17]
-for thisComponent in blank_initializeComponents:
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-
-# -------Start Routine "blank_initialize"-------
-while continueRoutine:
-    # get current time
-    t = blank_initializeClock.getTime()
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-    # update/draw components on each frame
-    
-    
-    # *text_14* updates
-    if t >= 0.0 and text_14.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        text_14.tStart = t
-        text_14.frameNStart = frameN  # exact frame index
-        text_14.setAutoDraw(True)
-    
-    # *key_resp_17* updates
-    if t >= 0.0 and key_resp_17.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        key_resp_17.tStart = t
-        key_resp_17.frameNStart = frameN  # exact frame index
-        key_resp_17.status = STARTED
-        # keyboard checking is just starting
-        event.clearEvents(eventType='keyboard')
-    if key_resp_17.status == STARTED:
-        theseKeys = event.getKeys(keyList=['space'])
-        
-        # check for quit:
-        if "escape" in theseKeys:
-            endExpNow = True
-        if len(theseKeys) > 0:  # at least one key was pressed
-            # a response ends the routine
-            continueRoutine = False
-    
-    # check if all components have finished
-    if not continueRoutine:  # a component has requested a forced-end of Routine
-        break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in blank_initializeComponents:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
-    
-    # check for quit (the Esc key)
-    if endExpNow or event.getKeys(keyList=["escape"]):
-        core.quit()
-    
-    # refresh the screen
-    if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
-
-# -------Ending Routine "blank_initialize"-------
-for thisComponent in blank_initializeComponents:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
-
-# the Routine "blank_initialize" was not non-slip safe, so reset the non-slip timer
-routineTimer.reset()
-
-# ------Prepare to start Routine "instr_welcome"-------
-t = 0
-instr_welcomeClock.reset()  # clock
-frameN = -1
-continueRoutine = True
-# update component parameters for each repeat
-key_resp_10 = event.BuilderKeyResponse()
-# keep track of which components have finished
-instr_welcomeComponents = [text_7, key_resp_10, text_13]
-for thisComponent in instr_welcomeComponents:
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-
-# -------Start Routine "instr_welcome"-------
-while continueRoutine:
-    # get current time
-    t = instr_welcomeClock.getTime()
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-    # update/draw components on each frame
-    
-    # *text_7* updates
-    if t >= 0.0 and text_7.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        text_7.tStart = t
-        text_7.frameNStart = frameN  # exact frame index
-        text_7.setAutoDraw(True)
-    
-    # *key_resp_10* updates
-    if t >= 0.0 and key_resp_10.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        key_resp_10.tStart = t
-        key_resp_10.frameNStart = frameN  # exact frame index
-        key_resp_10.status = STARTED
-        # keyboard checking is just starting
-        event.clearEvents(eventType='keyboard')
-    if key_resp_10.status == STARTED:
-        theseKeys = event.getKeys(keyList=['space'])
-        
-        # check for quit:
-        if "escape" in theseKeys:
-            endExpNow = True
-        if len(theseKeys) > 0:  # at least one key was pressed
-            # a response ends the routine
-            continueRoutine = False
-    
-    # *text_13* updates
-    if t >= 0.0 and text_13.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        text_13.tStart = t
-        text_13.frameNStart = frameN  # exact frame index
-        text_13.setAutoDraw(True)
-    
-    # check if all components have finished
-    if not continueRoutine:  # a component has requested a forced-end of Routine
-        break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in instr_welcomeComponents:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
-    
-    # check for quit (the Esc key)
-    if endExpNow or event.getKeys(keyList=["escape"]):
-        core.quit()
-    
-    # refresh the screen
-    if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
-
-# -------Ending Routine "instr_welcome"-------
-for thisComponent in instr_welcomeComponents:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
-# the Routine "instr_welcome" was not non-slip safe, so reset the non-slip timer
-routineTimer.reset()
-
-# ------Prepare to start Routine "instr_exp1"-------
-t = 0
-instr_exp1Clock.reset()  # clock
-frameN = -1
-continueRoutine = True
-# update component parameters for each repeat
-key_resp_11 = event.BuilderKeyResponse()
-# keep track of which components have finished
-instr_exp1Components = [text_8, key_resp_11, text_15]
-for thisComponent in instr_exp1Components:
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-
-# -------Start Routine "instr_exp1"-------
-while continueRoutine:
-    # get current time
-    t = instr_exp1Clock.getTime()
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-    # update/draw components on each frame
-    
-    # *text_8* updates
-    if t >= 0.0 and text_8.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        text_8.tStart = t
-        text_8.frameNStart = frameN  # exact frame index
-        text_8.setAutoDraw(True)
-    
-    # *key_resp_11* updates
-    if t >= 0.0 and key_resp_11.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        key_resp_11.tStart = t
-        key_resp_11.frameNStart = frameN  # exact frame index
-        key_resp_11.status = STARTED
-        # keyboard checking is just starting
-        event.clearEvents(eventType='keyboard')
-    if key_resp_11.status == STARTED:
-        theseKeys = event.getKeys(keyList=['space'])
-        
-        # check for quit:
-        if "escape" in theseKeys:
-            endExpNow = True
-        if len(theseKeys) > 0:  # at least one key was pressed
-            # a response ends the routine
-            continueRoutine = False
-    
-    # *text_15* updates
-    if t >= 0.0 and text_15.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        text_15.tStart = t
-        text_15.frameNStart = frameN  # exact frame index
-        text_15.setAutoDraw(True)
-    
-    # check if all components have finished
-    if not continueRoutine:  # a component has requested a forced-end of Routine
-        break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in instr_exp1Components:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
-    
-    # check for quit (the Esc key)
-    if endExpNow or event.getKeys(keyList=["escape"]):
-        core.quit()
-    
-    # refresh the screen
-    if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
-
-# -------Ending Routine "instr_exp1"-------
-for thisComponent in instr_exp1Components:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
-# the Routine "instr_exp1" was not non-slip safe, so reset the non-slip timer
-routineTimer.reset()
-
-# ------Prepare to start Routine "instr_TryItOut"-------
-t = 0
-instr_TryItOutClock.reset()  # clock
-frameN = -1
-continueRoutine = True
-# update component parameters for each repeat
-key_resp_14 = event.BuilderKeyResponse()
-# keep track of which components have finished
-instr_TryItOutComponents = [text_12, key_resp_14, text_16]
-for thisComponent in instr_TryItOutComponents:
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-
-# -------Start Routine "instr_TryItOut"-------
-while continueRoutine:
-    # get current time
-    t = instr_TryItOutClock.getTime()
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-    # update/draw components on each frame
-    
-    # *text_12* updates
-    if t >= 0.0 and text_12.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        text_12.tStart = t
-        text_12.frameNStart = frameN  # exact frame index
-        text_12.setAutoDraw(True)
-    
-    # *key_resp_14* updates
-    if t >= 0.0 and key_resp_14.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        key_resp_14.tStart = t
-        key_resp_14.frameNStart = frameN  # exact frame index
-        key_resp_14.status = STARTED
-        # keyboard checking is just starting
-        event.clearEvents(eventType='keyboard')
-    if key_resp_14.status == STARTED:
-        theseKeys = event.getKeys(keyList=['space'])
-        
-        # check for quit:
-        if "escape" in theseKeys:
-            endExpNow = True
-        if len(theseKeys) > 0:  # at least one key was pressed
-            # a response ends the routine
-            continueRoutine = False
-    
-    # *text_16* updates
-    if t >= 0.0 and text_16.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        text_16.tStart = t
-        text_16.frameNStart = frameN  # exact frame index
-        text_16.setAutoDraw(True)
-    
-    # check if all components have finished
-    if not continueRoutine:  # a component has requested a forced-end of Routine
-        break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in instr_TryItOutComponents:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
-    
-    # check for quit (the Esc key)
-    if endExpNow or event.getKeys(keyList=["escape"]):
-        core.quit()
-    
-    # refresh the screen
-    if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
 
-# -------Ending Routine "instr_TryItOut"-------
-for thisComponent in instr_TryItOutComponents:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
-# the Routine "instr_TryItOut" was not non-slip safe, so reset the non-slip timer
-routineTimer.reset()
+blank_initialize.run()
+
+# align the two MIDI ports: RA hits the pads in time with a metronome
+# (not in the speeded session 9)
+if sess != 9:
+    from taps_fncs import run_tap_calibration
+    run_tap_calibration(win, tap_recorder, run_filename + '_taps_calibration.npy')
+
+# a resumed session skips the introduction and practice if they were done
+if resume is None or not resume.practice_done:
+    instr_welcome.run()
+    instr_exp1.run()
+    instr_TryItOut.run()
 
-# set up handler to look after randomisation of conditions etc
-practice_block = data.TrialHandler(nReps=10, method='random', 
-    extraInfo=expInfo, originPath=-1,
-    trialList=[None],
-    seed=None, name='practice_block')
-thisExp.addLoop(practice_block)  # add the loop to the experiment
-thisPractice_block = practice_block.trialList[0]  # so we can initialise stimuli with some values
-# abbreviate parameter names if possible (e.g. rgb = thisPractice_block.rgb)
-if thisPractice_block != None:
-    for paramName in thisPractice_block:
-        exec('{} = thisPractice_block[paramName]'.format(paramName))
-
-for thisPractice_block in practice_block:
-    currentLoop = practice_block
-    # abbreviate parameter names if possible (e.g. rgb = thisPractice_block.rgb)
-    if thisPractice_block != None:
-        for paramName in thisPractice_block:
-            exec('{} = thisPractice_block[paramName]'.format(paramName))
-    
-    # ------Prepare to start Routine "get_filename"-------
-    t = 0
-    get_filenameClock.reset()  # clock
-    frameN = -1
-    continueRoutine = True
-    # update component parameters for each repeat
-    
-    # keep track of which components have finished
-    get_filenameComponents = []
-    for thisComponent in get_filenameComponents:
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
-    
-    # -------Start Routine "get_filename"-------
-    while continueRoutine:
-        # get current time
-        t = get_filenameClock.getTime()
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-        # update/draw components on each frame
-        
-        
-        # check if all components have finished
-        if not continueRoutine:  # a component has requested a forced-end of Routine
-            break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in get_filenameComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
-        
-        # check for quit (the Esc key)
-        if endExpNow or event.getKeys(keyList=["escape"]):
-            core.quit()
-        
-        # refresh the screen
-        if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
-    
-    # -------Ending Routine "get_filename"-------
-    for thisComponent in get_filenameComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
-    
-    # the Routine "get_filename" was not non-slip safe, so reset the non-slip timer
-    routineTimer.reset()
-    
     # set up handler to look after randomisation of conditions etc
-    word_presentation_practice = data.TrialHandler(nReps=1, method='random', 
+    practice_block = data.TrialHandler(nReps=10, method='random', 
         extraInfo=expInfo, originPath=-1,
-        trialList=data.importConditions(curr_list_training),
-        seed=None, name='word_presentation_practice')
-    thisExp.addLoop(word_presentation_practice)  # add the loop to the experiment
-    thisWord_presentation_practice = word_presentation_practice.trialList[0]  # so we can initialise stimuli with some values
-    # abbreviate parameter names if possible (e.g. rgb = thisWord_presentation_practice.rgb)
-    if thisWord_presentation_practice != None:
-        for paramName in thisWord_presentation_practice:
-            exec('{} = thisWord_presentation_practice[paramName]'.format(paramName))
-    
-    for thisWord_presentation_practice in word_presentation_practice:
-        currentLoop = word_presentation_practice
-        # abbreviate parameter names if possible (e.g. rgb = thisWord_presentation_practice.rgb)
-        if thisWord_presentation_practice != None:
-            for paramName in thisWord_presentation_practice:
-                exec('{} = thisWord_presentation_practice[paramName]'.format(paramName))
-        
-        # ------Prepare to start Routine "fixation"-------
-        t = 0
-        fixationClock.reset()  # clock
-        frameN = -1
-        continueRoutine = True
-        # update component parameters for each repeat
-        # keep track of which components have finished
-        fixationComponents = [point]
-        for thisComponent in fixationComponents:
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        
-        # -------Start Routine "fixation"-------
-        while continueRoutine:
-            # get current time
-            t = fixationClock.getTime()
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            # *point* updates
-            if t >= 0.0 and point.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                point.tStart = t
-                point.frameNStart = frameN  # exact frame index
-                point.setAutoDraw(True)
-            frameRemains = 0.0 + fix_point_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if point.status == STARTED and t >= frameRemains:
-                point.setAutoDraw(False)
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in fixationComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # check for quit (the Esc key)
-            if endExpNow or event.getKeys(keyList=["escape"]):
-                core.quit()
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # -------Ending Routine "fixation"-------
-        for thisComponent in fixationComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        # the Routine "fixation" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        
-        # ------Prepare to start Routine "display_words"-------
-        t = 0
-        display_wordsClock.reset()  # clock
-        frameN = -1
-        continueRoutine = True
-        # update component parameters for each repeat
-        w1.setText(word1)
-        w2.setText(word2)
-        w3.setText(word3)
-        w4.setText(word4)
-        # keep track of which components have finished
-        display_wordsComponents = [w1, w2, w3, w4]
-        for thisComponent in display_wordsComponents:
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        
-        # -------Start Routine "display_words"-------
-        while continueRoutine:
-            # get current time
-            t = display_wordsClock.getTime()
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            # *w1* updates
-            if t >= 0.0 and w1.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                w1.tStart = t
-                w1.frameNStart = frameN  # exact frame index
-                w1.setAutoDraw(True)
-            frameRemains = 0.0 + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if w1.status == STARTED and t >= frameRemains:
-                w1.setAutoDraw(False)
-            
-            # *w2* updates
-            if t >= SOA and w2.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                w2.tStart = t
-                w2.frameNStart = frameN  # exact frame index
-                w2.setAutoDraw(True)
-            frameRemains = SOA + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if w2.status == STARTED and t >= frameRemains:
-                w2.setAutoDraw(False)
-            
-            # *w3* updates
-            if t >= SOA*2 and w3.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                w3.tStart = t
-                w3.frameNStart = frameN  # exact frame index
-                w3.setAutoDraw(True)
-            frameRemains = SOA*2 + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if w3.status == STARTED and t >= frameRemains:
-                w3.setAutoDraw(False)
-            
-            # *w4* updates
-            if t >= SOA*3 and w4.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                w4.tStart = t
-                w4.frameNStart = frameN  # exact frame index
-                w4.setAutoDraw(True)
-            frameRemains = SOA*3 + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if w4.status == STARTED and t >= frameRemains:
-                w4.setAutoDraw(False)
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in display_wordsComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # check for quit (the Esc key)
-            if endExpNow or event.getKeys(keyList=["escape"]):
-                core.quit()
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # -------Ending Routine "display_words"-------
-        for thisComponent in display_wordsComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        # the Routine "display_words" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        
-        # ------Prepare to start Routine "memory_paradiddle"-------
-        t = 0
-        memory_paradiddleClock.reset()  # clock
-        frameN = -1
-        continueRoutine = True
-        # update component parameters for each repeat
-        logging.exp('/'.join([
-            str(currentLoop.name),
-            str(myBlockCount),
-            str(currentLoop.thisTrialN),
-            'start of memory period',
-        ]))
-        # start recording taps
-        register_taps = True
-        
-        # keep track of which components have finished
-        memory_paradiddleComponents = [b_memory_period_2_]
-        for thisComponent in memory_paradiddleComponents:
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        
-        # -------Start Routine "memory_paradiddle"-------
-        while continueRoutine:
-            # get current time
-            t = memory_paradiddleClock.getTime()
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            
-            # *b_memory_period_2_* updates
-            if t >= 0 and b_memory_period_2_.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                b_memory_period_2_.tStart = t
-                b_memory_period_2_.frameNStart = frameN  # exact frame index
-                b_memory_period_2_.setAutoDraw(True)
-            frameRemains = 0 + mem_per- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if b_memory_period_2_.status == STARTED and t >= frameRemains:
-                b_memory_period_2_.setAutoDraw(False)
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in memory_paradiddleComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # check for quit (the Esc key)
-            if endExpNow or event.getKeys(keyList=["escape"]):
-                core.quit()
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # -------Ending Routine "memory_paradiddle"-------
-        for thisComponent in memory_paradiddleComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        # end recording taps
-        register_taps = False
-        # start recording audio
-        trial_audio = sd.rec(int(30 * samplerate))
-        # the Routine "memory_paradiddle" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        
-        # ------Prepare to start Routine "repeat_words"-------
-        t = 0
-        repeat_wordsClock.reset()  # clock
-        frameN = -1
-        continueRoutine = True
-        # update component parameters for each repeat
-        key_resp_2 = event.BuilderKeyResponse()
-        
-        # keep track of which components have finished
-        repeat_wordsComponents = [key_resp_2, sound_2]
-        for thisComponent in repeat_wordsComponents:
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        
-        # -------Start Routine "repeat_words"-------
-        while continueRoutine:
-            # get current time
-            t = repeat_wordsClock.getTime()
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            # *key_resp_2* updates
-            if t >= 0 and key_resp_2.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                key_resp_2.tStart = t
-                key_resp_2.frameNStart = frameN  # exact frame index
-                key_resp_2.status = STARTED
-                # keyboard checking is just starting
-                win.callOnFlip(key_resp_2.clock.reset)  # t=0 on next screen flip
-                event.clearEvents(eventType='keyboard')
-            if key_resp_2.status == STARTED:
-                theseKeys = event.getKeys(keyList=['space'])
-                
-                # check for quit:
-                if "escape" in theseKeys:
-                    endExpNow = True
-                if len(theseKeys) > 0:  # at least one key was pressed
-                    key_resp_2.keys = theseKeys[-1]  # just the last key pressed
-                    key_resp_2.rt = key_resp_2.clock.getTime()
-                    # a response ends the routine
-                    continueRoutine = False
-            # start/stop sound_2
-            if t >= 0 and sound_2.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                sound_2.tStart = t
-                sound_2.frameNStart = frameN  # exact frame index
-                sound_2.play()  # start the sound (it finishes automatically)
-            
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in repeat_wordsComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # check for quit (the Esc key)
-            if endExpNow or event.getKeys(keyList=["escape"]):
-                core.quit()
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # -------Ending Routine "repeat_words"-------
-        for thisComponent in repeat_wordsComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        # check responses
-        if key_resp_2.keys in ['', [], None]:  # No response was made
-            key_resp_2.keys=None
-        word_presentation_practice.addData('key_resp_2.keys',key_resp_2.keys)
-        if key_resp_2.keys != None:  # we had a response
-            word_presentation_practice.addData('key_resp_2.rt', key_resp_2.rt)
-        sound_2.stop()  # ensure sound has stopped at end of routine
-        # end recording audio
-        audio_fname = '_'.join([
-            str(expInfo['participant']),
-            str(expName),
-            str(expInfo['date']),
-            "block",
-            str(myBlockCount),
-            str(currentLoop.name),
-            str(currentLoop.thisTrialN),
-        ])
-        sf.write('sound_recording/' + audio_fname + '.wav', trial_audio, samplerate)
-        # the Routine "repeat_words" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        thisExp.nextEntry()
-        
-    # completed 1 repeats of 'word_presentation_practice'
-    
-    
-    # ------Prepare to start Routine "repeat_training"-------
-    t = 0
-    repeat_trainingClock.reset()  # clock
-    frameN = -1
-    continueRoutine = True
-    # update component parameters for each repeat
-    key_resp_8 = event.BuilderKeyResponse()
-    
-    # keep track of which components have finished
-    repeat_trainingComponents = [text_5, key_resp_8]
-    for thisComponent in repeat_trainingComponents:
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
-    
-    # -------Start Routine "repeat_training"-------
-    while continueRoutine:
-        # get current time
-        t = repeat_trainingClock.getTime()
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-        # update/draw components on each frame
-        
-        # *text_5* updates
-        if t >= 0.0 and text_5.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            text_5.tStart = t
-            text_5.frameNStart = frameN  # exact frame index
-            text_5.setAutoDraw(True)
-        
-        # *key_resp_8* updates
-        if t >= 0.0 and key_resp_8.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            key_resp_8.tStart = t
-            key_resp_8.frameNStart = frameN  # exact frame index
-            key_resp_8.status = STARTED
-            # keyboard checking is just starting
-            win.callOnFlip(key_resp_8.clock.reset)  # t=0 on next screen flip
-            event.clearEvents(eventType='keyboard')
-        if key_resp_8.status == STARTED:
-            theseKeys = event.getKeys(keyList=['b', 'm'])
-            
-            # check for quit:
-            if "escape" in theseKeys:
-                endExpNow = True
-            if len(theseKeys) > 0:  # at least one key was pressed
-                key_resp_8.keys = theseKeys[-1]  # just the last key pressed
-                key_resp_8.rt = key_resp_8.clock.getTime()
-                # a response ends the routine
-                continueRoutine = False
-        
-        
-        # check if all components have finished
-        if not continueRoutine:  # a component has requested a forced-end of Routine
-            break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in repeat_trainingComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
-        
-        # check for quit (the Esc key)
-        if endExpNow or event.getKeys(keyList=["escape"]):
-            core.quit()
-        
-        # refresh the screen
-        if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
-    
-    # -------Ending Routine "repeat_training"-------
-    for thisComponent in repeat_trainingComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
-    # check responses
-    if key_resp_8.keys in ['', [], None]:  # No response was made
-        key_resp_8.keys=None
-    practice_block.addData('key_resp_8.keys',key_resp_8.keys)
-    if key_resp_8.keys != None:  # we had a response
-        practice_block.addData('key_resp_8.rt', key_resp_8.rt)
-    if key_resp_8.keys == "b": break  # allow to repeat training until ready (max 20, see loop)
-    # the Routine "repeat_training" was not non-slip safe, so reset the non-slip timer
-    routineTimer.reset()
-    thisExp.nextEntry()
-    
-# completed 10 repeats of 'practice_block'
-
-
-# ------Prepare to start Routine "instr_exp2"-------
-t = 0
-instr_exp2Clock.reset()  # clock
-frameN = -1
-continueRoutine = True
-# update component parameters for each repeat
-key_resp_12 = event.BuilderKeyResponse()
-# keep track of which components have finished
-instr_exp2Components = [text_9, key_resp_12]
-for thisComponent in instr_exp2Components:
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-
-# -------Start Routine "instr_exp2"-------
-while continueRoutine:
-    # get current time
-    t = instr_exp2Clock.getTime()
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-    # update/draw components on each frame
-    
-    # *text_9* updates
-    if t >= 0.0 and text_9.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        text_9.tStart = t
-        text_9.frameNStart = frameN  # exact frame index
-        text_9.setAutoDraw(True)
-    
-    # *key_resp_12* updates
-    if t >= 0.0 and key_resp_12.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        key_resp_12.tStart = t
-        key_resp_12.frameNStart = frameN  # exact frame index
-        key_resp_12.status = STARTED
-        # keyboard checking is just starting
-        event.clearEvents(eventType='keyboard')
-    if key_resp_12.status == STARTED:
-        theseKeys = event.getKeys(keyList=['space'])
-        
-        # check for quit:
-        if "escape" in theseKeys:
-            endExpNow = True
-        if len(theseKeys) > 0:  # at least one key was pressed
-            # a response ends the routine
-            continueRoutine = False
-    
-    # check if all components have finished
-    if not continueRoutine:  # a component has requested a forced-end of Routine
-        break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in instr_exp2Components:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
-    
-    # check for quit (the Esc key)
-    if endExpNow or event.getKeys(keyList=["escape"]):
-        core.quit()
-    
-    # refresh the screen
-    if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
-
-# -------Ending Routine "instr_exp2"-------
-for thisComponent in instr_exp2Components:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
-# the Routine "instr_exp2" was not non-slip safe, so reset the non-slip timer
-routineTimer.reset()
-
-# ------Prepare to start Routine "instr_exp3"-------
-t = 0
-instr_exp3Clock.reset()  # clock
-frameN = -1
-continueRoutine = True
-# update component parameters for each repeat
-key_resp_13 = event.BuilderKeyResponse()
-# keep track of which components have finished
-instr_exp3Components = [text_10, key_resp_13]
-for thisComponent in instr_exp3Components:
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-
-# -------Start Routine "instr_exp3"-------
-while continueRoutine:
-    # get current time
-    t = instr_exp3Clock.getTime()
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-    # update/draw components on each frame
-    
-    # *text_10* updates
-    if t >= 0.0 and text_10.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        text_10.tStart = t
-        text_10.frameNStart = frameN  # exact frame index
-        text_10.setAutoDraw(True)
+        trialList=[None],
+        seed=None, name='practice_block')
+    thisExp.addLoop(practice_block)  # add the loop to the experiment
+
+    for thisPractice_block in practice_block:
+        currentLoop = practice_block
     
-    # *key_resp_13* updates
-    if t >= 0.0 and key_resp_13.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        key_resp_13.tStart = t
-        key_resp_13.frameNStart = frameN  # exact frame index
-        key_resp_13.status = STARTED
-        # keyboard checking is just starting
-        event.clearEvents(eventType='keyboard')
-    if key_resp_13.status == STARTED:
-        theseKeys = event.getKeys(keyList=['space'])
-        
-        # check for quit:
-        if "escape" in theseKeys:
-            endExpNow = True
-        if len(theseKeys) > 0:  # at least one key was pressed
-            # a response ends the routine
-            continueRoutine = False
+        # set up handler to look after randomisation of conditions etc
+        word_presentation_practice = data.TrialHandler(nReps=1, method='random', 
+            extraInfo=expInfo, originPath=-1,
+            trialList=curr_list_training,
+            seed=None, name='word_presentation_practice')
+        thisExp.addLoop(word_presentation_practice)  # add the loop to the experiment
     
-    # check if all components have finished
-    if not continueRoutine:  # a component has requested a forced-end of Routine
-        break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in instr_exp3Components:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
+        for thisWord_presentation_practice in word_presentation_practice:
+            currentLoop = word_presentation_practice
+            run_trial(currentLoop, thisWord_presentation_practice)
+        # completed 1 repeats of 'word_presentation_practice'
     
-    # check for quit (the Esc key)
-    if endExpNow or event.getKeys(keyList=["escape"]):
-        core.quit()
+        repeat_training.run()
+        repeat_training['key_resp_8'].add_data(practice_block)
+        if repeat_training['key_resp_8'].keys == "b": break  # allow to repeat training until ready (max 20, see loop)
+        next_entry()
     
-    # refresh the screen
-    if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
+    # completed 10 repeats of 'practice_block'
+    tap_recorder.save(run_filename + '_taps_b%d.npy' % myBlockCount)
+    journal.append({'kind': 'end_practice'})
+    journal.sync()
 
-# -------Ending Routine "instr_exp3"-------
-for thisComponent in instr_exp3Components:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
-# the Routine "instr_exp3" was not non-slip safe, so reset the non-slip timer
-routineTimer.reset()
+    instr_exp2.run()
+    instr_exp3.run()
 
 # set up handler to look after randomisation of conditions etc
 block = data.TrialHandler(nReps=1, method='sequential', 
     extraInfo=expInfo, originPath=-1,
-    trialList=data.importConditions(condition_block_file),
+    trialList=session_plan.block_order,
     seed=None, name='block')
 thisExp.addLoop(block)  # add the loop to the experiment
-thisBlock = block.trialList[0]  # so we can initialise stimuli with some values
-# abbreviate parameter names if possible (e.g. rgb = thisBlock.rgb)
-if thisBlock != None:
-    for paramName in thisBlock:
-        exec('{} = thisBlock[paramName]'.format(paramName))
 
 for thisBlock in block:
     currentLoop = block
@@ -1405,1253 +614,107 @@ for thisBlock in block:
             exec('{} = thisBlock[paramName]'.format(paramName))
     
     # ------Prepare to start Routine "block_instr"-------
-    t = 0
-    block_instrClock.reset()  # clock
-    frameN = -1
-    continueRoutine = True
-    # update component parameters for each repeat
     myBlockCount += 1
+    if resume is not None and myBlockCount in resume.completed_blocks:
+        continue  # done before the session was interrupted
+    event_log.set_trial(myBlockCount, -1)
     
     curr_ppt_block = "p_" + `pptID` + "_b" + `myBlockCount`
     print(curr_ppt_block)
     
-    curr_list_training = path2stimuli + curr_ppt_block + '_training.csv'
-    print(curr_list_training)
-    
-    curr_list_targets = path2stimuli + curr_ppt_block + '_targets.csv'
-    print(curr_list_targets)
+    curr_list_training = session_plan.training[myBlockCount]
+    curr_list_targets = session_plan.targets[myBlockCount]
+    # pre-build the word stims of this block while the instructions are shown
+    word_stims.prepare([curr_list_training, curr_list_targets])
     block_intro.setText("Del " + `myBlockCount` + u"\n\nDu kommer att få se fyra ord som snabbt visas ett i taget på skärmen. Din uppgift är att komma ihåg dem i exakt samma ordning som de har visats.\n\nDen här gången, omedelbart efter det fjärde ordet, kommer du att " + ShortInstr + u" tills du hör pipet. Direkt efter pipet ska du säga alla de fyra orden högt. Kom ihåg att repetera orden i samma ordning som du såg dem." + cont)
-    key_resp_4 = event.BuilderKeyResponse()
-    # keep track of which components have finished
-    block_instrComponents = [block_intro, key_resp_4, text_19]
-    for thisComponent in block_instrComponents:
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
+    block_instr.run()
     
-    # -------Start Routine "block_instr"-------
-    while continueRoutine:
-        # get current time
-        t = block_instrClock.getTime()
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-        # update/draw components on each frame
-        
-        
-        # *block_intro* updates
-        if t >= 0.0 and block_intro.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            block_intro.tStart = t
-            block_intro.frameNStart = frameN  # exact frame index
-            block_intro.setAutoDraw(True)
-        
-        # *key_resp_4* updates
-        if t >= 0.0 and key_resp_4.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            key_resp_4.tStart = t
-            key_resp_4.frameNStart = frameN  # exact frame index
-            key_resp_4.status = STARTED
-            # keyboard checking is just starting
-            event.clearEvents(eventType='keyboard')
-        if key_resp_4.status == STARTED:
-            theseKeys = event.getKeys(keyList=['space'])
-            
-            # check for quit:
-            if "escape" in theseKeys:
-                endExpNow = True
-            if len(theseKeys) > 0:  # at least one key was pressed
-                # a response ends the routine
-                continueRoutine = False
-        
-        # *text_19* updates
-        if t >= 0.0 and text_19.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            text_19.tStart = t
-            text_19.frameNStart = frameN  # exact frame index
-            text_19.setAutoDraw(True)
-        
-        # check if all components have finished
-        if not continueRoutine:  # a component has requested a forced-end of Routine
-            break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in block_instrComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
-        
-        # check for quit (the Esc key)
-        if endExpNow or event.getKeys(keyList=["escape"]):
-            core.quit()
-        
-        # refresh the screen
-        if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
-    
-    # -------Ending Routine "block_instr"-------
-    for thisComponent in block_instrComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
-    
-    # the Routine "block_instr" was not non-slip safe, so reset the non-slip timer
-    routineTimer.reset()
-    
-    # ------Prepare to start Routine "block_instr3"-------
-    t = 0
-    block_instr3Clock.reset()  # clock
-    frameN = -1
-    continueRoutine = True
-    # update component parameters for each repeat
     text_11.setText(LongInstr)
-    key_resp_15 = event.BuilderKeyResponse()
-    # keep track of which components have finished
-    block_instr3Components = [text_11, key_resp_15, text_20]
-    for thisComponent in block_instr3Components:
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
+    block_instr3.run()
+    block_instr3['key_resp_15'].add_data(block)
     
-    # -------Start Routine "block_instr3"-------
-    while continueRoutine:
-        # get current time
-        t = block_instr3Clock.getTime()
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-        # update/draw components on each frame
-        
-        # *text_11* updates
-        if t >= 0.0 and text_11.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            text_11.tStart = t
-            text_11.frameNStart = frameN  # exact frame index
-            text_11.setAutoDraw(True)
-        
-        # *key_resp_15* updates
-        if t >= 0.0 and key_resp_15.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            key_resp_15.tStart = t
-            key_resp_15.frameNStart = frameN  # exact frame index
-            key_resp_15.status = STARTED
-            # keyboard checking is just starting
-            win.callOnFlip(key_resp_15.clock.reset)  # t=0 on next screen flip
-            event.clearEvents(eventType='keyboard')
-        if key_resp_15.status == STARTED:
-            theseKeys = event.getKeys(keyList=['return'])
-            
-            # check for quit:
-            if "escape" in theseKeys:
-                endExpNow = True
-            if len(theseKeys) > 0:  # at least one key was pressed
-                key_resp_15.keys = theseKeys[-1]  # just the last key pressed
-                key_resp_15.rt = key_resp_15.clock.getTime()
-                # a response ends the routine
-                continueRoutine = False
-        
-        # *text_20* updates
-        if t >= 0.0 and text_20.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            text_20.tStart = t
-            text_20.frameNStart = frameN  # exact frame index
-            text_20.setAutoDraw(True)
-        
-        # check if all components have finished
-        if not continueRoutine:  # a component has requested a forced-end of Routine
-            break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in block_instr3Components:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
-        
-        # check for quit (the Esc key)
-        if endExpNow or event.getKeys(keyList=["escape"]):
-            core.quit()
-        
-        # refresh the screen
-        if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
-    
-    # -------Ending Routine "block_instr3"-------
-    for thisComponent in block_instr3Components:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
-    # check responses
-    if key_resp_15.keys in ['', [], None]:  # No response was made
-        key_resp_15.keys=None
-    block.addData('key_resp_15.keys',key_resp_15.keys)
-    if key_resp_15.keys != None:  # we had a response
-        block.addData('key_resp_15.rt', key_resp_15.rt)
-    # the Routine "block_instr3" was not non-slip safe, so reset the non-slip timer
-    routineTimer.reset()
-    
-    # ------Prepare to start Routine "train"-------
-    t = 0
-    trainClock.reset()  # clock
-    frameN = -1
-    continueRoutine = True
-    # update component parameters for each repeat
-    text_4.setText(u"Du ska nu få öva en stund innan du börjar med uppgiften." + cont)
-    key_resp_6 = event.BuilderKeyResponse()
-    # keep track of which components have finished
-    trainComponents = [text_4, key_resp_6, text_21]
-    for thisComponent in trainComponents:
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
-    
-    # -------Start Routine "train"-------
-    while continueRoutine:
-        # get current time
-        t = trainClock.getTime()
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-        # update/draw components on each frame
-        
-        # *text_4* updates
-        if t >= 0.0 and text_4.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            text_4.tStart = t
-            text_4.frameNStart = frameN  # exact frame index
-            text_4.setAutoDraw(True)
-        
-        # *key_resp_6* updates
-        if t >= 0.0 and key_resp_6.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            key_resp_6.tStart = t
-            key_resp_6.frameNStart = frameN  # exact frame index
-            key_resp_6.status = STARTED
-            # keyboard checking is just starting
-            win.callOnFlip(key_resp_6.clock.reset)  # t=0 on next screen flip
-            event.clearEvents(eventType='keyboard')
-        if key_resp_6.status == STARTED:
-            theseKeys = event.getKeys(keyList=['space'])
-            
-            # check for quit:
-            if "escape" in theseKeys:
-                endExpNow = True
-            if len(theseKeys) > 0:  # at least one key was pressed
-                key_resp_6.keys = theseKeys[-1]  # just the last key pressed
-                key_resp_6.rt = key_resp_6.clock.getTime()
-                # a response ends the routine
-                continueRoutine = False
-        
-        # *text_21* updates
-        if t >= 0.0 and text_21.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            text_21.tStart = t
-            text_21.frameNStart = frameN  # exact frame index
-            text_21.setAutoDraw(True)
-        
-        # check if all components have finished
-        if not continueRoutine:  # a component has requested a forced-end of Routine
-            break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in trainComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
-        
-        # check for quit (the Esc key)
-        if endExpNow or event.getKeys(keyList=["escape"]):
-            core.quit()
-        
-        # refresh the screen
-        if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
-    
-    # -------Ending Routine "train"-------
-    for thisComponent in trainComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
-    # check responses
-    if key_resp_6.keys in ['', [], None]:  # No response was made
-        key_resp_6.keys=None
-    block.addData('key_resp_6.keys',key_resp_6.keys)
-    if key_resp_6.keys != None:  # we had a response
-        block.addData('key_resp_6.rt', key_resp_6.rt)
-    # the Routine "train" was not non-slip safe, so reset the non-slip timer
-    routineTimer.reset()
+    # a resumed session skips the training of a block if it was done
+    skip_training = resume is not None and myBlockCount in resume.training_done
+    if not skip_training:
+        text_4.setText(u"Du ska nu få öva en stund innan du börjar med uppgiften." + cont)
+        train.run()
+        train['key_resp_6'].add_data(block)
     
     # set up handler to look after randomisation of conditions etc
-    training_block = data.TrialHandler(nReps=20, method='random', 
+    training_block = data.TrialHandler(nReps=0 if skip_training else 20, method='random', 
         extraInfo=expInfo, originPath=-1,
         trialList=[None],
         seed=None, name='training_block')
     thisExp.addLoop(training_block)  # add the loop to the experiment
-    thisTraining_block = training_block.trialList[0]  # so we can initialise stimuli with some values
-    # abbreviate parameter names if possible (e.g. rgb = thisTraining_block.rgb)
-    if thisTraining_block != None:
-        for paramName in thisTraining_block:
-            exec('{} = thisTraining_block[paramName]'.format(paramName))
     
     for thisTraining_block in training_block:
         currentLoop = training_block
-        # abbreviate parameter names if possible (e.g. rgb = thisTraining_block.rgb)
-        if thisTraining_block != None:
-            for paramName in thisTraining_block:
-                exec('{} = thisTraining_block[paramName]'.format(paramName))
         
         # set up handler to look after randomisation of conditions etc
         word_presentation_training = data.TrialHandler(nReps=1, method='random', 
             extraInfo=expInfo, originPath=-1,
-            trialList=data.importConditions(curr_list_training),
+            trialList=curr_list_training,
             seed=None, name='word_presentation_training')
         thisExp.addLoop(word_presentation_training)  # add the loop to the experiment
-        thisWord_presentation_training = word_presentation_training.trialList[0]  # so we can initialise stimuli with some values
-        # abbreviate parameter names if possible (e.g. rgb = thisWord_presentation_training.rgb)
-        if thisWord_presentation_training != None:
-            for paramName in thisWord_presentation_training:
-                exec('{} = thisWord_presentation_training[paramName]'.format(paramName))
         
         for thisWord_presentation_training in word_presentation_training:
             currentLoop = word_presentation_training
-            # abbreviate parameter names if possible (e.g. rgb = thisWord_presentation_training.rgb)
-            if thisWord_presentation_training != None:
-                for paramName in thisWord_presentation_training:
-                    exec('{} = thisWord_presentation_training[paramName]'.format(paramName))
-            
-            # ------Prepare to start Routine "fixation"-------
-            t = 0
-            fixationClock.reset()  # clock
-            frameN = -1
-            continueRoutine = True
-            # update component parameters for each repeat
-            # keep track of which components have finished
-            fixationComponents = [point]
-            for thisComponent in fixationComponents:
-                if hasattr(thisComponent, 'status'):
-                    thisComponent.status = NOT_STARTED
-            
-            # -------Start Routine "fixation"-------
-            while continueRoutine:
-                # get current time
-                t = fixationClock.getTime()
-                frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-                # update/draw components on each frame
-                
-                # *point* updates
-                if t >= 0.0 and point.status == NOT_STARTED:
-                    # keep track of start time/frame for later
-                    point.tStart = t
-                    point.frameNStart = frameN  # exact frame index
-                    point.setAutoDraw(True)
-                frameRemains = 0.0 + fix_point_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-                if point.status == STARTED and t >= frameRemains:
-                    point.setAutoDraw(False)
-                
-                # check if all components have finished
-                if not continueRoutine:  # a component has requested a forced-end of Routine
-                    break
-                continueRoutine = False  # will revert to True if at least one component still running
-                for thisComponent in fixationComponents:
-                    if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                        continueRoutine = True
-                        break  # at least one component has not yet finished
-                
-                # check for quit (the Esc key)
-                if endExpNow or event.getKeys(keyList=["escape"]):
-                    core.quit()
-                
-                # refresh the screen
-                if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                    win.flip()
-            
-            # -------Ending Routine "fixation"-------
-            for thisComponent in fixationComponents:
-                if hasattr(thisComponent, "setAutoDraw"):
-                    thisComponent.setAutoDraw(False)
-            # the Routine "fixation" was not non-slip safe, so reset the non-slip timer
-            routineTimer.reset()
-            
-            # ------Prepare to start Routine "display_words"-------
-            t = 0
-            display_wordsClock.reset()  # clock
-            frameN = -1
-            continueRoutine = True
-            # update component parameters for each repeat
-            w1.setText(word1)
-            w2.setText(word2)
-            w3.setText(word3)
-            w4.setText(word4)
-            # keep track of which components have finished
-            display_wordsComponents = [w1, w2, w3, w4]
-            for thisComponent in display_wordsComponents:
-                if hasattr(thisComponent, 'status'):
-                    thisComponent.status = NOT_STARTED
-            
-            # -------Start Routine "display_words"-------
-            while continueRoutine:
-                # get current time
-                t = display_wordsClock.getTime()
-                frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-                # update/draw components on each frame
-                
-                # *w1* updates
-                if t >= 0.0 and w1.status == NOT_STARTED:
-                    # keep track of start time/frame for later
-                    w1.tStart = t
-                    w1.frameNStart = frameN  # exact frame index
-                    w1.setAutoDraw(True)
-                frameRemains = 0.0 + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-                if w1.status == STARTED and t >= frameRemains:
-                    w1.setAutoDraw(False)
-                
-                # *w2* updates
-                if t >= SOA and w2.status == NOT_STARTED:
-                    # keep track of start time/frame for later
-                    w2.tStart = t
-                    w2.frameNStart = frameN  # exact frame index
-                    w2.setAutoDraw(True)
-                frameRemains = SOA + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-                if w2.status == STARTED and t >= frameRemains:
-                    w2.setAutoDraw(False)
-                
-                # *w3* updates
-                if t >= SOA*2 and w3.status == NOT_STARTED:
-                    # keep track of start time/frame for later
-                    w3.tStart = t
-                    w3.frameNStart = frameN  # exact frame index
-                    w3.setAutoDraw(True)
-                frameRemains = SOA*2 + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-                if w3.status == STARTED and t >= frameRemains:
-                    w3.setAutoDraw(False)
-                
-                # *w4* updates
-                if t >= SOA*3 and w4.status == NOT_STARTED:
-                    # keep track of start time/frame for later
-                    w4.tStart = t
-                    w4.frameNStart = frameN  # exact frame index
-                    w4.setAutoDraw(True)
-                frameRemains = SOA*3 + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-                if w4.status == STARTED and t >= frameRemains:
-                    w4.setAutoDraw(False)
-                
-                # check if all components have finished
-                if not continueRoutine:  # a component has requested a forced-end of Routine
-                    break
-                continueRoutine = False  # will revert to True if at least one component still running
-                for thisComponent in display_wordsComponents:
-                    if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                        continueRoutine = True
-                        break  # at least one component has not yet finished
-                
-                # check for quit (the Esc key)
-                if endExpNow or event.getKeys(keyList=["escape"]):
-                    core.quit()
-                
-                # refresh the screen
-                if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                    win.flip()
-            
-            # -------Ending Routine "display_words"-------
-            for thisComponent in display_wordsComponents:
-                if hasattr(thisComponent, "setAutoDraw"):
-                    thisComponent.setAutoDraw(False)
-            # the Routine "display_words" was not non-slip safe, so reset the non-slip timer
-            routineTimer.reset()
-            
-            # ------Prepare to start Routine "memory_paradiddle"-------
-            t = 0
-            memory_paradiddleClock.reset()  # clock
-            frameN = -1
-            continueRoutine = True
-            # update component parameters for each repeat
-            logging.exp('/'.join([
-                str(currentLoop.name),
-                str(myBlockCount),
-                str(currentLoop.thisTrialN),
-                'start of memory period',
-            ]))
-            # start recording taps
-            register_taps = True
-            
-            # keep track of which components have finished
-            memory_paradiddleComponents = [b_memory_period_2_]
-            for thisComponent in memory_paradiddleComponents:
-                if hasattr(thisComponent, 'status'):
-                    thisComponent.status = NOT_STARTED
-            
-            # -------Start Routine "memory_paradiddle"-------
-            while continueRoutine:
-                # get current time
-                t = memory_paradiddleClock.getTime()
-                frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-                # update/draw components on each frame
-                
-                
-                # *b_memory_period_2_* updates
-                if t >= 0 and b_memory_period_2_.status == NOT_STARTED:
-                    # keep track of start time/frame for later
-                    b_memory_period_2_.tStart = t
-                    b_memory_period_2_.frameNStart = frameN  # exact frame index
-                    b_memory_period_2_.setAutoDraw(True)
-                frameRemains = 0 + mem_per- win.monitorFramePeriod * 0.75  # most of one frame period left
-                if b_memory_period_2_.status == STARTED and t >= frameRemains:
-                    b_memory_period_2_.setAutoDraw(False)
-                
-                # check if all components have finished
-                if not continueRoutine:  # a component has requested a forced-end of Routine
-                    break
-                continueRoutine = False  # will revert to True if at least one component still running
-                for thisComponent in memory_paradiddleComponents:
-                    if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                        continueRoutine = True
-                        break  # at least one component has not yet finished
-                
-                # check for quit (the Esc key)
-                if endExpNow or event.getKeys(keyList=["escape"]):
-                    core.quit()
-                
-                # refresh the screen
-                if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                    win.flip()
-            
-            # -------Ending Routine "memory_paradiddle"-------
-            for thisComponent in memory_paradiddleComponents:
-                if hasattr(thisComponent, "setAutoDraw"):
-                    thisComponent.setAutoDraw(False)
-            # end recording taps
-            register_taps = False
-            # start recording audio
-            trial_audio = sd.rec(int(30 * samplerate))
-            # the Routine "memory_paradiddle" was not non-slip safe, so reset the non-slip timer
-            routineTimer.reset()
-            
-            # ------Prepare to start Routine "repeat_words"-------
-            t = 0
-            repeat_wordsClock.reset()  # clock
-            frameN = -1
-            continueRoutine = True
-            # update component parameters for each repeat
-            key_resp_2 = event.BuilderKeyResponse()
-            
-            # keep track of which components have finished
-            repeat_wordsComponents = [key_resp_2, sound_2]
-            for thisComponent in repeat_wordsComponents:
-                if hasattr(thisComponent, 'status'):
-                    thisComponent.status = NOT_STARTED
-            
-            # -------Start Routine "repeat_words"-------
-            while continueRoutine:
-                # get current time
-                t = repeat_wordsClock.getTime()
-                frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-                # update/draw components on each frame
-                
-                # *key_resp_2* updates
-                if t >= 0 and key_resp_2.status == NOT_STARTED:
-                    # keep track of start time/frame for later
-                    key_resp_2.tStart = t
-                    key_resp_2.frameNStart = frameN  # exact frame index
-                    key_resp_2.status = STARTED
-                    # keyboard checking is just starting
-                    win.callOnFlip(key_resp_2.clock.reset)  # t=0 on next screen flip
-                    event.clearEvents(eventType='keyboard')
-                if key_resp_2.status == STARTED:
-                    theseKeys = event.getKeys(keyList=['space'])
-                    
-                    # check for quit:
-                    if "escape" in theseKeys:
-                        endExpNow = True
-                    if len(theseKeys) > 0:  # at least one key was pressed
-                        key_resp_2.keys = theseKeys[-1]  # just the last key pressed
-                        key_resp_2.rt = key_resp_2.clock.getTime()
-                        # a response ends the routine
-                        continueRoutine = False
-                # start/stop sound_2
-                if t >= 0 and sound_2.status == NOT_STARTED:
-                    # keep track of start time/frame for later
-                    sound_2.tStart = t
-                    sound_2.frameNStart = frameN  # exact frame index
-                    sound_2.play()  # start the sound (it finishes automatically)
-                
-                
-                # check if all components have finished
-                if not continueRoutine:  # a component has requested a forced-end of Routine
-                    break
-                continueRoutine = False  # will revert to True if at least one component still running
-                for thisComponent in repeat_wordsComponents:
-                    if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                        continueRoutine = True
-                        break  # at least one component has not yet finished
-                
-                # check for quit (the Esc key)
-                if endExpNow or event.getKeys(keyList=["escape"]):
-                    core.quit()
-                
-                # refresh the screen
-                if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                    win.flip()
-            
-            # -------Ending Routine "repeat_words"-------
-            for thisComponent in repeat_wordsComponents:
-                if hasattr(thisComponent, "setAutoDraw"):
-                    thisComponent.setAutoDraw(False)
-            # check responses
-            if key_resp_2.keys in ['', [], None]:  # No response was made
-                key_resp_2.keys=None
-            word_presentation_training.addData('key_resp_2.keys',key_resp_2.keys)
-            if key_resp_2.keys != None:  # we had a response
-                word_presentation_training.addData('key_resp_2.rt', key_resp_2.rt)
-            sound_2.stop()  # ensure sound has stopped at end of routine
-            # end recording audio
-            audio_fname = '_'.join([
-                str(expInfo['participant']),
-                str(expName),
-                str(expInfo['date']),
-                "block",
-                str(myBlockCount),
-                str(currentLoop.name),
-                str(currentLoop.thisTrialN),
-            ])
-            sf.write('sound_recording/' + audio_fname + '.wav', trial_audio, samplerate)
-            # the Routine "repeat_words" was not non-slip safe, so reset the non-slip timer
-            routineTimer.reset()
-            thisExp.nextEntry()
-            
+            run_trial(currentLoop, thisWord_presentation_training)
         # completed 1 repeats of 'word_presentation_training'
         
-        
-        # ------Prepare to start Routine "repeat_training"-------
-        t = 0
-        repeat_trainingClock.reset()  # clock
-        frameN = -1
-        continueRoutine = True
-        # update component parameters for each repeat
-        key_resp_8 = event.BuilderKeyResponse()
-        
-        # keep track of which components have finished
-        repeat_trainingComponents = [text_5, key_resp_8]
-        for thisComponent in repeat_trainingComponents:
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        
-        # -------Start Routine "repeat_training"-------
-        while continueRoutine:
-            # get current time
-            t = repeat_trainingClock.getTime()
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            # *text_5* updates
-            if t >= 0.0 and text_5.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                text_5.tStart = t
-                text_5.frameNStart = frameN  # exact frame index
-                text_5.setAutoDraw(True)
-            
-            # *key_resp_8* updates
-            if t >= 0.0 and key_resp_8.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                key_resp_8.tStart = t
-                key_resp_8.frameNStart = frameN  # exact frame index
-                key_resp_8.status = STARTED
-                # keyboard checking is just starting
-                win.callOnFlip(key_resp_8.clock.reset)  # t=0 on next screen flip
-                event.clearEvents(eventType='keyboard')
-            if key_resp_8.status == STARTED:
-                theseKeys = event.getKeys(keyList=['b', 'm'])
-                
-                # check for quit:
-                if "escape" in theseKeys:
-                    endExpNow = True
-                if len(theseKeys) > 0:  # at least one key was pressed
-                    key_resp_8.keys = theseKeys[-1]  # just the last key pressed
-                    key_resp_8.rt = key_resp_8.clock.getTime()
-                    # a response ends the routine
-                    continueRoutine = False
-            
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in repeat_trainingComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # check for quit (the Esc key)
-            if endExpNow or event.getKeys(keyList=["escape"]):
-                core.quit()
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # -------Ending Routine "repeat_training"-------
-        for thisComponent in repeat_trainingComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        # check responses
-        if key_resp_8.keys in ['', [], None]:  # No response was made
-            key_resp_8.keys=None
-        training_block.addData('key_resp_8.keys',key_resp_8.keys)
-        if key_resp_8.keys != None:  # we had a response
-            training_block.addData('key_resp_8.rt', key_resp_8.rt)
-        if key_resp_8.keys == "b": break  # allow to repeat training until ready (max 20, see loop)
-        # the Routine "repeat_training" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        thisExp.nextEntry()
+        repeat_training.run()
+        repeat_training['key_resp_8'].add_data(training_block)
+        if repeat_training['key_resp_8'].keys == "b": break  # allow to repeat training until ready (max 20, see loop)
+        next_entry()
         
     # completed 20 repeats of 'training_block'
+    if not skip_training:
+        journal.append({'kind': 'end_training', 'block': myBlockCount})
     
-    
-    # ------Prepare to start Routine "instr_start_real_thing"-------
-    t = 0
-    instr_start_real_thingClock.reset()  # clock
-    frameN = -1
-    continueRoutine = True
-    # update component parameters for each repeat
-    key_resp_7 = event.BuilderKeyResponse()
-    # keep track of which components have finished
-    instr_start_real_thingComponents = [text_3, key_resp_7]
-    for thisComponent in instr_start_real_thingComponents:
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
-    
-    # -------Start Routine "instr_start_real_thing"-------
-    while continueRoutine:
-        # get current time
-        t = instr_start_real_thingClock.getTime()
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-        # update/draw components on each frame
-        
-        # *text_3* updates
-        if t >= 0.0 and text_3.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            text_3.tStart = t
-            text_3.frameNStart = frameN  # exact frame index
-            text_3.setAutoDraw(True)
-        
-        # *key_resp_7* updates
-        if t >= 0.0 and key_resp_7.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            key_resp_7.tStart = t
-            key_resp_7.frameNStart = frameN  # exact frame index
-            key_resp_7.status = STARTED
-            # keyboard checking is just starting
-            win.callOnFlip(key_resp_7.clock.reset)  # t=0 on next screen flip
-            event.clearEvents(eventType='keyboard')
-        if key_resp_7.status == STARTED:
-            theseKeys = event.getKeys(keyList=['space'])
-            
-            # check for quit:
-            if "escape" in theseKeys:
-                endExpNow = True
-            if len(theseKeys) > 0:  # at least one key was pressed
-                key_resp_7.keys = theseKeys[-1]  # just the last key pressed
-                key_resp_7.rt = key_resp_7.clock.getTime()
-                # a response ends the routine
-                continueRoutine = False
-        
-        # check if all components have finished
-        if not continueRoutine:  # a component has requested a forced-end of Routine
-            break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in instr_start_real_thingComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
-        
-        # check for quit (the Esc key)
-        if endExpNow or event.getKeys(keyList=["escape"]):
-            core.quit()
-        
-        # refresh the screen
-        if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
-    
-    # -------Ending Routine "instr_start_real_thing"-------
-    for thisComponent in instr_start_real_thingComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
-    # check responses
-    if key_resp_7.keys in ['', [], None]:  # No response was made
-        key_resp_7.keys=None
-    block.addData('key_resp_7.keys',key_resp_7.keys)
-    if key_resp_7.keys != None:  # we had a response
-        block.addData('key_resp_7.rt', key_resp_7.rt)
-    # the Routine "instr_start_real_thing" was not non-slip safe, so reset the non-slip timer
-    routineTimer.reset()
+    instr_start_real_thing.run()
+    instr_start_real_thing['key_resp_7'].add_data(block)
     
     # set up handler to look after randomisation of conditions etc
     word_presentation = data.TrialHandler(nReps=1, method='sequential', 
         extraInfo=expInfo, originPath=-1,
-        trialList=data.importConditions(curr_list_targets),
+        trialList=curr_list_targets,
         seed=None, name='word_presentation')
     thisExp.addLoop(word_presentation)  # add the loop to the experiment
-    thisWord_presentation = word_presentation.trialList[0]  # so we can initialise stimuli with some values
-    # abbreviate parameter names if possible (e.g. rgb = thisWord_presentation.rgb)
-    if thisWord_presentation != None:
-        for paramName in thisWord_presentation:
-            exec('{} = thisWord_presentation[paramName]'.format(paramName))
     
     for thisWord_presentation in word_presentation:
         currentLoop = word_presentation
-        # abbreviate parameter names if possible (e.g. rgb = thisWord_presentation.rgb)
-        if thisWord_presentation != None:
-            for paramName in thisWord_presentation:
-                exec('{} = thisWord_presentation[paramName]'.format(paramName))
-        
-        # ------Prepare to start Routine "fixation"-------
-        t = 0
-        fixationClock.reset()  # clock
-        frameN = -1
-        continueRoutine = True
-        # update component parameters for each repeat
-        # keep track of which components have finished
-        fixationComponents = [point]
-        for thisComponent in fixationComponents:
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        
-        # -------Start Routine "fixation"-------
-        while continueRoutine:
-            # get current time
-            t = fixationClock.getTime()
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            # *point* updates
-            if t >= 0.0 and point.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                point.tStart = t
-                point.frameNStart = frameN  # exact frame index
-                point.setAutoDraw(True)
-            frameRemains = 0.0 + fix_point_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if point.status == STARTED and t >= frameRemains:
-                point.setAutoDraw(False)
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in fixationComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # check for quit (the Esc key)
-            if endExpNow or event.getKeys(keyList=["escape"]):
-                core.quit()
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # -------Ending Routine "fixation"-------
-        for thisComponent in fixationComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        # the Routine "fixation" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        
-        # ------Prepare to start Routine "display_words"-------
-        t = 0
-        display_wordsClock.reset()  # clock
-        frameN = -1
-        continueRoutine = True
-        # update component parameters for each repeat
-        w1.setText(word1)
-        w2.setText(word2)
-        w3.setText(word3)
-        w4.setText(word4)
-        # keep track of which components have finished
-        display_wordsComponents = [w1, w2, w3, w4]
-        for thisComponent in display_wordsComponents:
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        
-        # -------Start Routine "display_words"-------
-        while continueRoutine:
-            # get current time
-            t = display_wordsClock.getTime()
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            # *w1* updates
-            if t >= 0.0 and w1.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                w1.tStart = t
-                w1.frameNStart = frameN  # exact frame index
-                w1.setAutoDraw(True)
-            frameRemains = 0.0 + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if w1.status == STARTED and t >= frameRemains:
-                w1.setAutoDraw(False)
-            
-            # *w2* updates
-            if t >= SOA and w2.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                w2.tStart = t
-                w2.frameNStart = frameN  # exact frame index
-                w2.setAutoDraw(True)
-            frameRemains = SOA + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if w2.status == STARTED and t >= frameRemains:
-                w2.setAutoDraw(False)
-            
-            # *w3* updates
-            if t >= SOA*2 and w3.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                w3.tStart = t
-                w3.frameNStart = frameN  # exact frame index
-                w3.setAutoDraw(True)
-            frameRemains = SOA*2 + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if w3.status == STARTED and t >= frameRemains:
-                w3.setAutoDraw(False)
-            
-            # *w4* updates
-            if t >= SOA*3 and w4.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                w4.tStart = t
-                w4.frameNStart = frameN  # exact frame index
-                w4.setAutoDraw(True)
-            frameRemains = SOA*3 + word_duration- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if w4.status == STARTED and t >= frameRemains:
-                w4.setAutoDraw(False)
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in display_wordsComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # check for quit (the Esc key)
-            if endExpNow or event.getKeys(keyList=["escape"]):
-                core.quit()
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # -------Ending Routine "display_words"-------
-        for thisComponent in display_wordsComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        # the Routine "display_words" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        
-        # ------Prepare to start Routine "memory_paradiddle"-------
-        t = 0
-        memory_paradiddleClock.reset()  # clock
-        frameN = -1
-        continueRoutine = True
-        # update component parameters for each repeat
-        logging.exp('/'.join([
-            str(currentLoop.name),
-            str(myBlockCount),
-            str(currentLoop.thisTrialN),
-            'start of memory period',
-        ]))
-        # start recording taps
-        register_taps = True
-        
-        # keep track of which components have finished
-        memory_paradiddleComponents = [b_memory_period_2_]
-        for thisComponent in memory_paradiddleComponents:
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        
-        # -------Start Routine "memory_paradiddle"-------
-        while continueRoutine:
-            # get current time
-            t = memory_paradiddleClock.getTime()
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            
-            # *b_memory_period_2_* updates
-            if t >= 0 and b_memory_period_2_.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                b_memory_period_2_.tStart = t
-                b_memory_period_2_.frameNStart = frameN  # exact frame index
-                b_memory_period_2_.setAutoDraw(True)
-            frameRemains = 0 + mem_per- win.monitorFramePeriod * 0.75  # most of one frame period left
-            if b_memory_period_2_.status == STARTED and t >= frameRemains:
-                b_memory_period_2_.setAutoDraw(False)
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in memory_paradiddleComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # check for quit (the Esc key)
-            if endExpNow or event.getKeys(keyList=["escape"]):
-                core.quit()
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # -------Ending Routine "memory_paradiddle"-------
-        for thisComponent in memory_paradiddleComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        # end recording taps
-        register_taps = False
-        # start recording audio
-        trial_audio = sd.rec(int(30 * samplerate))
-        # the Routine "memory_paradiddle" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        
-        # ------Prepare to start Routine "repeat_words"-------
-        t = 0
-        repeat_wordsClock.reset()  # clock
-        frameN = -1
-        continueRoutine = True
-        # update component parameters for each repeat
-        key_resp_2 = event.BuilderKeyResponse()
-        
-        # keep track of which components have finished
-        repeat_wordsComponents = [key_resp_2, sound_2]
-        for thisComponent in repeat_wordsComponents:
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        
-        # -------Start Routine "repeat_words"-------
-        while continueRoutine:
-            # get current time
-            t = repeat_wordsClock.getTime()
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            # *key_resp_2* updates
-            if t >= 0 and key_resp_2.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                key_resp_2.tStart = t
-                key_resp_2.frameNStart = frameN  # exact frame index
-                key_resp_2.status = STARTED
-                # keyboard checking is just starting
-                win.callOnFlip(key_resp_2.clock.reset)  # t=0 on next screen flip
-                event.clearEvents(eventType='keyboard')
-            if key_resp_2.status == STARTED:
-                theseKeys = event.getKeys(keyList=['space'])
-                
-                # check for quit:
-                if "escape" in theseKeys:
-                    endExpNow = True
-                if len(theseKeys) > 0:  # at least one key was pressed
-                    key_resp_2.keys = theseKeys[-1]  # just the last key pressed
-                    key_resp_2.rt = key_resp_2.clock.getTime()
-                    # a response ends the routine
-                    continueRoutine = False
-            # start/stop sound_2
-            if t >= 0 and sound_2.status == NOT_STARTED:
-                # keep track of start time/frame for later
-                sound_2.tStart = t
-                sound_2.frameNStart = frameN  # exact frame index
-                sound_2.play()  # start the sound (it finishes automatically)
-            
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in repeat_wordsComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # check for quit (the Esc key)
-            if endExpNow or event.getKeys(keyList=["escape"]):
-                core.quit()
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # -------Ending Routine "repeat_words"-------
-        for thisComponent in repeat_wordsComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        # check responses
-        if key_resp_2.keys in ['', [], None]:  # No response was made
-            key_resp_2.keys=None
-        word_presentation.addData('key_resp_2.keys',key_resp_2.keys)
-        if key_resp_2.keys != None:  # we had a response
-            word_presentation.addData('key_resp_2.rt', key_resp_2.rt)
-        sound_2.stop()  # ensure sound has stopped at end of routine
-        # end recording audio
-        audio_fname = '_'.join([
-            str(expInfo['participant']),
-            str(expName),
-            str(expInfo['date']),
-            "block",
-            str(myBlockCount),
-            str(currentLoop.name),
-            str(currentLoop.thisTrialN),
-        ])
-        sf.write('sound_recording/' + audio_fname + '.wav', trial_audio, samplerate)
-        # the Routine "repeat_words" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        thisExp.nextEntry()
-        
+        if resume is not None and word_presentation.thisN in resume.done_trials.get(myBlockCount, ()):
+            continue  # done before the session was interrupted
+        run_trial(currentLoop, thisWord_presentation)
     # completed 1 repeats of 'word_presentation'
     
-    
-    # ------Prepare to start Routine "end_block"-------
-    t = 0
-    end_blockClock.reset()  # clock
-    frameN = -1
-    continueRoutine = True
-    # update component parameters for each repeat
     text_6.setText(u"Slut på del " + `myBlockCount` + cont)
-    key_resp_9 = event.BuilderKeyResponse()
-    # keep track of which components have finished
-    end_blockComponents = [text_6, key_resp_9]
-    for thisComponent in end_blockComponents:
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
-    
-    # -------Start Routine "end_block"-------
-    while continueRoutine:
-        # get current time
-        t = end_blockClock.getTime()
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-        # update/draw components on each frame
-        
-        # *text_6* updates
-        if t >= 0.0 and text_6.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            text_6.tStart = t
-            text_6.frameNStart = frameN  # exact frame index
-            text_6.setAutoDraw(True)
-        
-        # *key_resp_9* updates
-        if t >= 0.0 and key_resp_9.status == NOT_STARTED:
-            # keep track of start time/frame for later
-            key_resp_9.tStart = t
-            key_resp_9.frameNStart = frameN  # exact frame index
-            key_resp_9.status = STARTED
-            # keyboard checking is just starting
-            event.clearEvents(eventType='keyboard')
-        if key_resp_9.status == STARTED:
-            theseKeys = event.getKeys(keyList=['space'])
-            
-            # check for quit:
-            if "escape" in theseKeys:
-                endExpNow = True
-            if len(theseKeys) > 0:  # at least one key was pressed
-                # a response ends the routine
-                continueRoutine = False
-        
-        # check if all components have finished
-        if not continueRoutine:  # a component has requested a forced-end of Routine
-            break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in end_blockComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
-        
-        # check for quit (the Esc key)
-        if endExpNow or event.getKeys(keyList=["escape"]):
-            core.quit()
-        
-        # refresh the screen
-        if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
-    
-    # -------Ending Routine "end_block"-------
-    for thisComponent in end_blockComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
-    # the Routine "end_block" was not non-slip safe, so reset the non-slip timer
-    routineTimer.reset()
-    thisExp.nextEntry()
+    end_block.run()
+    # make sure all recordings of this block are on disk
+    wav_writer.flush()
+    tap_recorder.save(run_filename + '_taps_b%d.npy' % myBlockCount)
+    next_entry()
+    journal.append({'kind': 'end_block', 'block': myBlockCount})
+    journal.sync()
     
 # completed 1 repeats of 'block'
 
-
-# ------Prepare to start Routine "thanks"-------
-t = 0
-thanksClock.reset()  # clock
-frameN = -1
-continueRoutine = True
-routineTimer.add(10.000000)
-# update component parameters for each repeat
-key_resp_3 = event.BuilderKeyResponse()
-# keep track of which components have finished
-thanksComponents = [text, key_resp_3]
-for thisComponent in thanksComponents:
-    if hasattr(thisComponent, 'status'):
-        thisComponent.status = NOT_STARTED
-
-# -------Start Routine "thanks"-------
-while continueRoutine and routineTimer.getTime() > 0:
-    # get current time
-    t = thanksClock.getTime()
-    frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-    # update/draw components on each frame
-    
-    # *text* updates
-    if t >= 0.0 and text.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        text.tStart = t
-        text.frameNStart = frameN  # exact frame index
-        text.setAutoDraw(True)
-    frameRemains = 0.0 + 5- win.monitorFramePeriod * 0.75  # most of one frame period left
-    if text.status == STARTED and t >= frameRemains:
-        text.setAutoDraw(False)
-    
-    # *key_resp_3* updates
-    if t >= 0.0 and key_resp_3.status == NOT_STARTED:
-        # keep track of start time/frame for later
-        key_resp_3.tStart = t
-        key_resp_3.frameNStart = frameN  # exact frame index
-        key_resp_3.status = STARTED
-        # keyboard checking is just starting
-        event.clearEvents(eventType='keyboard')
-    frameRemains = 0.0 + 10- win.monitorFramePeriod * 0.75  # most of one frame period left
-    if key_resp_3.status == STARTED and t >= frameRemains:
-        key_resp_3.status = STOPPED
-    if key_resp_3.status == STARTED:
-        theseKeys = event.getKeys(keyList=['return'])
-        
-        # check for quit:
-        if "escape" in theseKeys:
-            endExpNow = True
-        if len(theseKeys) > 0:  # at least one key was pressed
-            # a response ends the routine
-            continueRoutine = False
-    
-    # check if all components have finished
-    if not continueRoutine:  # a component has requested a forced-end of Routine
-        break
-    continueRoutine = False  # will revert to True if at least one component still running
-    for thisComponent in thanksComponents:
-        if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-            continueRoutine = True
-            break  # at least one component has not yet finished
-    
-    # check for quit (the Esc key)
-    if endExpNow or event.getKeys(keyList=["escape"]):
-        core.quit()
-    
-    # refresh the screen
-    if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-        win.flip()
-
-# -------Ending Routine "thanks"-------
-for thisComponent in thanksComponents:
-    if hasattr(thisComponent, "setAutoDraw"):
-        thisComponent.setAutoDraw(False)
-
-
-
-
-
-
-
-
-
-
+thanks.run()
+event_log.flush()
+journal.append({'kind': 'end_session'})
+journal.close()
 
 # these shouldn't be strictly necessary (should auto-save)
-thisExp.saveAsWideText(filename+'.csv')
-thisExp.saveAsPickle(filename)
+if resume is None:
+    thisExp.saveAsWideText(filename+'.csv')
+else:
+    # the rows of all runs of a resumed session are in its journal
+    save_csv(read_journal(journal.path), filename + '.csv')
+thisExp.saveAsPickle(run_filename)
 logging.flush()
 # make sure everything is closed down
 thisExp.abort()  # or data files will save again on exit
+recorder.close()
+wav_writer.close()
 win.close()
 core.quit()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Find the speech in response recordings and store them trimmed, as FLAC.
+
+``save_recording()`` is used by audio_fncs.AsyncWavWriter: a path ending in
+.flac gets the recording from a little before the first to a little after
+the last speech (energy-based voice activity detection), losslessly
+compressed. Where the kept part starts and ends in the original recording
+is in the file's comment, read back with ``read_trim()``. Recordings in
+which no speech is found are kept whole, so a quiet response is never cut.
+
+WAV recordings of earlier sessions can be converted the same way:
+
+    python speech_fncs.py sound_recording [--margin 0.25] [--remove-wav]
+
+NB: the experiment runs under StandalonePsychoPy2 (Python 2.7), so keep this
+module Python 2 compatible.
+"""
+
+from __future__ import absolute_import, division, print_function
+import os
+import re
+
+import numpy as np
+import soundfile as sf
+
+
+def frame_energy_db(samples, samplerate, frame_secs=0.01):
+    """Mean energy (dB re full scale) of consecutive frames; also returns the frame length."""
+    mono = samples.mean(axis=1) if samples.ndim > 1 else samples
+    frame_len = max(1, int(round(frame_secs * samplerate)))
+    nframes = len(mono) // frame_len
+    frames = mono[:nframes * frame_len].astype('float64').reshape(nframes, frame_len)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12), frame_len
+
+
+def find_speech(samples, samplerate, threshold_db=12.0, floor_db=-55.0, min_speech_secs=0.05,
+                frame_secs=0.01):
+    """(first, end) sample index of the speech in ``samples``, or None if there is none.
+
+    A frame counts as speech if its energy is ``threshold_db`` above the noise
+    floor of the recording (its 10th percentile) and above ``floor_db``; runs
+    of speech frames shorter than ``min_speech_secs`` (clicks) are ignored.
+    """
+    energy, frame_len = frame_energy_db(samples, samplerate, frame_secs)
+    if not len(energy):
+        return None
+    active = energy > max(np.percentile(energy, 10) + threshold_db, floor_db)
+    edges = np.diff(np.concatenate([[0], active.astype('int8'), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    long_enough = ends - starts >= max(1, int(round(min_speech_secs / frame_secs)))
+    if not long_enough.any():
+        return None
+    return starts[long_enough][0] * frame_len, ends[long_enough][-1] * frame_len
+
+
+def trim_bounds(samples, samplerate, margin_secs=0.25, **vad_kwargs):
+    """(start, end) of the part of ``samples`` to keep, and whether speech was found."""
+    speech = find_speech(samples, samplerate, **vad_kwargs)
+    if speech is None:
+        return 0, len(samples), False
+    margin = int(round(margin_secs * samplerate))
+    return max(0, speech[0] - margin), min(len(samples), speech[1] + margin), True
+
+
+def write_trimmed_flac(path, samples, samplerate, margin_secs=0.25, **vad_kwargs):
+    """Write the trimmed recording to ``path`` (FLAC, 16 bit); returns (start, end, speech)."""
+    start, end, speech = trim_bounds(samples, samplerate, margin_secs, **vad_kwargs)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    with sf.SoundFile(path, 'w', samplerate, channels, subtype='PCM_16', format='FLAC') as f:
+        f.comment = 'trim_start=%d trim_end=%d original_frames=%d speech=%d' % (
+            start, end, len(samples), speech)
+        f.write(samples[start:end])
+    return start, end, speech
+
+
+def save_recording(path, samples, samplerate, margin_secs=0.25):
+    """Write a response recording: trimmed FLAC if ``path`` ends in .flac, else as it is."""
+    if path.lower().endswith('.flac'):
+        return write_trimmed_flac(path, samples, samplerate, margin_secs)
+    sf.write(path, samples, samplerate)
+    return 0, len(samples), None
+
+
+def read_trim(path):
+    """Trim offsets stored by ``write_trimmed_flac()`` (dict of ints), or None."""
+    with sf.SoundFile(path) as f:
+        comment = f.comment
+    fields = dict(re.findall(r'(\w+)=(\d+)', comment or ''))
+    if 'trim_start' not in fields:
+        return None
+    return dict((key, int(value)) for key, value in fields.items())
+
+
+def convert_folder(folder, margin_secs=0.25, remove_wav=False):
+    """Write a trimmed .flac next to every .wav in ``folder``; returns (files, MB before, MB after)."""
+    nfiles, size_wav, size_flac = 0, 0, 0
+    for fname in sorted(os.listdir(folder)):
+        if not fname.endswith('.wav'):
+            continue
+        wav_path = os.path.join(folder, fname)
+        flac_path = wav_path[:-len('.wav')] + '.flac'
+        samples, samplerate = sf.read(wav_path, dtype='float32')
+        start, end, speech = write_trimmed_flac(flac_path, samples, samplerate, margin_secs)
+        print('%s: kept %.2f-%.2f of %.2f s%s' % (
+            fname, start / samplerate, end / samplerate, len(samples) / samplerate,
+            '' if speech else ' (no speech found)'))
+        nfiles += 1
+        size_wav += os.path.getsize(wav_path)
+        size_flac += os.path.getsize(flac_path)
+        if remove_wav:
+            os.remove(wav_path)
+    return nfiles, size_wav / 1e6, size_flac / 1e6
+
+
+if __name__ == '__main__':
+    import argparse
+    argparser = argparse.ArgumentParser('trim the silence around response recordings and store them as FLAC')
+    argparser.add_argument('folder', help='folder with the .wav recordings (e.g. sound_recording)')
+    argparser.add_argument('--margin', type=float, default=0.25,
+                           help='seconds kept before and after the speech (default 0.25)')
+    argparser.add_argument('--remove-wav', action='store_true',
+                           help='delete each .wav once its .flac is written')
+    args = argparser.parse_args()
+    nfiles, mb_wav, mb_flac = convert_folder(args.folder, args.margin, args.remove_wav)
+    print('converted %d files: %.1f MB of wav to %.1f MB of flac' % (nfiles, mb_wav, mb_flac))
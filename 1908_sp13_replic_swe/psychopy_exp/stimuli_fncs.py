@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Stimulus helpers for sp13_replication_swe.py.
+
+NB: the experiment runs under StandalonePsychoPy2 (Python 2.7), so keep this
+module Python 2 compatible.
+"""
+
+from __future__ import absolute_import, division
+from collections import OrderedDict
+import os
+import sqlite3
+
+from psychopy import data, logging, visual
+
+
+class StimulusBundle(object):
+    """The trial lists of all participants, packed into one indexed SQLite file.
+
+    Replaces the ~2,500 p_<id>_b<n>_<kind>.csv files in stimuli/random_lists
+    and cond-list_assignment_wide.csv (see pack_stimuli.py, which builds the
+    bundle from them). Each lookup is a single primary-key query, so nothing
+    is parsed that the session does not use.
+    """
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise IOError('stimulus bundle %s not found (build it with pack_stimuli.py)' % path)
+        self.path = path
+        self._db = sqlite3.connect(path)
+
+    def trials(self, participant, block, kind):
+        """Trial list (as data.importConditions would return it) of a 'training' or 'targets' file."""
+        cursor = self._db.execute(
+            'SELECT * FROM trials WHERE participant = ? AND block = ? AND kind = ? ORDER BY trial',
+            (participant, block, kind))
+        rows = cursor.fetchall()
+        if not rows:
+            raise KeyError('no %s list for participant %s, block %s in %s' % (
+                kind, participant, block, self.path))
+        # the first four columns are the key, the rest are the columns of the csv file
+        columns = [description[0] for description in cursor.description][4:]
+        return [OrderedDict(zip(columns, row[4:])) for row in rows]
+
+    def condition_order_file(self, participant):
+        """The block_order_*.csv of ``participant`` (column condit_order_file)."""
+        row = self._db.execute('SELECT condit_order_file FROM assignment WHERE id = ?',
+                               (participant,)).fetchone()
+        if row is None:
+            raise KeyError('participant %s has no condition-list assignment in %s' % (
+                participant, self.path))
+        return row[0]
+
+    def participants(self):
+        return [row[0] for row in self._db.execute('SELECT id FROM assignment ORDER BY id')]
+
+    def close(self):
+        self._db.close()
+
+
+class SessionPlan(object):
+    """All trial lists of one participant's session, loaded and checked at startup.
+
+    ``training[b]`` and ``targets[b]`` are the trial lists of block ``b``
+    (block 0 is the practice block, which has no targets) and
+    ``block_order`` the rows of the participant's block_order_*.csv. Every
+    problem found is listed in ``problems`` rather than raised, so the
+    experimenter sees all of them at once before the session starts.
+
+    Every item needs four words, of the arm/leg categories in target lists.
+    Real participants (IDs below 900) also need the full design: 26 items per
+    block, 13 of each category, and no word twice in a block; the 900s have
+    short lists for testing.
+    """
+
+    NBLOCKS = 3
+    BLOCK_TYPES = ('ARM', 'CONTROL', 'LEG')
+    CATEGORIES = ('arm', 'leg')
+    NITEMS = 26
+
+    def __init__(self, bundle, participant, full_design=None):
+        self.participant = participant
+        self.full_design = participant < 900 if full_design is None else full_design
+        self.problems = []
+        self.block_order = []
+        self.training = {}
+        self.targets = {}
+        try:
+            self.condition_order_file = bundle.condition_order_file(participant)
+        except KeyError as e:
+            self.condition_order_file = None
+            self.problems.append(e.args[0])
+        else:
+            self._load_block_order()
+        for block in range(self.NBLOCKS + 1):
+            self.training[block] = self._load(bundle, block, 'training')
+            if block > 0:
+                self.targets[block] = self._load(bundle, block, 'targets')
+        for block, trials in sorted(self.training.items()):
+            self._check(trials, 'block %d training' % block, ('training',))
+        for block, trials in sorted(self.targets.items()):
+            self._check(trials, 'block %d targets' % block, self.CATEGORIES, self.full_design)
+
+    def _load_block_order(self):
+        if not os.path.exists(self.condition_order_file):
+            self.problems.append('%s not found' % self.condition_order_file)
+            return
+        self.block_order = data.importConditions(self.condition_order_file)
+        block_types = sorted(row.get('BlockType') for row in self.block_order)
+        if block_types != sorted(self.BLOCK_TYPES):
+            self.problems.append('%s: block types %s, expected one each of %s' % (
+                self.condition_order_file, block_types, ', '.join(self.BLOCK_TYPES)))
+        for row in self.block_order:
+            if not row.get('ShortInstr') or not row.get('LongInstr'):
+                self.problems.append('%s: missing instructions for %s' % (
+                    self.condition_order_file, row.get('BlockType')))
+
+    def _load(self, bundle, block, kind):
+        try:
+            return bundle.trials(self.participant, block, kind)
+        except KeyError as e:
+            self.problems.append(e.args[0])
+            return []
+
+    def _check(self, trials, name, categories, full_design=False):
+        if not trials:
+            return  # already reported as missing
+        words = []
+        for i, trial in enumerate(trials):
+            if trial['type'] not in categories:
+                self.problems.append('%s, item %d: category %r' % (name, i + 1, trial['type']))
+            item = [trial['word%d' % position] for position in range(1, 5)]
+            if not all(item):
+                self.problems.append('%s, item %d: fewer than 4 words' % (name, i + 1))
+            words.extend(item)
+        if full_design:
+            repeated = sorted(set(word for word in words if words.count(word) > 1))
+            if repeated:
+                self.problems.append('%s: repeated words %s' % (name, ', '.join(repeated)))
+            counts = [sum(1 for trial in trials if trial['type'] == category)
+                      for category in categories]
+            if len(trials) != self.NITEMS or len(set(counts)) != 1:
+                self.problems.append('%s: %d items (%s), expected %d in equal numbers' % (
+                    name, len(trials), ', '.join('%d %s' % (count, category) for count, category
+                                                 in zip(counts, categories)), self.NITEMS))
+
+    def summary(self):
+        return 'session plan of participant %s: %s, %s training and %s target items' % (
+            self.participant, self.condition_order_file,
+            '/'.join(str(len(self.training[block])) for block in sorted(self.training)),
+            '/'.join(str(len(self.targets[block])) for block in sorted(self.targets)))
+
+
+class WordStimCache(object):
+    """Pre-laid-out TextStims for the four words of the display_words routine.
+
+    Building a TextStim (or calling ``setText``) lays out the text and uploads
+    its texture, which is too slow to do right before the 100 ms words. Instead
+    ``prepare()`` builds one stim per (position, word) for all trials of the
+    upcoming trial lists, so the timed loop only swaps prepared objects.
+    Stims are named w1..w4 as in the Builder routine. They don't write to the
+    text log (their creation and every autoDraw change made up most of it);
+    their on/offsets are in the session's event log (events_fncs.EventLog).
+    """
+
+    def __init__(self, win, **stim_kwargs):
+        self.win = win
+        self.stim_kwargs = dict(font='Arial', pos=(0, 0), height=0.15, wrapWidth=None,
+                                ori=0, color='white', colorSpace='rgb', opacity=1)
+        self.stim_kwargs.update(stim_kwargs)
+        self._stims = {}
+
+    def _make(self, position, word, warm_up=True):
+        stim = visual.TextStim(win=self.win, name='w%d' % position, text=word,
+                               depth=-(position - 1.0), autoLog=False, **self.stim_kwargs)
+        if warm_up:
+            # draw once so the texture is on the GPU; prepare() clears the back buffer
+            stim.draw()
+        return stim
+
+    def prepare(self, trial_lists):
+        """Build the stims for every trial in ``trial_lists``.
+
+        Stims from previously prepared lists are discarded.
+        """
+        stims = {}
+        for trial_list in trial_lists:
+            for trial in trial_list:
+                for position in range(1, 5):
+                    key = (position, trial['word%d' % position])
+                    if key not in stims:
+                        stims[key] = self._stims.get(key) or self._make(*key)
+        self.win.clearBuffer()
+        self._stims = stims
+        logging.exp('WordStimCache: prepared %d stims for %d trials' % (
+            len(stims), sum(len(trial_list) for trial_list in trial_lists)))
+
+    def get(self, position, word):
+        """Return the prepared stim, building it on the spot if it is missing."""
+        key = (position, word)
+        if key not in self._stims:
+            logging.warning('WordStimCache: %s not prepared, building it now' % (key,))
+            # no warm-up draw here, it would show up on the next flip
+            self._stims[key] = self._make(position, word, warm_up=False)
+        return self._stims[key]
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Recording of the paradiddle taps on the MIDI drum pads (sp13_replication_swe.py).
+
+NB: the experiment runs under StandalonePsychoPy2 (Python 2.7), so keep this
+module Python 2 compatible.
+"""
+
+from __future__ import absolute_import, division
+import atexit
+import threading
+
+import numpy as np
+from psychopy import core, event, logging, sound, visual
+
+
+# loops in which taps are recorded; stored as their index in the tap files
+ROUTINES = ('word_presentation_practice', 'word_presentation_training', 'word_presentation',
+            'tap_calibration')
+
+
+class TapRecorder(object):
+    """Store MIDI note messages of the drum pads in preallocated record arrays.
+
+    Every message is timestamped on arrival with ``core.monotonicClock`` (the
+    clock of the .log file), before anything else is done with it. The mido
+    callbacks only copy a few numbers into the buffer of their own port (no
+    string formatting, no logging, no lock shared between ports), so they
+    return quickly. Which trial a tap belongs to is set from the main thread
+    with ``start()``; taps outside ``start()``/``stop()`` are ignored.
+    ``save()`` writes the taps recorded so far to a .npy file (one per block)
+    and empties the buffers; see ``read_tapf()`` in
+    analysis/myfunctions/paradiddle_fncs.R to read it in R.
+
+    Fields of ``DTYPE``: ``t`` is the arrival time, ``t_corr`` the arrival
+    time minus the port's latency relative to the fastest port (estimated
+    with ``run_tap_calibration()``, 0 if not calibrated), ``port`` the index
+    of the MIDI input (the names are logged at startup), ``velocity`` 0 marks
+    the release of a pad.
+    """
+
+    DTYPE = np.dtype([('t', '<f8'), ('t_corr', '<f8'),
+                      ('port', '<i1'), ('note', '<i1'), ('velocity', '<i1'),
+                      ('routine', '<i1'), ('block', '<i2'), ('trial', '<i2')])
+
+    def __init__(self, port_names, init_taps=10000, exit_path=None):
+        self.port_names = list(port_names)
+        nports = len(self.port_names)
+        self.offsets = [0.0] * nports  # seconds subtracted from the arrival time per port
+        self._taps = [np.zeros(init_taps, dtype=self.DTYPE) for port in range(nports)]
+        self._ntaps = [0] * nports
+        self._locks = [threading.Lock() for port in range(nports)]
+        self._trial = None  # (routine, block, trial) while recording, otherwise None
+        self.monitor = None  # e.g. a ParadiddleMonitor, fed with every recorded tap onset
+        self.events = None  # e.g. an events_fncs.EventLog, gets every recorded tap onset
+        logging.exp('TapRecorder ports: ' + ', '.join(
+            '%d=%s' % (i, name) for i, name in enumerate(self.port_names)))
+        if exit_path is not None:
+            # taps of an unfinished block are saved if the experiment is quit early
+            atexit.register(self._save_on_exit, exit_path)
+
+    def callback(self, port):
+        """Callback for ``mido.open_input`` of input number ``port``."""
+        lock = self._locks[port]
+
+        def record_tap(msg):
+            t = core.monotonicClock.getTime()
+            trial = self._trial
+            if trial is None or msg.type not in ('note_on', 'note_off'):
+                return
+            velocity = msg.velocity if msg.type == 'note_on' else 0
+            with lock:
+                taps, n = self._taps[port], self._ntaps[port]
+                if n == len(taps):
+                    taps = self._taps[port] = np.concatenate([taps, np.zeros_like(taps)])
+                taps[n] = (t, t - self.offsets[port], port, msg.note, velocity) + trial
+                self._ntaps[port] = n + 1
+            monitor = self.monitor
+            if monitor is not None and velocity > 0:
+                monitor.feed(t - self.offsets[port], port, msg.note)
+            events = self.events
+            if events is not None and velocity > 0:
+                events.add('tap', self.port_names[port], msg.note, t)
+        return record_tap
+
+    def start(self, routine, block, trial):
+        self._trial = (ROUTINES.index(routine), block, trial)
+
+    def stop(self):
+        self._trial = None
+
+    @property
+    def recording(self):
+        return self._trial is not None
+
+    def taps(self, clear=False):
+        """Buffered taps of all ports, sorted by arrival time."""
+        chunks = []
+        for port, lock in enumerate(self._locks):
+            with lock:
+                chunks.append(self._taps[port][:self._ntaps[port]].copy())
+                if clear:
+                    self._ntaps[port] = 0
+        taps = np.concatenate(chunks)
+        return taps[np.argsort(taps['t'], kind='mergesort')]
+
+    def save(self, path):
+        """Write the buffered taps to ``path`` (.npy) and empty the buffers."""
+        taps = self.taps(clear=True)
+        np.save(path, taps)
+        logging.exp('TapRecorder: saved %d taps to %s' % (len(taps), path))
+
+    def _save_on_exit(self, path):
+        if any(self._ntaps):
+            self.save(path)
+
+
+class ParadiddleMonitor(object):
+    """Score the paradiddle taps of each trial while they come in.
+
+    A paradiddle alternates the two limbs as R L R R L R L L. The first pad
+    hit in a trial is called A and the second pad B, so the expected sequence
+    is A B A A B A B B (which also covers starting with the left limb). Every
+    tap onset is compared with the next expected pad as it arrives; after a
+    mismatch the matcher re-aligns to the next position in the pattern where
+    that pad is expected. Hits on a third pad count as pattern errors. At the
+    end of the trial, intervals shorter than half or longer than twice the
+    median inter-onset interval count as tempo errors.
+
+    A trial in which tapping is expected is valid if the first tap comes
+    within ``max_first_tap`` s of the start of the memory period (the rule of
+    compute_valid() in paradiddle_fncs.R), there are at least ``min_taps``
+    taps and at most ``max_error_rate`` of them are pattern errors. A trial
+    without tapping (practice, control blocks) is valid if there are no taps.
+    """
+
+    PATTERN = 'ABAABABB'
+
+    def __init__(self, max_first_tap=3.0, min_taps=8, max_error_rate=0.25):
+        self.max_first_tap = max_first_tap
+        self.min_taps = min_taps
+        self.max_error_rate = max_error_rate
+        self._lock = threading.Lock()
+        self.start_trial(None, expect_taps=False)
+
+    def start_trial(self, t_start, expect_taps):
+        with self._lock:
+            self.t_start = t_start
+            self.expect_taps = expect_taps
+            self._pads = {}  # (port, note) -> 'A'/'B'
+            self._pos = 0
+            self._onsets = []
+            self.pattern_errors = 0
+
+    def feed(self, t, port, note):
+        with self._lock:
+            self._onsets.append(t)
+            pad = (port, note)
+            if pad not in self._pads:
+                if len(self._pads) == 2:
+                    self.pattern_errors += 1  # third pad
+                    return
+                self._pads[pad] = 'AB'[len(self._pads)]
+            label = self._pads[pad]
+            expected = self.PATTERN[self._pos % len(self.PATTERN)]
+            if label != expected:
+                self.pattern_errors += 1
+                while self.PATTERN[self._pos % len(self.PATTERN)] != label:
+                    self._pos += 1
+            self._pos += 1
+
+    def end_trial(self, loop):
+        """Add the trial's scores to ``loop`` and warn on the console if it is invalid."""
+        with self._lock:
+            onsets = np.sort(self._onsets)  # the two ports feed from different threads
+            pattern_errors = self.pattern_errors
+        ntaps = len(onsets)
+        first_tap = onsets[0] - self.t_start if ntaps else None
+        tempo_errors, median_ioi = 0, None
+        if ntaps > 2:
+            iois = np.diff(onsets)
+            median_ioi = float(np.median(iois))
+            tempo_errors = int(((iois < median_ioi / 2) | (iois > median_ioi * 2)).sum())
+        if self.expect_taps:
+            valid = (ntaps >= self.min_taps and first_tap <= self.max_first_tap and
+                     pattern_errors <= self.max_error_rate * ntaps)
+        else:
+            valid = ntaps == 0
+        loop.addData('paradiddle_valid', int(valid))
+        loop.addData('paradiddle_ntaps', ntaps)
+        loop.addData('paradiddle_first_tap', first_tap)
+        loop.addData('paradiddle_pattern_errors', pattern_errors)
+        loop.addData('paradiddle_tempo_errors', tempo_errors)
+        loop.addData('paradiddle_median_ioi', median_ioi)
+        if not valid:
+            logging.warning('paradiddle: %s trial %d invalid (%d taps, first tap %s s, '
+                            '%d pattern errors)' % (loop.name, loop.thisTrialN, ntaps,
+                                                    first_tap, pattern_errors))
+        return valid
+
+
+def estimate_latencies(taps, beep_times, nports, max_async=0.25):
+    """Median asynchrony (tap - beep) per port, or None if a port has < 3 matched taps.
+
+    Each beep is matched to the first tap onset of the port within
+    ``max_async`` seconds of it.
+    """
+    latencies = []
+    beep_times = np.asarray(beep_times)
+    for port in range(nports):
+        onsets = taps['t'][(taps['port'] == port) & (taps['velocity'] > 0)]
+        asyncs = []
+        for beep in beep_times:
+            near = onsets[np.abs(onsets - beep) <= max_async]
+            if len(near):
+                asyncs.append(near[0] - beep)
+        latencies.append(np.median(asyncs) if len(asyncs) >= 3 else None)
+    return latencies
+
+
+def run_tap_calibration(win, recorder, path, n_beeps=12, ioi=0.75, text=None):
+    """Routine in which the pads are hit in time with a metronome, to align the ports.
+
+    The median asynchrony of each port with the beeps contains the human
+    asynchrony plus that port's latency. Only the difference between ports is
+    attributed to the devices, so the fastest port gets offset 0. The taps
+    are saved to ``path`` and the estimates are logged.
+    """
+    if text is None:
+        text = u'Kalibrering av trumplattorna\n\nSlå på alla plattor samtidigt, i takt med pipen.'
+    instr = visual.TextStim(win=win, name='tap_calibration_text', text=text, font='Arial',
+                            pos=(0, 0), height=0.1, color='white')
+    beep = sound.Sound('880', secs=0.05)
+    beep_times = []
+    calibClock = core.Clock()
+    next_beep = 1.0  # give the tapper a second before the first beep
+    recorder.start('tap_calibration', 0, 0)
+    while len(beep_times) < n_beeps or calibClock.getTime() < next_beep:
+        instr.draw()
+        win.flip()
+        if len(beep_times) < n_beeps and calibClock.getTime() >= next_beep:
+            beep.play()
+            beep_times.append(core.monotonicClock.getTime())
+            next_beep += ioi
+        if event.getKeys(keyList=['escape']):
+            core.quit()
+    recorder.stop()
+    taps = recorder.taps()
+    recorder.save(path)
+
+    latencies = estimate_latencies(taps, beep_times, len(recorder.port_names))
+    logging.exp('tap calibration: median tap-beep asynchrony per port (s): %s' % latencies)
+    measured = [lat for lat in latencies if lat is not None]
+    if len(measured) < len(latencies):
+        logging.warning('tap calibration: too few taps on some port(s), '
+                        'their times are not corrected')
+    if measured:
+        fastest = min(measured)
+        recorder.offsets = [0.0 if lat is None else lat - fastest for lat in latencies]
+    logging.exp('tap calibration: port offsets (s): %s' % recorder.offsets)
+    return latencies
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Frame-based timing helpers for sp13_replication_swe.py.
+
+NB: the experiment runs under StandalonePsychoPy2 (Python 2.7), so keep this
+module Python 2 compatible.
+"""
+
+from __future__ import absolute_import, division
+
+import numpy as np
+from psychopy import logging
+
+
+def secs_to_frames(secs, frame_dur):
+    """Number of whole frames closest to ``secs`` (at least 1 for secs > 0)."""
+    nframes = int(round(secs / frame_dur))
+    if secs > 0 and nframes == 0:
+        nframes = 1
+    return nframes
+
+
+def measured_frame_dur(frame_rate, fallback):
+    """Frame duration from the measured (unrounded) frame rate, if there is one."""
+    if frame_rate:
+        return 1.0 / frame_rate
+    return fallback
+
+
+class FlipTimeLog(object):
+    """Log intended vs. actual flip times of the on/offsets in a routine.
+
+    Call ``reset()`` when the routine starts and ``on_flip(name, frameN)``
+    whenever a stimulus is switched on or off; ``FlipTimeLog.flipped(t)`` is
+    called with the return value of every ``win.flip()``. That is the time of
+    the flip on ``logging.defaultClock`` (core.monotonicClock), taken by
+    PsychoPy right after the buffer swap, like Builder's tThisFlipGlobal; a
+    ``callOnFlip`` callback would add its own delay. The flip time is compared
+    with the time it should have happened, counting frames from the routine's
+    first flip. Each routine repetition keeps its own record, and changes wait
+    for the next flip whatever routine it is in, so an offset that is only
+    flipped in the next routine still lands in the right place.
+    """
+
+    _waiting = []  # (log, record, name, frameN) of the changes not flipped yet, of all logs
+
+    def __init__(self, win, routine, frame_dur):
+        self.win = win
+        self.routine = routine
+        self.frame_dur = frame_dur
+        self.reset()
+
+    def reset(self):
+        self.flips = {'t0': None, 'events': []}
+
+    def on_flip(self, name, frameN):
+        FlipTimeLog._waiting.append((self, self.flips, name, frameN))
+
+    @staticmethod
+    def flipped(t):
+        """Record the changes shown by the flip at ``t``; returns ``t``."""
+        waiting = FlipTimeLog._waiting[:]
+        del FlipTimeLog._waiting[:]
+        for log, flips, name, frameN in waiting:
+            log._record(flips, name, frameN, t)
+        return t
+
+    def _record(self, flips, name, frameN, t):
+        if flips['t0'] is None:
+            flips['t0'] = t - frameN * self.frame_dur
+        intended = flips['t0'] + frameN * self.frame_dur
+        flips['events'].append((name, frameN, intended, t))
+        logging.exp('%s: %s at frame %d, intended %.4f, actual %.4f (%+.1f ms)' % (
+            self.routine, name, frameN, intended, t, 1000 * (t - intended)))
+
+
+class FrameIntervalMonitor(object):
+    """Record flip times of the timed routines and report dropped frames per trial.
+
+    ``start_routine()`` is called when a routine starts and ``record()`` with
+    the return value of every ``win.flip()`` in it. ``end_trial()`` adds a
+    compact summary to the trial data and appends the trial's flip times to
+    a binary per-session file. That file is a flat array of ``DTYPE`` records
+    (little-endian; in R: readBin with 4 + 1 + 4 + 8 bytes per record), where
+    ``trial`` matches the ``frame_timing_trial`` column of the csv.
+    """
+
+    ROUTINES = ('fixation', 'display_words', 'memory_paradiddle')
+    DTYPE = np.dtype([('trial', '<i4'), ('routine', '<i1'), ('frame', '<i4'), ('t', '<f8')])
+
+    def __init__(self, path, frame_dur, init_frames=4096):
+        self.path = path
+        self.frame_dur = frame_dur
+        self._records = np.zeros(init_frames, dtype=self.DTYPE)
+        self._nrecords = 0
+        self._routine = 0
+        self._frame = 0
+        self.trial = 0
+
+    def start_routine(self, routine):
+        self._routine = self.ROUTINES.index(routine)
+        self._frame = 0
+
+    def record(self, flip_time):
+        if self._nrecords == len(self._records):
+            self._records = np.concatenate([self._records, np.zeros_like(self._records)])
+        self._records[self._nrecords] = (self.trial, self._routine, self._frame, flip_time)
+        self._nrecords += 1
+        self._frame += 1
+
+    def summary(self):
+        """Per routine: (number of flips, dropped frames, max interval in ms)."""
+        records = self._records[:self._nrecords]
+        summary = []
+        for code, routine in enumerate(self.ROUTINES):
+            flip_times = records['t'][records['routine'] == code]
+            intervals = np.diff(flip_times)
+            if len(intervals):
+                missed = np.round(intervals / self.frame_dur) - 1
+                dropped, max_interval = int(missed[missed > 0].sum()), 1000 * intervals.max()
+            else:
+                dropped, max_interval = 0, 0.0
+            summary.append((routine, len(flip_times), dropped, max_interval))
+        return summary
+
+    def end_trial(self, loop):
+        summary = self.summary()
+        loop.addData('frame_timing_trial', self.trial)
+        loop.addData('frame_timing', ', '.join(
+            '%s %d/%d/%.1f' % entry for entry in summary))  # flips/dropped/max interval
+        loop.addData('frames_dropped', sum(entry[2] for entry in summary))
+        with open(self.path, 'ab') as f:
+            self._records[:self._nrecords].tofile(f)
+        self._nrecords = 0
+        self.trial += 1